@@ -1,3 +1,4 @@
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -43,12 +44,15 @@ def create_app(config_class=Config):
     from app.views.reservations import reservations_bp
     from app.views.admin import admin_bp
     from app.views.payments import payments_bp
+    from app.views.dashboard import dashboard_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(main_bp)
     app.register_blueprint(reservations_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(payments_bp, url_prefix='/payments')
+    # Después de main: /dashboard lo sigue atendiendo main.dashboard
+    app.register_blueprint(dashboard_bp)
 
     # --- SEED DE CANCHAS DE PRUEBA ---
     def create_test_courts():
@@ -122,4 +126,110 @@ def create_app(config_class=Config):
 
     # --- FIN SEED ---
 
+    @app.cli.command('expire-reservations')
+    def expire_reservations(): # type: ignore
+        """Cancelar reservas pendientes cuyo tiempo de retención venció."""
+        from app.services.reservation_service import ReservationService
+        expired = ReservationService.expire_pending_reservations()
+        print(f"✅ {expired} reservas pendientes expiradas")
+
+    @app.cli.command('complete-reservations')
+    def complete_reservations(): # type: ignore
+        """Marcar como completadas las reservas confirmadas que ya terminaron."""
+        from app.services.reservation_service import ReservationService
+        completed = ReservationService.complete_finished_reservations()
+        print(f"✅ {completed} reservas completadas")
+
+    @app.cli.command('check-user-stats')
+    @click.option('--repair', is_flag=True, help='Reescribir las filas con diferencias.')
+    def check_user_stats(repair): # type: ignore
+        """Verificar (y opcionalmente reparar) los contadores de user_stats."""
+        from app.services.stats_service import StatsService
+        mismatched = StatsService.check_user_stats(repair=repair)
+        if not mismatched:
+            print("✅ user_stats coincide con reservas y pagos")
+        elif repair:
+            print(f"🔧 {len(mismatched)} usuarios reparados: {mismatched}")
+        else:
+            print(f"⚠️  {len(mismatched)} usuarios con diferencias: {mismatched}")
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats(): # type: ignore
+        """Recalcular el resumen diario de reservas e ingresos desde cero."""
+        from app.services.stats_service import StatsService
+        rows = StatsService.rebuild()
+        print(f"✅ Resumen diario reconstruido: {rows} filas")
+
+    @app.cli.command('export-data')
+    @click.argument('dataset', type=click.Choice(['reservations', 'payments']))
+    @click.option('--start', type=click.DateTime(['%Y-%m-%d']), required=True, help='Fecha inicial (YYYY-MM-DD).')
+    @click.option('--end', type=click.DateTime(['%Y-%m-%d']), required=True, help='Fecha final inclusive (YYYY-MM-DD).')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson', 'parquet']), default='csv', show_default=True)
+    @click.option('--gzip', 'compress', is_flag=True, help='Comprimir la salida con gzip.')
+    @click.option('--output', '-o', default='-', help='Archivo de salida (por defecto, stdout).')
+    def export_data(dataset, start, end, fmt, compress, output): # type: ignore
+        """Exportar reservas o pagos de un rango de fechas en streaming."""
+        from app.services.export_service import ExportService
+        try:
+            chunks = ExportService.stream(dataset, start.date(), end.date(), fmt, compress)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        with click.open_file(output, 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+
+    @app.cli.command('reclaim-slots')
+    def reclaim_slots(): # type: ignore
+        """Rehacer los reclamos de slots de las reservas activas tras cambiar SLOT_MINUTES."""
+        from app.services.reservation_service import ReservationService
+        conflicts = ReservationService.reclaim_slots()
+        print(f"✅ Slots reclamados con bloques de {app.config['SLOT_MINUTES']} minutos")
+        if conflicts:
+            print(f"⚠️  Reservas que chocan en la nueva rejilla (sin reclamo): {', '.join(map(str, conflicts))}")
+
+    @app.cli.command('dispatch-outbox')
+    def dispatch_outbox(): # type: ignore
+        """Despachar los mensajes pendientes del outbox (correos) una vez."""
+        from app.services.outbox import Outbox
+        print(f"✅ Mensajes despachados: {Outbox.drain()}")
+
+    @app.cli.command('gateway-stub')
+    @click.option('--port', default=8089, show_default=True)
+    @click.option('--latency-ms', default=50.0, show_default=True, help='Latencia media por llamada.')
+    @click.option('--jitter-ms', default=0.0, show_default=True, help='Variación aleatoria de la latencia (±).')
+    @click.option('--failure-rate', default=0.0, show_default=True, help='Fracción de llamadas que responden 503.')
+    @click.option('--decline-rate', default=0.0, show_default=True, help='Fracción de pagos rechazados (402).')
+    def gateway_stub(port, latency_ms, jitter_ms, failure_rate, decline_rate): # type: ignore
+        """Levantar un gateway de pagos local para pruebas de carga (PAYMENT_GATEWAY=http)."""
+        from app.services.gateway_stub import create_stub_gateway
+        stub = create_stub_gateway(latency_ms, jitter_ms, failure_rate, decline_rate)
+        stub.run(host='127.0.0.1', port=port, threaded=True)
+
+    # Barrido periódico opcional de reservas pendientes
+    if app.config.get('PENDING_EXPIRY_INTERVAL') and not app.config.get('TESTING'):
+        from app.services.reservation_service import ReservationService
+        from app.services.scheduler import PeriodicJob
+        def sweep_reservations():
+            ReservationService.expire_pending_reservations()
+            ReservationService.complete_finished_reservations()
+        app.extensions['pending_expiry'] = PeriodicJob(
+            app, 'pending-expiry', app.config['PENDING_EXPIRY_INTERVAL'], sweep_reservations
+        ).start()
+
+    # Reconciliación periódica del ranking de canchas populares
+    if app.config.get('POPULAR_COURTS_RECONCILE_INTERVAL') and not app.config.get('TESTING'):
+        from app.services.leaderboard import PopularCourts
+        from app.services.scheduler import PeriodicJob
+        app.extensions['popular_courts'] = PeriodicJob(
+            app, 'popular-courts', app.config['POPULAR_COURTS_RECONCILE_INTERVAL'], PopularCourts.reconcile
+        ).start()
+
+    # Despachador del outbox: correos y demás efectos registrados junto con cada cambio
+    if app.config.get('OUTBOX_DISPATCH_INTERVAL') and not app.config.get('TESTING'):
+        from app.services.outbox import Outbox
+        from app.services.scheduler import PeriodicJob
+        app.extensions['outbox'] = PeriodicJob(
+            app, 'outbox-dispatcher', app.config['OUTBOX_DISPATCH_INTERVAL'], Outbox.drain
+        ).start()
+
     return app
\ No newline at end of file
@@ -17,6 +17,95 @@ class Config:
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
     
+    # Índice en memoria de disponibilidad (segundos antes de recargar una cancha, 0 = sin expiración)
+    RESERVATION_INDEX_ENABLED = os.environ.get('RESERVATION_INDEX_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RESERVATION_INDEX_TTL = int(os.environ.get('RESERVATION_INDEX_TTL') or 300)
+    
+    # Motor de slots: granularidad y duración mínima de una reserva (minutos). Las reservas
+    # deben caer en la rejilla; tras cambiar SLOT_MINUTES ejecutar `flask reclaim-slots`
+    SLOT_MINUTES = int(os.environ.get('SLOT_MINUTES') or 15)
+    MIN_BOOKING_MINUTES = int(os.environ.get('MIN_BOOKING_MINUTES') or 60)
+    
+    # Reintentos ante bloqueos de escritura al crear reservas (segundos de backoff base)
+    BOOKING_MAX_RETRIES = int(os.environ.get('BOOKING_MAX_RETRIES') or 5)
+    BOOKING_RETRY_BACKOFF = float(os.environ.get('BOOKING_RETRY_BACKOFF') or 0.02)
+    
+    # Máximo de ocurrencias en una serie de reservas recurrentes
+    MAX_SERIES_OCCURRENCES = int(os.environ.get('MAX_SERIES_OCCURRENCES') or 52)
+    
+    # Caché de horarios por cancha y día
+    SCHEDULE_CACHE_ENABLED = os.environ.get('SCHEDULE_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    SCHEDULE_CACHE_TTL = int(os.environ.get('SCHEDULE_CACHE_TTL') or 60)
+    SCHEDULE_CACHE_MAX_ENTRIES = int(os.environ.get('SCHEDULE_CACHE_MAX_ENTRIES') or 2048)
+    SCHEDULE_CACHE_MAX_BYTES = int(os.environ.get('SCHEDULE_CACHE_MAX_BYTES') or 4 * 1024 * 1024)
+    
+    # Expiración de reservas pendientes de pago: minutos de retención, tamaño de lote
+    # y cada cuántos segundos corre el barrido en segundo plano (0 = solo por CLI).
+    # Sin barrido, una reserva promovida desde la lista de espera y nunca pagada
+    # ocuparía el horario para siempre.
+    PENDING_HOLD_MINUTES = int(os.environ.get('PENDING_HOLD_MINUTES') or 30)
+    EXPIRY_CHUNK_SIZE = int(os.environ.get('EXPIRY_CHUNK_SIZE') or 500)
+    PENDING_EXPIRY_INTERVAL = int(os.environ.get('PENDING_EXPIRY_INTERVAL') or 60)
+    
+    # Retenciones temporales de slots durante el checkout (segundos de vigencia y
+    # cuántas retenciones vigentes puede tener un usuario a la vez)
+    SLOT_HOLDS_ENABLED = os.environ.get('SLOT_HOLDS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    SLOT_HOLD_SECONDS = int(os.environ.get('SLOT_HOLD_SECONDS') or 600)
+    SLOT_HOLDS_PER_USER = int(os.environ.get('SLOT_HOLDS_PER_USER') or 3)
+    
+    # Antigüedad máxima (segundos) de la instantánea del panel de administración
+    ADMIN_SNAPSHOT_MAX_AGE = int(os.environ.get('ADMIN_SNAPSHOT_MAX_AGE') or 30)
+    
+    # Ranking de canchas populares: ventana en días (0 = histórico) y cada cuántos
+    # segundos se reconcilia con la base de datos (0 = sin reconciliación periódica)
+    POPULAR_COURTS_WINDOW_DAYS = int(os.environ.get('POPULAR_COURTS_WINDOW_DAYS') or 0)
+    POPULAR_COURTS_RECONCILE_INTERVAL = int(os.environ.get('POPULAR_COURTS_RECONCILE_INTERVAL') or 600)
+    
+    # Filas leídas por lote al exportar reservas y pagos
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+    
+    # Hilos del pool compartido para consultas independientes (p. ej. el bundle del dashboard)
+    PARALLEL_QUERY_WORKERS = int(os.environ.get('PARALLEL_QUERY_WORKERS') or 4)
+    
+    # Máximo de puntos por serie en la API de análisis (se agrupan buckets si hay más)
+    ANALYTICS_MAX_POINTS = int(os.environ.get('ANALYTICS_MAX_POINTS') or 366)
+    
+    # Reintentos de pago con la misma clave de idempotencia: cuánto esperar al intento
+    # en curso y cada cuánto consultar su estado si corre en otro proceso (segundos)
+    IDEMPOTENCY_WAIT_SECONDS = int(os.environ.get('IDEMPOTENCY_WAIT_SECONDS') or 30)
+    IDEMPOTENCY_POLL_SECONDS = float(os.environ.get('IDEMPOTENCY_POLL_SECONDS') or 0.2)
+    
+    # Pagos asíncronos: el pedido encola el pago y un pool de workers llama al gateway
+    # (PAYMENT_WORKERS = 0 procesa en el mismo hilo), con reintentos y backoff en segundos
+    PAYMENTS_ASYNC = os.environ.get('PAYMENTS_ASYNC', 'false').lower() in ['true', 'on', '1']
+    PAYMENT_WORKERS = int(os.environ.get('PAYMENT_WORKERS') or 4)
+    PAYMENT_QUEUE_SIZE = int(os.environ.get('PAYMENT_QUEUE_SIZE') or 1000)
+    PAYMENT_MAX_ATTEMPTS = int(os.environ.get('PAYMENT_MAX_ATTEMPTS') or 3)
+    PAYMENT_RETRY_BACKOFF = float(os.environ.get('PAYMENT_RETRY_BACKOFF') or 0.5)
+    PAYMENT_STATUS_MAX_WAIT = int(os.environ.get('PAYMENT_STATUS_MAX_WAIT') or 10)
+    
+    # Reservas por lote al cancelar en bloque (cierre de una cancha por mantenimiento o clima)
+    BULK_CANCEL_CHUNK_SIZE = int(os.environ.get('BULK_CANCEL_CHUNK_SIZE') or 200)
+    
+    # Outbox de efectos posteriores al commit (correos): cada cuántos segundos se despacha,
+    # mensajes por lote, reintentos con backoff en segundos y reserva de un lote en curso
+    OUTBOX_DISPATCH_INTERVAL = int(os.environ.get('OUTBOX_DISPATCH_INTERVAL') or 2)
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE') or 100)
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 8)
+    OUTBOX_RETRY_BACKOFF = int(os.environ.get('OUTBOX_RETRY_BACKOFF') or 5)
+    OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS') or 60)
+    
+    # Adaptador del gateway de pagos ('simulated' o 'http'), timeouts en segundos, tamaño del
+    # pool de conexiones y circuito: se abre tras N errores seguidos y reintenta pasado el reset
+    PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY') or 'simulated'
+    PAYMENT_GATEWAY_URL = os.environ.get('PAYMENT_GATEWAY_URL') or 'http://127.0.0.1:8089'
+    PAYMENT_GATEWAY_API_KEY = os.environ.get('PAYMENT_GATEWAY_API_KEY')
+    PAYMENT_GATEWAY_CONNECT_TIMEOUT = float(os.environ.get('PAYMENT_GATEWAY_CONNECT_TIMEOUT') or 3)
+    PAYMENT_GATEWAY_READ_TIMEOUT = float(os.environ.get('PAYMENT_GATEWAY_READ_TIMEOUT') or 10)
+    PAYMENT_GATEWAY_POOL_SIZE = int(os.environ.get('PAYMENT_GATEWAY_POOL_SIZE') or 10)
+    PAYMENT_GATEWAY_FAILURE_THRESHOLD = int(os.environ.get('PAYMENT_GATEWAY_FAILURE_THRESHOLD') or 5)
+    PAYMENT_GATEWAY_RESET_SECONDS = float(os.environ.get('PAYMENT_GATEWAY_RESET_SECONDS') or 30)
+    
     # Upload configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
@@ -2,8 +2,15 @@ from .user import User
 from .court import Court
 from .reservation import Reservation
 from .payment import Payment
+from .reservation_slot import ReservationSlot
+from .slot_hold import SlotHold
+from .waitlist import WaitlistEntry
+from .daily_stat import DailyStat
+from .user_stat import UserStat
+from .resource_version import ResourceVersion
+from .outbox import OutboxMessage
 from app import db
 
 
 # Hacer disponibles todas las clases de modelos
-__all__ = ['User', 'Court', 'Reservation', 'Payment']
+__all__ = ['User', 'Court', 'Reservation', 'Payment', 'ReservationSlot', 'SlotHold', 'WaitlistEntry', 'DailyStat', 'UserStat', 'ResourceVersion', 'OutboxMessage']
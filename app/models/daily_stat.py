@@ -0,0 +1,27 @@
+from app import db
+from sqlalchemy.ext.hybrid import hybrid_property
+
+class DailyStat(db.Model):
+    """Resumen por (día, cancha) de reservas por estado, horas reservadas e ingresos.
+
+    Las reservas cuentan en el día de su hora de inicio y los pagos en el día en
+    que se registraron. Los servicios lo actualizan en la misma transacción que
+    el cambio que lo origina; `flask rebuild-stats` lo recalcula desde cero.
+    """
+    __tablename__ = 'daily_stats'
+    
+    day = db.Column(db.Date, primary_key=True)
+    court_id = db.Column(db.Integer, db.ForeignKey('courts.id'), primary_key=True)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    confirmed_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    booked_hours = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    @hybrid_property
+    def total_reservations(self):
+        return self.pending_count + self.confirmed_count + self.cancelled_count + self.completed_count
+    
+    def __repr__(self):
+        return f'<DailyStat {self.day} - {self.court_id}>'
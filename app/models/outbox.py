@@ -0,0 +1,31 @@
+from app import db
+from datetime import datetime, timezone
+from sqlalchemy import text
+
+PENDING_SQL = "dispatched_at IS NULL"
+
+class OutboxMessage(db.Model):
+    """Efecto secundario (p. ej. un correo) pendiente de despachar.
+
+    Se inserta en la misma transacción que el cambio que lo origina, así que
+    solo existe si ese cambio se confirmó; el despachador de Outbox lo procesa
+    después en segundo plano.
+    """
+    __tablename__ = 'outbox_messages'
+    __table_args__ = (
+        db.Index('ix_outbox_messages_pending', 'available_at',
+                 sqlite_where=text(PENDING_SQL), postgresql_where=text(PENDING_SQL)),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # No se despacha antes de esta hora (reintentos con backoff y reservas del despachador)
+    available_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    dispatched_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.kind}>'
@@ -16,6 +16,12 @@ class PaymentMethod(Enum):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_status_created', 'status', 'created_at'),
+        db.Index('ix_payments_reservation_id', 'reservation_id'),
+        db.Index('ix_payments_user_id', 'user_id'),
+        db.Index('ix_payments_idempotency_key', 'idempotency_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -24,8 +30,10 @@ class Payment(db.Model):
     payment_method = db.Column(db.Enum(PaymentMethod), nullable=False)
     status = db.Column(db.Enum(PaymentStatus), default=PaymentStatus.PENDING)
     transaction_id = db.Column(db.String(100), unique=True)
+    # Clave enviada por el cliente: los reintentos con la misma clave devuelven este pago
+    idempotency_key = db.Column(db.String(64))
     gateway_response = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     completed_at = db.Column(db.DateTime)
     
     
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime, timezone
 from enum import Enum
+from sqlalchemy import bindparam, text
 
 class ReservationStatus(Enum):
     PENDING = "pending"
@@ -8,8 +9,25 @@ class ReservationStatus(Enum):
     CANCELLED = "cancelled"
     COMPLETED = "completed"
 
+# Estados que ocupan la cancha
+ACTIVE_STATUSES = (ReservationStatus.PENDING, ReservationStatus.CONFIRMED)
+ACTIVE_STATUSES_SQL = "status IN ('PENDING', 'CONFIRMED')"
+PENDING_STATUS_SQL = "status IN ('PENDING')"
+
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        db.Index('ix_reservations_court_status_time', 'court_id', 'status', 'start_time', 'end_time'),
+        db.Index('ix_reservations_user_status_start', 'user_id', 'status', 'start_time'),
+        db.Index('ix_reservations_created_at', 'created_at'),
+        db.Index('ix_reservations_start_time', 'start_time'),
+        # Índice parcial: solo las reservas que ocupan la cancha
+        db.Index('ix_reservations_active_court_time', 'court_id', 'start_time', 'end_time',
+                 sqlite_where=text(ACTIVE_STATUSES_SQL), postgresql_where=text(ACTIVE_STATUSES_SQL)),
+        # Índice parcial para el barrido de reservas pendientes vencidas
+        db.Index('ix_reservations_pending_created', 'created_at',
+                 sqlite_where=text(PENDING_STATUS_SQL), postgresql_where=text(PENDING_STATUS_SQL)),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -19,8 +37,8 @@ class Reservation(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.Enum(ReservationStatus), default=ReservationStatus.PENDING)
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     # Relationships
     payments = db.relationship('Payment', backref='reservation', lazy=True)
@@ -31,5 +49,18 @@ class Reservation(db.Model):
     def is_active(self):
         return self.status in [ReservationStatus.PENDING, ReservationStatus.CONFIRMED]
     
+    @classmethod
+    def status_filter(cls, *statuses):
+        """Filtro por estados con valores literales para que coincida con los índices parciales"""
+        return cls.status.in_(bindparam(
+            'statuses', list(statuses), type_=cls.status.type,
+            expanding=True, literal_execute=True, unique=True
+        ))
+    
+    @classmethod
+    def active_filter(cls):
+        """Filtro de reservas activas (PENDING y CONFIRMED)"""
+        return cls.status_filter(*ACTIVE_STATUSES)
+    
     def __repr__(self):
         return f'<Reservation {self.id} - {self.court.name}>'
\ No newline at end of file
@@ -0,0 +1,23 @@
+from app import db
+
+class ReservationSlot(db.Model):
+    """Reclamo de un slot de una cancha por una reserva activa o una retención de checkout.
+
+    La restricción única (court_id, slot_start) hace que dos reservas que se
+    solapan no puedan confirmarse a la vez, aunque ambas hayan pasado la
+    verificación de disponibilidad en paralelo. Cada fila tiene reservation_id
+    o hold_id, nunca ambos.
+    """
+    __tablename__ = 'reservation_slots'
+    __table_args__ = (
+        db.UniqueConstraint('court_id', 'slot_start', name='uq_reservation_slots_court_slot'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    court_id = db.Column(db.Integer, db.ForeignKey('courts.id'), nullable=False)
+    slot_start = db.Column(db.DateTime, nullable=False)
+    reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.id'), index=True)
+    hold_id = db.Column(db.String(32), db.ForeignKey('slot_holds.id'), index=True)
+    
+    def __repr__(self):
+        return f'<ReservationSlot {self.court_id} - {self.slot_start}>'
@@ -0,0 +1,17 @@
+from app import db
+
+class ResourceVersion(db.Model):
+    """Contador de mutaciones por recurso ('user' o 'court') para respuestas condicionales.
+
+    Se incrementa en la misma transacción que cualquier cambio de reservas o
+    pagos que afecte al recurso, así que una ETag armada con la versión es
+    válida entre procesos.
+    """
+    __tablename__ = 'resource_versions'
+    
+    scope = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.Integer, primary_key=True)  # user_id o court_id
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ResourceVersion {self.scope}:{self.key} v{self.version}>'
@@ -0,0 +1,34 @@
+from app import db
+from datetime import datetime, timezone
+import uuid
+
+class SlotHold(db.Model):
+    """Retención temporal de un horario mientras el usuario completa el checkout.
+
+    Reclama sus slots en reservation_slots (con hold_id en lugar de
+    reservation_id), así que la misma restricción única que evita reservas
+    solapadas impide que dos retenciones, o una retención y una reserva, tomen
+    el mismo horario aunque vengan de procesos distintos.
+    """
+    __tablename__ = 'slot_holds'
+    
+    # Id aleatorio: aparece en la URL del checkout y no debe poder adivinarse
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    court_id = db.Column(db.Integer, db.ForeignKey('courts.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def seconds_left(self, now=None):
+        """Segundos de vigencia que le quedan a la retención (0 si ya venció)"""
+        now = now or datetime.now(timezone.utc)
+        # SQLite devuelve las fechas sin zona horaria: se guardan en UTC
+        expires_at = self.expires_at if self.expires_at.tzinfo else self.expires_at.replace(tzinfo=timezone.utc)
+        return max((expires_at - now).total_seconds(), 0)
+    
+    def __repr__(self):
+        return f'<SlotHold {self.id} {self.court_id} - {self.start_time}>'
@@ -0,0 +1,24 @@
+from app import db
+
+class UserStat(db.Model):
+    """Contadores por usuario que alimentan el dashboard sin recorrer reservas ni pagos.
+
+    Los contadores "del mes" valen para `current_month` (primer día del mes);
+    si el mes ya cambió se leen como cero. `flask check-user-stats --repair`
+    los recalcula desde las tablas de origen.
+    """
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_reservations = db.Column(db.Integer, nullable=False, default=0)
+    pending_reservations = db.Column(db.Integer, nullable=False, default=0)
+    active_reservations = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_reservations = db.Column(db.Integer, nullable=False, default=0)
+    completed_reservations = db.Column(db.Integer, nullable=False, default=0)
+    total_spent = db.Column(db.Float, nullable=False, default=0)
+    current_month = db.Column(db.Date)
+    reservations_this_month = db.Column(db.Integer, nullable=False, default=0)
+    spent_this_month = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserStat {self.user_id}>'
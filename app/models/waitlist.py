@@ -0,0 +1,46 @@
+from app import db
+from datetime import datetime, timezone
+from enum import Enum
+from sqlalchemy import bindparam, text
+
+class WaitlistStatus(Enum):
+    WAITING = "waiting"
+    PROMOTED = "promoted"
+    CANCELLED = "cancelled"
+
+WAITING_STATUS_SQL = "status IN ('WAITING')"
+
+class WaitlistEntry(db.Model):
+    __tablename__ = 'waitlist_entries'
+    __table_args__ = (
+        # Cola por cancha: solo las entradas en espera, ordenadas por horario y antigüedad
+        db.Index('ix_waitlist_waiting_court_start', 'court_id', 'start_time', 'created_at',
+                 sqlite_where=text(WAITING_STATUS_SQL), postgresql_where=text(WAITING_STATUS_SQL)),
+        db.Index('ix_waitlist_user_status', 'user_id', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    court_id = db.Column(db.Integer, db.ForeignKey('courts.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.Enum(WaitlistStatus), default=WaitlistStatus.WAITING, nullable=False)
+    reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.id'))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    promoted_at = db.Column(db.DateTime)
+    
+    # Relationships
+    user = db.relationship('User', backref='waitlist_entries', lazy=True)
+    court = db.relationship('Court', lazy=True)
+    reservation = db.relationship('Reservation', lazy=True)
+    
+    @classmethod
+    def waiting_filter(cls):
+        """Filtro de entradas en espera con valor literal para usar el índice parcial"""
+        return cls.status.in_(bindparam(
+            'waiting_status', [WaitlistStatus.WAITING], type_=cls.status.type,
+            expanding=True, literal_execute=True, unique=True
+        ))
+    
+    def __repr__(self):
+        return f'<WaitlistEntry {self.id} - {self.court_id} - {self.start_time}>'
@@ -2,5 +2,6 @@
 from .reservation_service import ReservationService
 from .payment_service import PaymentService
 from .email_service import EmailService
+from .waitlist_service import WaitlistService
 
-__all__ = ['ReservationService', 'PaymentService', 'EmailService']
\ No newline at end of file
+__all__ = ['ReservationService', 'PaymentService', 'EmailService', 'WaitlistService']
\ No newline at end of file
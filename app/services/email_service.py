@@ -1,9 +1,47 @@
+from contextlib import contextmanager
 from flask import current_app
 from flask_mail import Message
 from app import mail
-from threading import Thread
+from threading import Thread, local
 
 class EmailService:
+    _batch = local()
+    
+    @staticmethod
+    @contextmanager
+    def batched():
+        """Enviar los correos del bloque por una sola conexión SMTP.
+
+        La conexión se abre con el primer correo y cada `send_email` envía en el
+        momento, de modo que un fallo se lanza en el correo que falló. Tras un
+        error la conexión se descarta y el siguiente correo abre otra.
+        """
+        batch = EmailService._batch
+        batch.active, batch.connection = True, None
+        try:
+            yield
+        finally:
+            connection = batch.connection
+            batch.active, batch.connection = False, None
+            if connection is not None:
+                connection.__exit__(None, None, None)
+
+    @staticmethod
+    def _send_batched(batch, msg):
+        if batch.connection is None:
+            connection = mail.connect()
+            connection.__enter__()
+            batch.connection = connection
+        try:
+            batch.connection.send(msg)
+        except Exception:
+            connection, batch.connection = batch.connection, None
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+            raise
+    
     @staticmethod
     def send_async_email(app, msg):
         with app.app_context():
@@ -24,6 +62,10 @@ class EmailService:
         msg.body = template
         msg.html = template
         
+        if getattr(EmailService._batch, 'active', False):
+            EmailService._send_batched(EmailService._batch, msg)
+            return
+        
         Thread(target=EmailService.send_async_email, 
                args=(current_app._get_current_object(), msg)).start()
     
@@ -88,3 +130,21 @@ class EmailService:
         <p>Si tienes dudas, contáctanos.</p>
         """
         EmailService.send_email(user.email, subject, template)
+    
+    @staticmethod
+    def send_waitlist_promotion(user, reservation):
+        subject = f"¡Se liberó tu horario! - {reservation.court.name}"
+        hold_minutes = current_app.config.get('PENDING_HOLD_MINUTES', 30)
+        template = f"""
+        <h2>Horario Disponible</h2>
+        <p>Hola {user.get_full_name()},</p>
+        <p>Se liberó el horario que esperabas y lo reservamos a tu nombre:</p>
+        <ul>
+            <li><strong>Cancha:</strong> {reservation.court.name}</li>
+            <li><strong>Fecha:</strong> {reservation.start_time.strftime('%d/%m/%Y')}</li>
+            <li><strong>Hora:</strong> {reservation.start_time.strftime('%H:%M')} - {reservation.end_time.strftime('%H:%M')}</li>
+            <li><strong>Total:</strong> ${reservation.total_amount:.2f}</li>
+        </ul>
+        <p>Completa el pago en los próximos {hold_minutes} minutos para conservarlo.</p>
+        """
+        EmailService.send_email(user.email, subject, template)
@@ -0,0 +1,198 @@
+from app import db
+from app.models.court import Court
+from app.models.payment import Payment
+from app.models.reservation import Reservation
+from app.models.user import User
+from datetime import date, datetime, timedelta
+from enum import Enum
+from flask import current_app
+from sqlalchemy import select
+import csv
+import io
+import json
+import zlib
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet es opcional
+    pyarrow = None
+
+# Formato -> (extensión, mimetype)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'ndjson': ('ndjson', 'application/x-ndjson'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+class ExportService:
+    """Exportación en streaming de reservas y pagos.
+
+    Las filas se leen con un cursor del lado del servidor (yield_per) y se
+    serializan lote a lote, así que la memoria usada depende del tamaño del
+    lote y no de la cantidad de filas exportadas.
+    """
+
+    DATASETS = ('reservations', 'payments')
+
+    @staticmethod
+    def statement(dataset, start_date, end_date):
+        """SELECT de las columnas exportadas para el rango de fechas [start_date, end_date]"""
+        start = datetime.combine(start_date, datetime.min.time())
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        if dataset == 'reservations':
+            return select(
+                Reservation.id, Reservation.user_id, User.username, Reservation.court_id,
+                Court.name.label('court_name'), Reservation.start_time, Reservation.end_time,
+                Reservation.total_amount, Reservation.status, Reservation.created_at
+            ).join(User, User.id == Reservation.user_id).join(Court, Court.id == Reservation.court_id).where(
+                Reservation.start_time >= start,
+                Reservation.start_time < end
+            ).order_by(Reservation.id)
+        if dataset == 'payments':
+            return select(
+                Payment.id, Payment.reservation_id, Payment.user_id, Payment.amount, Payment.payment_method,
+                Payment.status, Payment.transaction_id, Payment.created_at, Payment.completed_at
+            ).where(
+                Payment.created_at >= start,
+                Payment.created_at < end
+            ).order_by(Payment.id)
+        raise ValueError(f"Conjunto inválido. Use {', '.join(ExportService.DATASETS)}")
+
+    @staticmethod
+    def batches(dataset, start_date, end_date, batch_size=None):
+        """Generar (columnas, filas) por lote leyendo con yield_per"""
+        batch_size = batch_size or current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+        stmt = ExportService.statement(dataset, start_date, end_date)
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        try:
+            empty = True
+            for partition in result.partitions():
+                empty = False
+                yield columns, [tuple(_plain(value) for value in row) for row in partition]
+            if empty:
+                # Sin filas: igual se emite el encabezado/esquema
+                yield columns, []
+        finally:
+            result.close()
+
+    @staticmethod
+    def stream(dataset, start_date, end_date, fmt='csv', compress=False, batch_size=None):
+        """Generador de bytes con la exportación en el formato pedido (opcionalmente gzip)"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato inválido. Use {', '.join(EXPORT_FORMATS)}")
+        if fmt == 'parquet' and pyarrow is None:
+            raise ValueError("El formato parquet requiere pyarrow")
+        stmt = ExportService.statement(dataset, start_date, end_date)  # valida el conjunto antes de responder
+
+        batches = ExportService.batches(dataset, start_date, end_date, batch_size)
+        if fmt == 'parquet':
+            chunks = _parquet_chunks(batches, _parquet_schema(stmt))
+        else:
+            chunks = {'csv': _csv_chunks, 'ndjson': _ndjson_chunks}[fmt](batches)
+        return _gzip_chunks(chunks) if compress else chunks
+
+    @staticmethod
+    def filename(dataset, start_date, end_date, fmt='csv', compress=False):
+        name = f"{dataset}_{start_date.isoformat()}_{end_date.isoformat()}.{EXPORT_FORMATS[fmt][0]}"
+        return name + '.gz' if compress else name
+
+    @staticmethod
+    def mimetype(fmt='csv', compress=False):
+        return 'application/gzip' if compress else EXPORT_FORMATS[fmt][1]
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.name
+    return value
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in batches:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows([_iso(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson_chunks(batches):
+    for columns, rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, (_iso(value) for value in row))), ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura que acumula lo escrito hasta que se drena"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(stmt):
+    # Esquema fijo a partir de los tipos SQL: un lote con una columna toda nula no cambia el tipo
+    def arrow_type(column):
+        python_type = column.type.python_type if not isinstance(column.type, db.Enum) else str
+        if python_type is int:
+            return pyarrow.int64()
+        if python_type is float:
+            return pyarrow.float64()
+        if python_type is datetime:
+            return pyarrow.timestamp('us')
+        if python_type is date:
+            return pyarrow.date32()
+        return pyarrow.string()
+    return pyarrow.schema([(column.name, arrow_type(column)) for column in stmt.selected_columns])
+
+
+def _parquet_chunks(batches, schema):
+    # Cada lote se escribe como un row group y se envía en cuanto está listo
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for columns, rows in batches:
+        writer.write_table(pyarrow.Table.from_pydict(
+            {column: [row[i] for row in rows] for i, column in enumerate(columns)}, schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,56 @@
+from flask import Flask, jsonify, request
+from threading import Lock
+import random
+import time
+
+
+def create_stub_gateway(latency_ms=50, jitter_ms=0, failure_rate=0.0, decline_rate=0.0):
+    """Gateway de pagos de prueba para cargar HttpGateway sin salir de la máquina.
+
+    Responde POST /charges y POST /refunds tras `latency_ms` ± `jitter_ms`,
+    con un 503 en una fracción `failure_rate` de las llamadas y un rechazo
+    (402) en `decline_rate`. Repetir una Idempotency-Key devuelve la misma
+    respuesta. GET /stats cuenta las llamadas recibidas.
+    """
+    stub = Flask('gateway_stub')
+    stub.config.update(LATENCY_MS=latency_ms, JITTER_MS=jitter_ms,
+                       FAILURE_RATE=failure_rate, DECLINE_RATE=decline_rate)
+    responses = {}
+    counts = {'requests': 0, 'approved': 0, 'declined': 0, 'failed': 0}
+    lock = Lock()
+
+    def handle():
+        key = request.headers.get('Idempotency-Key')
+        with lock:
+            counts['requests'] += 1
+            if key in responses:
+                body, status = responses[key]
+                return jsonify(body), status
+
+        delay = stub.config['LATENCY_MS'] + random.uniform(-1, 1) * stub.config['JITTER_MS']
+        time.sleep(max(delay, 0) / 1000)
+
+        roll = random.random()
+        if roll < stub.config['FAILURE_RATE']:
+            with lock:
+                counts['failed'] += 1
+            return jsonify({'status': 'error'}), 503
+        if roll < stub.config['FAILURE_RATE'] + stub.config['DECLINE_RATE']:
+            body, status, outcome = {'status': 'declined'}, 402, 'declined'
+        else:
+            body, status, outcome = {'status': 'approved', 'id': f'ch_{random.getrandbits(48):012x}'}, 200, 'approved'
+        with lock:
+            counts[outcome] += 1
+            if key:
+                responses[key] = (body, status)
+        return jsonify(body), status
+
+    stub.add_url_rule('/charges', 'charges', handle, methods=['POST'])
+    stub.add_url_rule('/refunds', 'refunds', handle, methods=['POST'])
+
+    @stub.route('/stats')
+    def stats():
+        with lock:
+            return jsonify(dict(counts))
+
+    return stub
@@ -0,0 +1,144 @@
+from app import db
+from app.models.reservation import Reservation, ACTIVE_STATUSES
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import event
+from threading import RLock
+import time
+
+
+class CourtIntervalIndex:
+    """Intervalos activos de una cancha ordenados por hora de inicio"""
+
+    def __init__(self, intervals=()):
+        self._keys = []     # (start_time, reservation_id) ordenados
+        self._ends = []     # end_time paralelo a _keys
+        self._by_id = {}    # reservation_id -> (start_time, end_time)
+        self._max_length = timedelta(0)
+        for reservation_id, start_time, end_time in sorted(intervals, key=lambda i: (i[1], i[0])):
+            self._keys.append((start_time, reservation_id))
+            self._ends.append(end_time)
+            self._by_id[reservation_id] = (start_time, end_time)
+            self._max_length = max(self._max_length, end_time - start_time)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, reservation_id):
+        return reservation_id in self._by_id
+
+    def add(self, reservation_id, start_time, end_time):
+        """Agregar o reemplazar el intervalo de una reserva"""
+        self.remove(reservation_id)
+        key = (start_time, reservation_id)
+        pos = bisect_left(self._keys, key)
+        self._keys.insert(pos, key)
+        self._ends.insert(pos, end_time)
+        self._by_id[reservation_id] = (start_time, end_time)
+        self._max_length = max(self._max_length, end_time - start_time)
+
+    def remove(self, reservation_id):
+        """Quitar el intervalo de una reserva si existe"""
+        interval = self._by_id.pop(reservation_id, None)
+        if interval is None:
+            return False
+        pos = bisect_left(self._keys, (interval[0], reservation_id))
+        del self._keys[pos]
+        del self._ends[pos]
+        return True
+
+    def overlaps(self, start_time, end_time):
+        """Iterar (reservation_id, start_time, end_time) de los intervalos que cruzan [start_time, end_time)"""
+        # Un intervalo solapado termina después de start_time, por lo que su inicio
+        # es posterior a start_time - _max_length: solo se revisa esa ventana.
+        lo = bisect_right(self._keys, (start_time - self._max_length, float('inf')))
+        hi = bisect_left(self._keys, (end_time,))
+        for pos in range(lo, hi):
+            if self._ends[pos] > start_time:
+                interval_start, reservation_id = self._keys[pos]
+                yield reservation_id, interval_start, self._ends[pos]
+
+    def find_overlap(self, start_time, end_time, exclude_reservation_id=None):
+        """Devolver el id de una reserva que se solape con [start_time, end_time) o None"""
+        for reservation_id, _, _ in self.overlaps(start_time, end_time):
+            if reservation_id != exclude_reservation_id:
+                return reservation_id
+        return None
+
+
+class ReservationIndex:
+    """Índice en memoria por cancha para check_availability, cargado de forma perezosa"""
+
+    _courts = {}   # court_id -> (CourtIntervalIndex, loaded_at)
+    _lock = RLock()
+
+    @staticmethod
+    def enabled():
+        return current_app.config.get('RESERVATION_INDEX_ENABLED', True)
+
+    @classmethod
+    def get(cls, court_id):
+        """Obtener el índice de una cancha, cargándolo desde la base de datos si hace falta"""
+        ttl = current_app.config.get('RESERVATION_INDEX_TTL', 300)
+        with cls._lock:
+            entry = cls._courts.get(court_id)
+            if entry is not None and (not ttl or time.monotonic() - entry[1] < ttl):
+                return entry[0]
+
+            rows = db.session.query(
+                Reservation.id, Reservation.start_time, Reservation.end_time
+            ).filter(
+                Reservation.court_id == court_id,
+                Reservation.active_filter()
+            ).all()
+            index = CourtIntervalIndex(rows)
+            cls._courts[court_id] = (index, time.monotonic())
+            return index
+
+    @classmethod
+    def find_overlap(cls, court_id, start_time, end_time, exclude_reservation_id=None):
+        with cls._lock:
+            return cls.get(court_id).find_overlap(start_time, end_time, exclude_reservation_id)
+
+    @classmethod
+    def overlaps(cls, court_id, start_time, end_time):
+        """Lista de (reservation_id, start_time, end_time) activos que cruzan el rango"""
+        with cls._lock:
+            return list(cls.get(court_id).overlaps(start_time, end_time))
+
+    @classmethod
+    def sync(cls, reservation):
+        """Reflejar en el índice el estado actual de una reserva ya confirmada en la base de datos"""
+        with cls._lock:
+            entry = cls._courts.get(reservation.court_id)
+            if entry is None:
+                # Aún no se ha cargado: la próxima consulta la leerá de la base de datos
+                return
+            if reservation.status in ACTIVE_STATUSES:
+                entry[0].add(reservation.id, reservation.start_time, reservation.end_time)
+            else:
+                entry[0].remove(reservation.id)
+
+    @classmethod
+    def discard(cls, court_id, reservation_id):
+        """Quitar una reserva del índice de su cancha si está cargado"""
+        with cls._lock:
+            entry = cls._courts.get(court_id)
+            if entry is not None:
+                entry[0].remove(reservation_id)
+
+    @classmethod
+    def invalidate(cls, court_id=None):
+        """Descartar el índice de una cancha (o de todas) para forzar su recarga"""
+        with cls._lock:
+            if court_id is None:
+                cls._courts.clear()
+            else:
+                cls._courts.pop(court_id, None)
+
+
+@event.listens_for(Reservation.__table__, 'after_create')
+@event.listens_for(Reservation.__table__, 'after_drop')
+def _reset_index(target, connection, **kw):
+    ReservationIndex.invalidate()
@@ -0,0 +1,154 @@
+from app import db
+from app.models.court import Court
+from app.models.reservation import Reservation, ReservationStatus
+from app.services.time_buckets import TimeBuckets
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import event, func
+from threading import RLock
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PopularCourts:
+    """Ranking compartido de canchas por cantidad de reservas no canceladas.
+
+    Se carga una vez con un GROUP BY y luego se mantiene con los eventos de
+    reserva y cancelación. Con POPULAR_COURTS_WINDOW_DAYS > 0 solo cuentan las
+    reservas creadas en esa ventana: los conteos se guardan por día de creación
+    y los días que salen de la ventana se restan del total. El top-k se guarda
+    ordenado y solo se recalcula cuando cambian los conteos.
+    """
+
+    _totals = None              # court_id -> reservas que cuentan
+    _days = defaultdict(Counter)  # día de creación -> Counter(court_id), solo con ventana
+    _courts = {}                # court_id -> (name, sport_type) de las canchas activas
+    _window_start = None
+    _top = None                 # lista ordenada ya calculada para el último límite pedido
+    _lock = RLock()
+
+    @staticmethod
+    def window_days():
+        return current_app.config.get('POPULAR_COURTS_WINDOW_DAYS', 0)
+
+    @classmethod
+    def top(cls, limit=5):
+        """Las `limit` canchas activas con más reservas: [{id, name, sport_type, reservation_count}]"""
+        with cls._lock:
+            if cls._totals is None:
+                cls._load()
+            cls._advance_window()
+            if cls._top is None or len(cls._top) < limit:
+                ranked = ((count, court_id) for court_id, count in cls._totals.items()
+                          if count > 0 and court_id in cls._courts)
+                cls._top = [
+                    {'id': court_id, 'name': cls._courts[court_id][0],
+                     'sport_type': cls._courts[court_id][1], 'reservation_count': count}
+                    for count, court_id in heapq.nsmallest(limit, ranked, key=lambda item: (-item[0], item[1]))
+                ]
+            return cls._top[:limit]
+
+    @classmethod
+    def record(cls, court_id, booked_at, delta):
+        """Sumar `delta` reservas a una cancha (tras confirmar el cambio en la base de datos)"""
+        with cls._lock:
+            if cls._totals is None:
+                # Aún no se ha cargado: la carga leerá el cambio de la base de datos
+                return
+            if court_id not in cls._courts:
+                # Cancha nueva o reactivada: recargar sus datos en la próxima lectura
+                cls._totals = None
+                return
+            if cls._window_start is not None:
+                day = booked_at.date()
+                if day < cls._window_start:
+                    return
+                cls._days[day][court_id] += delta
+            cls._totals[court_id] += delta
+            cls._top = None
+
+    @classmethod
+    def record_reservations(cls, reservations, delta):
+        for reservation in reservations:
+            cls.record(reservation.court_id, reservation.created_at, delta)
+
+    @classmethod
+    def reconcile(cls):
+        """Recalcular desde la base de datos y devolver la diferencia por cancha con lo mantenido"""
+        with cls._lock:
+            previous = Counter(cls._totals or {})
+            cls._load()
+            cls._advance_window()
+            drift = {
+                court_id: cls._totals.get(court_id, 0) - previous.get(court_id, 0)
+                for court_id in set(previous) | set(cls._totals)
+                if cls._totals.get(court_id, 0) != previous.get(court_id, 0)
+            }
+            if drift and previous:
+                logger.info("Ranking de canchas corregido: %s", drift)
+            return drift
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._totals = None
+            cls._days.clear()
+            cls._courts = {}
+            cls._window_start = None
+            cls._top = None
+
+    @classmethod
+    def _load(cls):
+        window = cls.window_days()
+        cls._courts = {
+            court_id: (name, sport_type)
+            for court_id, name, sport_type in db.session.query(Court.id, Court.name, Court.sport_type).filter(
+                Court.is_active == True
+            )
+        }
+        cls._days = defaultdict(Counter)
+        cls._top = None
+        query = db.session.query(Reservation.court_id, func.count(Reservation.id)).filter(
+            Reservation.status != ReservationStatus.CANCELLED
+        )
+        if not window:
+            cls._window_start = None
+            cls._totals = Counter(dict(query.group_by(Reservation.court_id)))
+            return
+
+        cls._window_start = cls._current_window_start(window)
+        day = TimeBuckets.expression(Reservation.created_at, 'day')
+        rows = query.add_columns(day).filter(
+            Reservation.created_at >= datetime.combine(cls._window_start, datetime.min.time())
+        ).group_by(Reservation.court_id, day)
+        cls._totals = Counter()
+        for court_id, count, day_key in rows:
+            cls._days[datetime.strptime(day_key, '%Y-%m-%d').date()][court_id] += count
+            cls._totals[court_id] += count
+
+    @classmethod
+    def _advance_window(cls):
+        """Restar los días que salieron de la ventana deslizante"""
+        if cls._window_start is None:
+            return
+        window_start = cls._current_window_start(cls.window_days())
+        if window_start <= cls._window_start:
+            return
+        for day in [day for day in cls._days if day < window_start]:
+            cls._totals.subtract(cls._days.pop(day))
+        cls._window_start = window_start
+        cls._top = None
+
+    @staticmethod
+    def _current_window_start(window):
+        # created_at se guarda en UTC
+        return datetime.now(timezone.utc).date() - timedelta(days=window - 1)
+
+
+@event.listens_for(Reservation.__table__, 'after_create')
+@event.listens_for(Reservation.__table__, 'after_drop')
+def _reset_leaderboard(target, connection, **kw):
+    PopularCourts.invalidate()
@@ -0,0 +1,112 @@
+from app import db
+from app.models.court import Court
+from app.models.reservation import Reservation, ReservationStatus
+from datetime import datetime, timedelta
+from flask import current_app
+from itertools import accumulate
+from sqlalchemy import select
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+WEEKDAYS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+class OccupancyService:
+    """Mapa de calor de ocupación: cancha × día de la semana × hora, en porcentaje.
+
+    Solo se leen tuplas (court_id, start_time, end_time). Cada reserva suma dos
+    marcas en un arreglo de diferencias por minuto de la semana; una suma
+    acumulada reconstruye los minutos ocupados y se agregan por hora. El costo
+    es lineal en la cantidad de reservas y no depende de su duración.
+    """
+
+    @staticmethod
+    def heatmap(start_date, end_date, court_ids=None, batch_size=None):
+        """Porcentaje de ocupación por cancha, día de la semana (0 = lunes) y hora entre start_date y end_date"""
+        range_start = datetime.combine(start_date, datetime.min.time())
+        range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        # Lunes anterior (o igual) al inicio: el minuto 0 de la semana
+        week_origin = range_start - timedelta(days=range_start.weekday())
+
+        court_query = db.session.query(Court.id, Court.name, Court.opening_time, Court.closing_time)
+        if court_ids:
+            court_query = court_query.filter(Court.id.in_(court_ids))
+        courts = court_query.order_by(Court.id).all()
+        diffs = {court_id: [0] * (MINUTES_PER_WEEK + 1) for court_id, _, _, _ in courts}
+        full_weeks = dict.fromkeys(diffs, 0)
+
+        stmt = select(Reservation.court_id, Reservation.start_time, Reservation.end_time).where(
+            Reservation.status != ReservationStatus.CANCELLED,
+            Reservation.start_time < range_end,
+            Reservation.end_time > range_start
+        )
+        if court_ids:
+            stmt = stmt.where(Reservation.court_id.in_(court_ids))
+        batch_size = batch_size or current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+        for court_id, start_time, end_time in db.session.execute(stmt.execution_options(yield_per=batch_size)):
+            diff = diffs.get(court_id)
+            if diff is None:
+                continue
+            first = int((max(start_time, range_start) - week_origin).total_seconds()) // 60
+            last = int((min(end_time, range_end) - week_origin).total_seconds()) // 60
+            weeks, remainder = divmod(last - first, MINUTES_PER_WEEK)
+            full_weeks[court_id] += weeks
+            first %= MINUTES_PER_WEEK
+            last = first + remainder
+            diff[first] += 1
+            if last <= MINUTES_PER_WEEK:
+                diff[last] -= 1
+            else:
+                # La reserva cruza la medianoche del domingo
+                diff[MINUTES_PER_WEEK] -= 1
+                diff[0] += 1
+                diff[last - MINUTES_PER_WEEK] -= 1
+
+        weekday_counts = OccupancyService._weekday_counts(start_date, end_date)
+        result = []
+        for court_id, name, opening_time, closing_time in courts:
+            occupied = list(accumulate(diffs[court_id][:MINUTES_PER_WEEK]))
+            open_minutes = OccupancyService._open_minutes_per_hour(opening_time, closing_time)
+            utilization = []
+            for weekday in range(7):
+                row = []
+                for hour in range(24):
+                    offset = weekday * MINUTES_PER_DAY + hour * 60
+                    available = open_minutes[hour] * weekday_counts[weekday]
+                    if not available:
+                        row.append(None)
+                        continue
+                    booked = sum(occupied[offset:offset + 60]) + full_weeks[court_id] * 60
+                    row.append(round(100.0 * booked / available, 1))
+                utilization.append(row)
+            result.append({'id': court_id, 'name': name, 'utilization': utilization})
+
+        return {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'weekdays': WEEKDAYS,
+            'hours': list(range(24)),
+            'courts': result,
+        }
+
+    @staticmethod
+    def _weekday_counts(start_date, end_date):
+        """Cuántas veces aparece cada día de la semana en el rango"""
+        days = (end_date - start_date).days + 1
+        weeks, extra = divmod(max(days, 0), 7)
+        counts = [weeks] * 7
+        for offset in range(extra):
+            counts[(start_date.weekday() + offset) % 7] += 1
+        return counts
+
+    @staticmethod
+    def _open_minutes_per_hour(opening_time, closing_time):
+        """Minutos abiertos en cada hora del día según el horario de la cancha"""
+        opening = opening_time.hour * 60 + opening_time.minute
+        closing = closing_time.hour * 60 + closing_time.minute
+        # Un horario que cierra antes de abrir pasa la medianoche
+        spans = [(opening, closing)] if opening < closing else [(0, closing), (opening, MINUTES_PER_DAY)]
+        return [
+            sum(max(0, min(end, hour * 60 + 60) - max(start, hour * 60)) for start, end in spans)
+            for hour in range(24)
+        ]
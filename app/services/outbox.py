@@ -0,0 +1,183 @@
+from app import db
+from app.models.outbox import OutboxMessage
+from app.models.payment import Payment
+from app.models.reservation import Reservation
+from app.services.email_service import EmailService
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.orm import joinedload
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """Efectos posteriores al commit (correos, avisos) guardados en outbox_messages.
+
+    `add` registra el mensaje en la transacción actual: se despacha solo si el
+    cambio se confirma y no se pierde si el proceso cae después del commit.
+    `dispatch` toma un lote, lo agrupa por tipo y llama una vez al manejador de
+    cada tipo con todos sus mensajes. El manejador devuelve el error de cada
+    payload (None si se entregó) o None si entregó todos; solo los fallidos se
+    reprograman. La entrega es al menos una vez.
+    """
+
+    _handlers = {}
+
+    @classmethod
+    def register(cls, kind):
+        """Decorador: registrar el manejador de un tipo; recibe la lista de payloads del lote
+        y devuelve la lista de errores por payload (o None si todos se entregaron)"""
+        def decorator(func):
+            cls._handlers[kind] = func
+            return func
+        return decorator
+
+    @staticmethod
+    def add(kind, **payload):
+        """Registrar un mensaje en la transacción actual (sin commit)"""
+        db.session.add(OutboxMessage(kind=kind, payload=json.dumps(payload)))
+
+    @staticmethod
+    def add_many(kind, payloads):
+        """Registrar varios mensajes del mismo tipo con un solo INSERT (sin commit)"""
+        if payloads:
+            now = datetime.now(timezone.utc)
+            db.session.execute(insert(OutboxMessage), [
+                {'kind': kind, 'payload': json.dumps(payload), 'created_at': now, 'available_at': now, 'attempts': 0}
+                for payload in payloads
+            ])
+
+    @classmethod
+    def dispatch(cls, batch_size=None, now=None):
+        """Despachar un lote de mensajes pendientes; devuelve (despachados, fallidos)"""
+        config = current_app.config
+        batch_size = batch_size or config.get('OUTBOX_BATCH_SIZE', 100)
+        now = now or datetime.now(timezone.utc)
+        candidates = db.session.query(OutboxMessage.id).filter(
+            OutboxMessage.dispatched_at.is_(None),
+            OutboxMessage.available_at <= now,
+            OutboxMessage.attempts < config.get('OUTBOX_MAX_ATTEMPTS', 8)
+        ).order_by(OutboxMessage.id).limit(batch_size).all()
+        if not candidates:
+            return 0, 0
+
+        # Reservar el lote corriendo available_at: otro despachador no lo toma mientras dure la reserva
+        lease = now + timedelta(seconds=config.get('OUTBOX_LEASE_SECONDS', 60))
+        candidate_ids = [row.id for row in candidates]
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(candidate_ids), OutboxMessage.dispatched_at.is_(None),
+                   OutboxMessage.available_at <= now)
+            .values(available_at=lease)
+            .execution_options(synchronize_session=False)
+        )
+        messages = db.session.query(
+            OutboxMessage.id, OutboxMessage.kind, OutboxMessage.payload, OutboxMessage.attempts
+        ).filter(OutboxMessage.id.in_(candidate_ids), OutboxMessage.available_at == lease).all()
+        db.session.commit()
+
+        by_kind = {}
+        for message in messages:
+            by_kind.setdefault(message.kind, []).append(message)
+
+        dispatched, failed = [], []
+        for kind, group in by_kind.items():
+            try:
+                handler = cls._handlers.get(kind)
+                if handler is None:
+                    raise LookupError(f"No hay manejador para los mensajes {kind}")
+                errors = handler([json.loads(message.payload) for message in group]) or [None] * len(group)
+            except Exception as e:
+                logger.exception("Error al despachar %d mensajes %s", len(group), kind)
+                errors = [str(e)] * len(group)
+            for message, error in zip(group, errors):
+                if error is None:
+                    dispatched.append(message.id)
+                else:
+                    failed.append((message, error))
+
+        if dispatched:
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(dispatched))
+                .values(dispatched_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            )
+        backoff = config.get('OUTBOX_RETRY_BACKOFF', 5)
+        for message, error in failed:
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message.id)
+                .values(attempts=message.attempts + 1, last_error=error,
+                        available_at=now + timedelta(seconds=backoff * 2 ** message.attempts))
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return len(dispatched), len(failed)
+
+    @classmethod
+    def drain(cls, batch_size=None):
+        """Despachar lotes hasta vaciar los mensajes listos; devuelve cuántos se despacharon"""
+        batch_size = batch_size or current_app.config.get('OUTBOX_BATCH_SIZE', 100)
+        total = 0
+        while True:
+            dispatched, failed = cls.dispatch(batch_size)
+            total += dispatched
+            if dispatched + failed < batch_size:
+                return total
+
+
+def _send_each(items, send):
+    """Enviar un correo por elemento en una conexión compartida; devuelve el error de cada uno.
+    Un elemento None (el registro ya no existe) no tiene nada que enviar y cuenta como entregado."""
+    errors = []
+    with EmailService.batched():
+        for item in items:
+            try:
+                if item is not None:
+                    send(item)
+            except Exception as e:
+                logger.warning("No se pudo enviar el correo: %s", e)
+                errors.append(str(e) or e.__class__.__name__)
+            else:
+                errors.append(None)
+    return errors
+
+
+def _reservations(payloads):
+    ids = [payload['reservation_id'] for payload in payloads]
+    by_id = {reservation.id: reservation for reservation in Reservation.query.options(
+        joinedload(Reservation.user), joinedload(Reservation.court)
+    ).filter(Reservation.id.in_(ids))}
+    return [by_id.get(reservation_id) for reservation_id in ids]
+
+
+@Outbox.register('email.reservation_confirmation')
+def send_reservation_confirmations(payloads):
+    return _send_each(_reservations(payloads),
+                      lambda reservation: EmailService.send_reservation_confirmation(reservation.user, reservation))
+
+
+@Outbox.register('email.reservation_cancellation')
+def send_reservation_cancellations(payloads):
+    return _send_each(_reservations(payloads),
+                      lambda reservation: EmailService.send_reservation_cancellation(reservation.user, reservation))
+
+
+@Outbox.register('email.waitlist_promotion')
+def send_waitlist_promotions(payloads):
+    return _send_each(_reservations(payloads),
+                      lambda reservation: EmailService.send_waitlist_promotion(reservation.user, reservation))
+
+
+@Outbox.register('email.payment_confirmation')
+def send_payment_confirmations(payloads):
+    ids = [payload['payment_id'] for payload in payloads]
+    by_id = {payment.id: payment for payment in Payment.query.options(
+        joinedload(Payment.user)
+    ).filter(Payment.id.in_(ids))}
+    return _send_each([by_id.get(payment_id) for payment_id in ids],
+                      lambda payment: EmailService.send_payment_confirmation(payment.user, payment))
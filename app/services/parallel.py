@@ -0,0 +1,70 @@
+from app import db
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+from threading import Lock
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelQueries:
+    """Ejecuta consultas independientes en un pool de hilos acotado y compartido.
+
+    Cada tarea corre en su propio contexto de app y, por lo tanto, con su propia
+    sesión. Si el motor comparte una única conexión entre hilos (SQLite en
+    memoria) las tareas se ejecutan una tras otra en el hilo actual.
+    """
+
+    _executor = None
+    _lock = Lock()
+
+    @classmethod
+    def run(cls, tasks):
+        """Ejecutar {nombre: función}; devuelve (resultados, errores, milisegundos por tarea).
+
+        Una tarea que falla no impide que se entreguen las demás: su resultado
+        es None y el mensaje queda en `errores`.
+        """
+        app = current_app._get_current_object()
+        results, errors, timings = {}, {}, {}
+        executor = cls._get_executor(app)
+
+        if executor is None:
+            for name, func in tasks.items():
+                results[name], errors[name], timings[name] = cls._timed(name, func)
+        else:
+            futures = {name: executor.submit(cls._in_app_context, app, name, func) for name, func in tasks.items()}
+            for name, future in futures.items():
+                results[name], errors[name], timings[name] = future.result()
+
+        return results, {name: error for name, error in errors.items() if error}, timings
+
+    @classmethod
+    def _get_executor(cls, app):
+        workers = app.config.get('PARALLEL_QUERY_WORKERS', 4)
+        if workers <= 1 or isinstance(db.engine.pool, (StaticPool, SingletonThreadPool)):
+            return None
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='parallel-queries')
+            return cls._executor
+
+    @staticmethod
+    def _in_app_context(app, name, func):
+        with app.app_context():
+            try:
+                return ParallelQueries._timed(name, func)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _timed(name, func):
+        started = time.perf_counter()
+        try:
+            result, error = func(), None
+        except Exception as e:
+            logger.exception("Error en la consulta %s", name)
+            result, error = None, str(e)
+        return result, error, round((time.perf_counter() - started) * 1000, 2)
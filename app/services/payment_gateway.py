@@ -0,0 +1,274 @@
+from bisect import bisect_left
+from flask import current_app
+from threading import Lock
+from requests.adapters import HTTPAdapter
+import abc
+import random
+import time
+import requests
+
+
+class GatewayError(Exception):
+    """Error de comunicación con el gateway (timeout, 5xx, respuesta inválida)"""
+
+
+class GatewayUnavailable(GatewayError):
+    """El circuito está abierto: no se llama al gateway hasta que pase el tiempo de espera"""
+
+
+class GatewayRejected(GatewayError):
+    """El gateway rechazó la solicitud (4xx): reintentarla no cambia la respuesta y no abre el circuito"""
+
+
+class LatencyHistogram:
+    """Histograma de latencias con buckets fijos en milisegundos"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self._counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self._sum_ms = 0.0
+        self._lock = Lock()
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self._counts[bisect_left(self.BUCKETS_MS, ms)] += 1
+            self._sum_ms += ms
+
+    def percentile(self, fraction):
+        """Límite superior del bucket que contiene el percentil (None si no hay datos o cae en +Inf)"""
+        with self._lock:
+            counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank, seen = fraction * total, 0
+        for bound, count in zip(self.BUCKETS_MS, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            counts, sum_ms = list(self._counts), self._sum_ms
+        labels = [f'<={bound}' for bound in self.BUCKETS_MS] + ['+Inf']
+        return {
+            'count': sum(counts),
+            'sum_ms': round(sum_ms, 3),
+            'buckets': dict(zip(labels, counts)),
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+        }
+
+
+class CircuitBreaker:
+    """Circuito cerrado → abierto tras `failure_threshold` errores seguidos → semiabierto
+    tras `reset_timeout` segundos, donde una sola llamada de prueba decide si se cierra"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise GatewayUnavailable("El gateway de pagos no está disponible, intenta más tarde")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    raise GatewayUnavailable("El gateway de pagos no está disponible, intenta más tarde")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class PaymentGateway(abc.ABC):
+    """Interfaz de los adaptadores de gateway.
+
+    `charge` devuelve True si el pago se aprobó y False si se rechazó; los
+    errores de comunicación lanzan GatewayError. Las subclases implementan
+    `_charge` y `_refund`; el circuito y las latencias se manejan aquí.
+    """
+
+    name = None
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = {'charge': LatencyHistogram(), 'refund': LatencyHistogram()}
+
+    def charge(self, payment, card_data=None):
+        return self._call('charge', self._charge, payment, card_data)
+
+    def refund(self, payment, reason=None):
+        return self._call('refund', self._refund, payment, reason)
+
+    def stats(self):
+        return {
+            'gateway': self.name,
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'latency': {operation: histogram.snapshot() for operation, histogram in self.latency.items()},
+        }
+
+    def close(self):
+        pass
+
+    def _call(self, operation, func, *args):
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except GatewayRejected:
+            # Igual que un rechazo: el gateway respondió, el problema es la solicitud
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            # Un rechazo es una respuesta válida: el gateway está sano
+            self.breaker.record_success()
+            return result
+        finally:
+            self.latency[operation].observe(time.perf_counter() - started)
+
+    @abc.abstractmethod
+    def _charge(self, payment, card_data):
+        """Cobrar el pago; True si se aprobó, False si se rechazó"""
+
+    @abc.abstractmethod
+    def _refund(self, payment, reason):
+        """Reembolsar el pago; True si el gateway lo aceptó"""
+
+
+class SimulatedGateway(PaymentGateway):
+    """Gateway simulado para desarrollo: aprueba con probabilidad `success_rate`"""
+
+    name = 'simulated'
+
+    def __init__(self, success_rate=0.95, **kwargs):
+        super().__init__(**kwargs)
+        self.success_rate = success_rate
+
+    def _charge(self, payment, card_data):
+        return random.random() < self.success_rate
+
+    def _refund(self, payment, reason):
+        return True
+
+
+class HttpGateway(PaymentGateway):
+    """Gateway HTTP/JSON con una sesión persistente y un pool de conexiones por proceso.
+
+    POST /charges y POST /refunds con la referencia del pago como
+    Idempotency-Key, de modo que reintentar una llamada no cobra dos veces.
+    """
+
+    name = 'http'
+
+    def __init__(self, base_url, api_key=None, connect_timeout=3, read_timeout=10, pool_size=10, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        # Sin reintentos de urllib3: los reintentos los decide PaymentService
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount(self.base_url, adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f'Bearer {api_key}'
+
+    def close(self):
+        self.session.close()
+
+    def _charge(self, payment, card_data):
+        return self._post('/charges', payment.transaction_id, {
+            'reference': payment.transaction_id,
+            'amount': payment.amount,
+            'method': payment.payment_method.value,
+            'card': card_data,
+        })
+
+    def _refund(self, payment, reason):
+        return self._post('/refunds', f'refund-{payment.transaction_id}', {
+            'reference': payment.transaction_id,
+            'amount': payment.amount,
+            'reason': reason,
+        })
+
+    def _post(self, path, idempotency_key, payload):
+        try:
+            response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout,
+                                         headers={'Idempotency-Key': idempotency_key})
+        except requests.RequestException as e:
+            raise GatewayError(f"Error de conexión con el gateway: {e.__class__.__name__}") from e
+
+        if response.status_code >= 500 or response.status_code == 429:
+            raise GatewayError(f"El gateway respondió {response.status_code}")
+        if response.status_code == 402:
+            return False
+        if response.status_code >= 400:
+            raise GatewayRejected(f"El gateway rechazó la solicitud ({response.status_code})")
+        try:
+            status = response.json()['status']
+        except (ValueError, KeyError, TypeError) as e:
+            raise GatewayError("Respuesta inválida del gateway") from e
+        return status == 'approved'
+
+
+_build_lock = Lock()
+
+
+def build_gateway(config):
+    """Crear el adaptador configurado en PAYMENT_GATEWAY ('simulated' o 'http')"""
+    breaker = {
+        'failure_threshold': config.get('PAYMENT_GATEWAY_FAILURE_THRESHOLD', 5),
+        'reset_timeout': config.get('PAYMENT_GATEWAY_RESET_SECONDS', 30),
+    }
+    kind = config.get('PAYMENT_GATEWAY', 'simulated')
+    if kind == 'simulated':
+        return SimulatedGateway(**breaker)
+    if kind == 'http':
+        return HttpGateway(
+            config['PAYMENT_GATEWAY_URL'],
+            api_key=config.get('PAYMENT_GATEWAY_API_KEY'),
+            connect_timeout=config.get('PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3),
+            read_timeout=config.get('PAYMENT_GATEWAY_READ_TIMEOUT', 10),
+            pool_size=config.get('PAYMENT_GATEWAY_POOL_SIZE', 10),
+            **breaker
+        )
+    raise ValueError(f"Gateway de pagos desconocido: {kind}")
+
+
+def get_gateway():
+    """Adaptador de la app actual; se crea una vez y se comparte entre hilos"""
+    app = current_app._get_current_object()
+    gateway = app.extensions.get('payment_gateway')
+    if gateway is None:
+        with _build_lock:
+            gateway = app.extensions.get('payment_gateway')
+            if gateway is None:
+                gateway = app.extensions['payment_gateway'] = build_gateway(app.config)
+    return gateway
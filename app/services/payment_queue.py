@@ -0,0 +1,90 @@
+from flask import current_app
+from threading import Event, Lock, Thread
+import logging
+import queue
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentQueue:
+    """Cola acotada de pagos procesados por un pool de hilos en segundo plano.
+
+    Los datos de la tarjeta viajan solo en memoria dentro del trabajo; nunca se
+    guardan en la base de datos. Con PAYMENT_WORKERS = 0 los pagos se procesan
+    en el mismo hilo al encolarlos.
+    """
+
+    _queue = None
+    _threads = []
+    _done = {}      # payment_id -> Event que se activa al terminar su procesamiento
+    _lock = Lock()
+
+    @classmethod
+    def submit(cls, payment_id, card_data=None):
+        from app.services.payment_service import PaymentService
+        app = current_app._get_current_object()
+        workers = app.config.get('PAYMENT_WORKERS', 4)
+        if workers <= 0:
+            PaymentService.run_payment(payment_id, card_data)
+            return
+
+        cls._start(workers, app.config.get('PAYMENT_QUEUE_SIZE', 1000))
+        with cls._lock:
+            cls._done[payment_id] = Event()
+        try:
+            cls._queue.put_nowait((app, payment_id, card_data))
+        except queue.Full:
+            with cls._lock:
+                cls._done.pop(payment_id).set()
+            raise ValueError("Hay demasiados pagos en proceso, intenta de nuevo en unos segundos")
+
+    @classmethod
+    def wait(cls, payment_id, timeout):
+        """Esperar a que termine un pago encolado en este proceso; False si no está aquí o no terminó"""
+        with cls._lock:
+            done = cls._done.get(payment_id)
+        if done is None:
+            if timeout > 0:
+                time.sleep(timeout)
+            return False
+        return done.wait(timeout)
+
+    @classmethod
+    def join(cls):
+        """Esperar a que se procesen todos los pagos encolados"""
+        if cls._queue is not None:
+            cls._queue.join()
+
+    @classmethod
+    def _start(cls, workers, size):
+        with cls._lock:
+            if cls._queue is not None:
+                return
+            cls._queue = queue.Queue(maxsize=size)
+            for index in range(workers):
+                thread = Thread(target=cls._work, name=f'payment-worker-{index}', daemon=True)
+                thread.start()
+                cls._threads.append(thread)
+
+    @classmethod
+    def _work(cls):
+        from app import db
+        from app.services.payment_service import PaymentService
+        while True:
+            # Cada trabajo lleva su app: el pool es del proceso, no de una app en particular
+            app, payment_id, card_data = cls._queue.get()
+            try:
+                with app.app_context():
+                    try:
+                        PaymentService.run_payment(payment_id, card_data)
+                    except Exception:
+                        logger.exception("Error al procesar el pago %s", payment_id)
+                    finally:
+                        db.session.remove()
+            finally:
+                with cls._lock:
+                    done = cls._done.pop(payment_id, None)
+                if done is not None:
+                    done.set()
+                cls._queue.task_done()
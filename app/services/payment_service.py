@@ -1,15 +1,149 @@
 from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from threading import Event, Lock
 from app.models.user import db
 from app.models.payment import Payment, PaymentStatus, PaymentMethod
-from app.services.email_service import EmailService
+from app.models.reservation import Reservation
+from app.services.payment_gateway import GatewayRejected, GatewayUnavailable, get_gateway
+from app.services.outbox import Outbox
+from app.services.parallel import ParallelQueries
+from app.services.payment_queue import PaymentQueue
 from app.services.reservation_service import ReservationService
+from app.services.stats_service import StatsService
+import time
 import uuid
-import random
 
 class PaymentService:
+    # Intentos en curso en este proceso por clave de idempotencia
+    _in_flight = {}
+    _in_flight_lock = Lock()
+    
+    @staticmethod
+    def process_payment(user_id, reservation_id, payment_method, amount, card_data=None, idempotency_key=None):
+        """Procesar un pago.
+        
+        Con `idempotency_key`, los reintentos con la misma clave no vuelven a
+        cobrar: devuelven el pago del primer intento, esperando a que termine
+        si todavía está en curso.
+        """
+        if not idempotency_key:
+            return PaymentService._charge(user_id, reservation_id, payment_method, amount, card_data)
+        
+        with PaymentService._in_flight_lock:
+            in_flight = PaymentService._in_flight.get(idempotency_key)
+            if in_flight is None:
+                in_flight = PaymentService._in_flight[idempotency_key] = Event()
+                owner = True
+            else:
+                owner = False
+        
+        if not owner:
+            in_flight.wait(current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 30))
+            return PaymentService._replay(idempotency_key, user_id, reservation_id, amount)
+        
+        try:
+            # Un intento anterior (o de otro proceso) ya registró esta clave
+            payment = PaymentService._replay(idempotency_key, user_id, reservation_id, amount)
+            if payment is not None:
+                return payment
+            try:
+                return PaymentService._charge(
+                    user_id, reservation_id, payment_method, amount, card_data, idempotency_key
+                )
+            except IntegrityError:
+                # Otro proceso insertó la misma clave entre la consulta y el commit
+                db.session.rollback()
+                return PaymentService._replay(idempotency_key, user_id, reservation_id, amount)
+        finally:
+            with PaymentService._in_flight_lock:
+                PaymentService._in_flight.pop(idempotency_key, None)
+            in_flight.set()
+    
+    @staticmethod
+    def submit_payment(user_id, reservation_id, payment_method, amount, card_data=None, idempotency_key=None):
+        """Registrar el pago como pendiente y encolarlo; devuelve el pago sin esperar al gateway.
+        
+        Los workers de PaymentQueue hacen la llamada al gateway, los reintentos
+        y las transiciones de estado; el cliente consulta el resultado con
+        `get_status`. Con `idempotency_key`, un reenvío devuelve el pago ya registrado.
+        """
+        if idempotency_key:
+            payment = PaymentService._replay(idempotency_key, user_id, reservation_id, amount, wait=False)
+            if payment is not None:
+                return payment
+        try:
+            payment = PaymentService._create_pending(user_id, reservation_id, payment_method, amount, idempotency_key)
+        except IntegrityError:
+            db.session.rollback()
+            return PaymentService._replay(idempotency_key, user_id, reservation_id, amount, wait=False)
+        
+        try:
+            PaymentQueue.submit(payment.id, card_data)
+        except ValueError as e:
+            # Cola llena: el pago no se va a procesar, no dejarlo pendiente
+            payment.status = PaymentStatus.FAILED
+            payment.gateway_response = str(e)
+            db.session.commit()
+        return payment
+    
+    @staticmethod
+    def run_payment(payment_id, card_data=None):
+        """Procesar un pago encolado (lo llama un worker de PaymentQueue)"""
+        payment = db.session.get(Payment, payment_id)
+        if payment is None or payment.status != PaymentStatus.PENDING:
+            return payment
+        return PaymentService._settle(
+            payment, card_data, attempts=current_app.config.get('PAYMENT_MAX_ATTEMPTS', 3)
+        )
+    
+    @staticmethod
+    def get_status(payment_id, wait=0):
+        """Fila (id, user_id, reservation_id, status, gateway_response) del pago, por clave primaria.
+        
+        Con `wait` > 0 y el pago pendiente, espera hasta `wait` segundos a que termine.
+        """
+        def load():
+            return db.session.query(
+                Payment.id, Payment.user_id, Payment.reservation_id, Payment.status, Payment.gateway_response
+            ).filter(Payment.id == payment_id).first()
+        
+        row = load()
+        deadline = time.monotonic() + wait
+        while row is not None and row.status == PaymentStatus.PENDING and time.monotonic() < deadline:
+            # Si el pago se procesa en este proceso se despierta al terminar; si no, consultar de nuevo
+            PaymentQueue.wait(payment_id, min(deadline - time.monotonic(),
+                                              current_app.config.get('IDEMPOTENCY_POLL_SECONDS', 0.2)))
+            db.session.rollback()  # cerrar la transacción de lectura para ver commits nuevos
+            row = load()
+        return row
+    
+    @staticmethod
+    def _replay(idempotency_key, user_id, reservation_id, amount, wait=True):
+        """Pago ya registrado con la clave (None si no existe); si está pendiente, esperar su resultado"""
+        payment = Payment.query.filter_by(idempotency_key=idempotency_key).populate_existing().first()
+        if payment is None:
+            return None
+        if (payment.user_id, payment.reservation_id, payment.amount) != (user_id, reservation_id, amount):
+            raise ValueError("La clave de idempotencia ya se usó para otro pago")
+        if not wait:
+            return payment
+        
+        # El primer intento corre en otro proceso: consultar hasta que termine
+        deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 30)
+        while payment.status == PaymentStatus.PENDING and time.monotonic() < deadline:
+            time.sleep(current_app.config.get('IDEMPOTENCY_POLL_SECONDS', 0.2))
+            db.session.refresh(payment)
+        return payment
+    
+    @staticmethod
+    def _charge(user_id, reservation_id, payment_method, amount, card_data=None, idempotency_key=None):
+        payment = PaymentService._create_pending(user_id, reservation_id, payment_method, amount, idempotency_key)
+        return PaymentService._settle(payment, card_data)
+    
     @staticmethod
-    def process_payment(user_id, reservation_id, payment_method, amount, card_data=None):
-        """Procesar un pago"""
+    def _create_pending(user_id, reservation_id, payment_method, amount, idempotency_key=None):
         # Crear registro de pago
         payment = Payment(
             user_id=user_id,
@@ -17,40 +151,138 @@ class PaymentService:
             amount=amount,
             payment_method=payment_method,
             status=PaymentStatus.PENDING,
-            transaction_id=str(uuid.uuid4())
+            transaction_id=str(uuid.uuid4()),
+            idempotency_key=idempotency_key
         )
         
         db.session.add(payment)
         db.session.commit()
+        return payment
+    
+    @staticmethod
+    def _settle(payment, card_data=None, attempts=1):
+        """Cobrar un pago pendiente y aplicar el resultado a la reserva y los resúmenes.
+        
+        El pago, la confirmación de la reserva y sus correos (vía outbox) se
+        guardan con un solo commit. No se cobra si la reserva ya no se puede
+        confirmar; si deja de poder confirmarse durante el cobro, se reembolsa.
+        """
+        error = ReservationService.confirmation_error(payment.reservation_id)
+        if error is None:
+            try:
+                approved = PaymentService._call_gateway(payment, card_data, attempts)
+                error = None if approved else "Payment declined by gateway"
+            except Exception as e:
+                error = str(e)
+        if error is not None:
+            payment.status = PaymentStatus.FAILED
+            payment.gateway_response = error
+            db.session.commit()
+            return payment
         
         try:
-            # Simular procesamiento del pago
-            if PaymentService._simulate_payment_gateway(payment_method, amount, card_data):
-                payment.status = PaymentStatus.COMPLETED
-                payment.completed_at = datetime.now(timezone.utc)
-                
-                # Confirmar la reserva
-                ReservationService.confirm_reservation(reservation_id)
-                
-                # Enviar confirmación de pago
-                EmailService.send_payment_confirmation(payment.user, payment)
-                
-            else:
-                payment.status = PaymentStatus.FAILED
-                payment.gateway_response = "Payment declined by gateway"
-                
+            payment.status = PaymentStatus.COMPLETED
+            payment.completed_at = datetime.now(timezone.utc)
+            StatsService.record_payment(payment, PaymentStatus.PENDING)
+            
+            # Confirmar la reserva en la misma transacción
+            _, publish = ReservationService.stage_confirmation(payment.reservation_id)
+            Outbox.add('email.payment_confirmation', payment_id=payment.id)
+            db.session.commit()
         except Exception as e:
-            payment.status = PaymentStatus.FAILED
-            payment.gateway_response = str(e)
+            db.session.rollback()
+            return PaymentService._refund_captured(payment, str(e))
+        
+        publish()
+        return payment
+    
+    @staticmethod
+    def _refund_captured(payment, reason):
+        """Devolver un cobro aprobado cuya reserva no se pudo confirmar.
+        
+        Si el gateway no acepta el reembolso el pago queda COMPLETED con el
+        error, para reintentarlo con `refund_payment`.
+        """
+        try:
+            refunded = PaymentService._refund_gateway(payment, reason)
+            error = None if refunded else "Reembolso rechazado por el gateway"
+        except Exception as e:
+            error = str(e)
         
+        if error is None:
+            payment.status = PaymentStatus.REFUNDED
+            payment.gateway_response = f"Refunded: {reason}"
+        else:
+            payment.status = PaymentStatus.COMPLETED
+            payment.completed_at = datetime.now(timezone.utc)
+            payment.gateway_response = f"Refund failed: {error} ({reason})"
+            StatsService.record_payment(payment, PaymentStatus.PENDING)
         db.session.commit()
         return payment
     
     @staticmethod
-    def _simulate_payment_gateway(payment_method, amount, card_data=None):
-        """Simular gateway de pago (en producción usar Stripe, PayPal, etc.)"""
-        # Simulación: 95% de éxito, 5% de fallo
-        return random.random() < 0.95
+    def _call_gateway(payment, card_data, attempts):
+        """Llamar al gateway reintentando los errores (no los rechazos) con backoff exponencial"""
+        backoff = current_app.config.get('PAYMENT_RETRY_BACKOFF', 0.5)
+        for attempt in range(attempts):
+            try:
+                return PaymentService._charge_gateway(payment, card_data)
+            except (GatewayUnavailable, GatewayRejected):
+                # Circuito abierto o solicitud rechazada (4xx): reintentar no cambia nada
+                raise
+            except Exception:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+    
+    @staticmethod
+    def _charge_gateway(payment, card_data=None):
+        """Cobrar con el adaptador configurado (PAYMENT_GATEWAY); True si se aprobó"""
+        return get_gateway().charge(payment, card_data)
+    
+    @staticmethod
+    def _refund_gateway(payment, reason=None):
+        """Reembolsar con el adaptador configurado; True si el gateway lo aceptó"""
+        return get_gateway().refund(payment, reason)
+    
+    @staticmethod
+    def payment_rows(*criteria):
+        """Filas (id, user_id, reservation_id, court_id, amount, created_at, transaction_id) de los pagos que cumplen los criterios"""
+        return db.session.query(
+            Payment.id, Payment.user_id, Payment.reservation_id, Reservation.court_id,
+            Payment.amount, Payment.created_at, Payment.transaction_id
+        ).join(Reservation, Payment.reservation_id == Reservation.id).filter(*criteria).all()
+    
+    @staticmethod
+    def refund_at_gateway(rows, reason=None):
+        """Reembolsar en el gateway, en paralelo, pagos ya marcados como REFUNDED en la base de datos.
+        
+        Los que el gateway rechaza o no puede procesar vuelven a COMPLETED para
+        poder reintentarlos con `refund_payment`. Devuelve (reembolsados, errores).
+        """
+        if not rows:
+            return [], []
+        results, errors, _ = ParallelQueries.run({
+            row.id: lambda row=row: PaymentService._refund_gateway(row, reason) for row in rows
+        })
+        for row in rows:
+            if results[row.id] is False:
+                errors[row.id] = "Reembolso rechazado por el gateway"
+        failed = [row for row in rows if row.id in errors]
+        for row in failed:
+            db.session.execute(
+                update(Payment)
+                .where(Payment.id == row.id, Payment.status == PaymentStatus.REFUNDED)
+                .values(status=PaymentStatus.COMPLETED, gateway_response=f"Refund failed: {errors[row.id]}")
+                .execution_options(synchronize_session=False)
+            )
+        if failed:
+            StatsService.record_payments(failed, PaymentStatus.REFUNDED, PaymentStatus.COMPLETED)
+            db.session.commit()
+        refunded = [row for row in rows if row.id not in errors]
+        return refunded, [
+            {'payment_id': row.id, 'reservation_id': row.reservation_id, 'error': errors[row.id]} for row in failed
+        ]
     
     @staticmethod
     def refund_payment(payment_id, reason=None):
@@ -62,9 +294,12 @@ class PaymentService:
         if payment.status != PaymentStatus.COMPLETED:
             raise ValueError("Solo se pueden reembolsar pagos completados")
         
-        # Simular reembolso
+        if not PaymentService._refund_gateway(payment, reason):
+            raise ValueError("El gateway rechazó el reembolso")
+        
         payment.status = PaymentStatus.REFUNDED
         payment.gateway_response = f"Refunded: {reason}" if reason else "Refunded"
+        StatsService.record_payment(payment, PaymentStatus.COMPLETED)
         
         db.session.commit()
         return payment
\ No newline at end of file
@@ -1,24 +1,56 @@
-from app.models.payment import PaymentStatus
+from app.models.payment import Payment, PaymentStatus
 from app.models.user import db
-from app.models.reservation import Reservation, ReservationStatus
+from app.models.reservation import ACTIVE_STATUSES, Reservation, ReservationStatus
 from app.models.court import Court
-from app.services.email_service import EmailService
-from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+from app.models.reservation_slot import ReservationSlot
+from app.services.interval_index import CourtIntervalIndex, ReservationIndex
+from app.services.leaderboard import PopularCourts
+from app.services.outbox import Outbox
+from app.services.schedule_cache import ScheduleCache, ScheduleEntry
+from app.services.slot_engine import SlotBitmap, grid_slots, on_grid
+from app.services.slot_holds import SlotHolds
+from app.services.stats_service import StatsService
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, delete, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+import random
+import time
+
+RECURRENCE_STEPS = {
+    'weekly': timedelta(weeks=1),
+    'biweekly': timedelta(weeks=2),
+}
 
 class ReservationService:
     @staticmethod
     def check_availability(court_id, start_time, end_time, exclude_reservation_id=None):
-        """Verificar disponibilidad de una cancha en un horario específico"""
-        query = db.session.query(Reservation).filter(
+        """Verificar disponibilidad de una cancha en un horario específico.
+        
+        Solo mira reservas. Las retenciones de checkout reclaman sus slots en
+        reservation_slots, así que la restricción única rechaza al insertar una
+        reserva que choque con una; consultarlas aquí costaría un viaje a la
+        base de datos en cada verificación.
+        """
+        if ReservationIndex.enabled():
+            return ReservationIndex.find_overlap(
+                court_id, start_time, end_time, exclude_reservation_id
+            ) is None
+        return ReservationService._check_availability_sql(
+            court_id, start_time, end_time, exclude_reservation_id
+        )
+
+    @staticmethod
+    def _check_availability_sql(court_id, start_time, end_time, exclude_reservation_id=None):
+        """Verificar disponibilidad consultando directamente la tabla de reservas"""
+        # Dos intervalos se solapan si cada uno empieza antes de que termine el otro;
+        # como rango simple sobre start_time puede resolverse con el índice parcial.
+        query = db.session.query(Reservation.id).filter(
             and_(
                 Reservation.court_id == court_id,
-                Reservation.status.in_([ReservationStatus.PENDING, ReservationStatus.CONFIRMED]),
-                or_(
-                    and_(Reservation.start_time <= start_time, Reservation.end_time > start_time),
-                    and_(Reservation.start_time < end_time, Reservation.end_time >= end_time),
-                    and_(Reservation.start_time >= start_time, Reservation.end_time <= end_time)
-                )
+                Reservation.active_filter(),
+                Reservation.start_time < end_time,
+                Reservation.end_time > start_time
             )
         )
         
@@ -28,8 +60,46 @@ class ReservationService:
         return query.first() is None
     
     @staticmethod
-    def create_reservation(user_id, court_id, start_time, end_time, notes=None):
+    def create_reservation(user_id, court_id, start_time, end_time, notes=None, hold_id=None):
         """Crear una nueva reserva"""
+        def attempt():
+            try:
+                reservation = ReservationService.stage_reservation(
+                    user_id, court_id, start_time, end_time, notes=notes, hold_id=hold_id
+                )
+                db.session.commit()
+            except ValueError:
+                db.session.rollback()
+                raise
+            return reservation
+        
+        reservation = ReservationService._with_lock_retries(attempt)
+        ReservationService.publish_created([reservation])
+        return reservation
+    
+    @staticmethod
+    def _with_lock_retries(attempt):
+        """Ejecutar `attempt` (que hace su propio commit) reintentando con backoff los bloqueos transitorios"""
+        max_retries = current_app.config.get('BOOKING_MAX_RETRIES', 5)
+        backoff = current_app.config.get('BOOKING_RETRY_BACKOFF', 0.02)
+        
+        for retry in range(max_retries + 1):
+            try:
+                return attempt()
+            except OperationalError as e:
+                db.session.rollback()
+                if not ReservationService._is_lock_error(e) or retry == max_retries:
+                    raise
+                # Backoff exponencial con jitter antes de reintentar
+                time.sleep(backoff * (2 ** retry) * (1 + random.random()))
+    
+    @staticmethod
+    def stage_reservation(user_id, court_id, start_time, end_time, notes=None, hold_id=None):
+        """Validar e insertar una reserva PENDING con sus slots (dentro de la transacción actual, sin commit).
+        
+        Tras el commit hay que llamar a `publish_created`. Si el horario ya no
+        está libre lanza ValueError y deshace solo lo que insertó.
+        """
         court = db.session.get(Court, court_id)
         if not court:
             raise ValueError("Cancha no encontrada")
@@ -37,45 +107,335 @@ class ReservationService:
         # Validar horario de la cancha
         if (start_time.time() < court.opening_time) or (end_time.time() > court.closing_time):
             raise ValueError("La reserva está fuera del horario de la cancha")
+        ReservationService.check_grid(start_time, end_time)
         
-        # Verificar disponibilidad
+        # Verificar disponibilidad (rápido, en memoria)
         if not ReservationService.check_availability(court_id, start_time, end_time):
             raise ValueError("La cancha no está disponible en el horario seleccionado")
         
         # Calcular duración y costo
         duration = (end_time - start_time).total_seconds() / 3600
-        total_amount = duration * court.hourly_rate
-        
-        # Crear reserva
         reservation = Reservation(
             user_id=user_id,
             court_id=court_id,
             start_time=start_time,
             end_time=end_time,
-            total_amount=total_amount,
+            total_amount=duration * court.hourly_rate,
             notes=notes,
             status=ReservationStatus.PENDING
         )
         
-        db.session.add(reservation)
-        db.session.commit()
-        
+        # La reserva y sus slots se insertan juntos: si otro escritor reclamó
+        # alguno de los slots, la restricción única lo rechaza.
+        try:
+            with db.session.begin_nested():
+                db.session.add(reservation)
+                db.session.flush()
+                # La retención cede sus slots a la reserva en la misma transacción
+                if hold_id:
+                    SlotHolds.release(hold_id)
+                ReservationService._claim_slots([reservation])
+                StatsService.record_reservations([reservation])
+        except IntegrityError:
+            ReservationIndex.invalidate(court_id)
+            raise ValueError("La cancha no está disponible en el horario seleccionado")
         return reservation
     
+    @staticmethod
+    def publish_created(reservations):
+        """Propagar reservas nuevas ya confirmadas en la base de datos a índices y ranking"""
+        ReservationService._publish_changes(reservations)
+        PopularCourts.record_reservations(reservations, 1)
+    
+    @staticmethod
+    def hold_slot(user_id, court_id, start_time, end_time, notes=None):
+        """Retener un horario durante el checkout sin crear la reserva todavía"""
+        court = db.session.get(Court, court_id)
+        if not court:
+            raise ValueError("Cancha no encontrada")
+        
+        if (start_time.time() < court.opening_time) or (end_time.time() > court.closing_time):
+            raise ValueError("La reserva está fuera del horario de la cancha")
+        ReservationService.check_grid(start_time, end_time)
+        
+        if not ReservationService.check_availability(court_id, start_time, end_time):
+            raise ValueError("La cancha no está disponible en el horario seleccionado")
+        
+        duration = (end_time - start_time).total_seconds() / 3600
+        return SlotHolds.acquire(user_id, court_id, start_time, end_time, duration * court.hourly_rate, notes)
+    
+    @staticmethod
+    def reserve_held_slot(hold_id, user_id):
+        """Convertir una retención vigente en una reserva PENDING al iniciar el pago"""
+        hold = SlotHolds.get(hold_id)
+        if not hold:
+            raise ValueError("La retención del horario expiró. Selecciona el horario de nuevo")
+        if hold.user_id != user_id:
+            raise ValueError("No tienes permisos para usar esta retención")
+        
+        return ReservationService.create_reservation(
+            user_id, hold.court_id, hold.start_time, hold.end_time, notes=hold.notes, hold_id=hold.id
+        )
+    
+    @staticmethod
+    def expand_recurrence(start_time, end_time, frequency='weekly', count=None, until=None):
+        """Expandir una regla semanal o quincenal en la lista de (start_time, end_time) de cada ocurrencia"""
+        if frequency not in RECURRENCE_STEPS:
+            raise ValueError("Frecuencia inválida. Use 'weekly' o 'biweekly'")
+        if not count and not until:
+            raise ValueError("Indica la cantidad de ocurrencias o la fecha final de la serie")
+        
+        step = RECURRENCE_STEPS[frequency]
+        max_occurrences = current_app.config.get('MAX_SERIES_OCCURRENCES', 52)
+        occurrences = []
+        current = start_time
+        while (not count or len(occurrences) < count) and (not until or current.date() <= until):
+            if len(occurrences) == max_occurrences:
+                raise ValueError(f"Una serie no puede tener más de {max_occurrences} ocurrencias")
+            occurrences.append((current, current + (end_time - start_time)))
+            current += step
+        return occurrences
+    
+    @staticmethod
+    def create_recurring_reservations(user_id, court_id, start_time, end_time, frequency='weekly',
+                                      count=None, until=None, notes=None, skip_conflicts=True):
+        """Crear una serie de reservas recurrentes detectando todos los conflictos con una sola consulta.
+        
+        `conflict_with` es el id de la reserva que choca, o 'held' si la ocurrencia
+        está retenida en un checkout en curso.
+        """
+        court = db.session.get(Court, court_id)
+        if not court:
+            raise ValueError("Cancha no encontrada")
+        
+        if (start_time.time() < court.opening_time) or (end_time.time() > court.closing_time):
+            raise ValueError("La reserva está fuera del horario de la cancha")
+        ReservationService.check_grid(start_time, end_time)
+        
+        occurrences = ReservationService.expand_recurrence(start_time, end_time, frequency, count, until)
+        if not occurrences:
+            raise ValueError("La serie no tiene ocurrencias")
+        
+        # Una consulta para todo el rango de la serie y cruce en memoria con cada ocurrencia
+        range_start, range_end = occurrences[0][0], occurrences[-1][1]
+        existing = CourtIntervalIndex(db.session.query(
+            Reservation.id, Reservation.start_time, Reservation.end_time
+        ).filter(
+            Reservation.court_id == court_id,
+            Reservation.active_filter(),
+            Reservation.start_time < range_end,
+            Reservation.end_time > range_start
+        ).all())
+        # Las retenciones de checkout también reclaman slots (incluidas las del propio usuario);
+        # su id no se expone porque es la URL del checkout
+        held = CourtIntervalIndex()
+        if SlotHolds.enabled():
+            for position, (_, hold_start, hold_end) in enumerate(
+                    SlotHolds.intervals([court_id], range_start, range_end)):
+                held.add(position, hold_start, hold_end)
+        
+        results = []
+        for occurrence_start, occurrence_end in occurrences:
+            conflict_id = existing.find_overlap(occurrence_start, occurrence_end)
+            if conflict_id is None and held.find_overlap(occurrence_start, occurrence_end) is not None:
+                conflict_id = 'held'
+            results.append({
+                'start_time': occurrence_start,
+                'end_time': occurrence_end,
+                'conflict_with': conflict_id,
+                'reservation': None
+            })
+        
+        has_conflicts = any(r['conflict_with'] for r in results)
+        if has_conflicts and not skip_conflicts:
+            return results
+        
+        # Insertar todas las ocurrencias aceptadas en una sola transacción
+        duration = (end_time - start_time).total_seconds() / 3600
+        accepted = [r for r in results if not r['conflict_with']]
+        
+        def attempt():
+            reservations = [
+                Reservation(
+                    user_id=user_id,
+                    court_id=court_id,
+                    start_time=result['start_time'],
+                    end_time=result['end_time'],
+                    total_amount=duration * court.hourly_rate,
+                    notes=notes,
+                    status=ReservationStatus.PENDING
+                )
+                for result in accepted
+            ]
+            try:
+                db.session.add_all(reservations)
+                db.session.flush()
+                ReservationService._claim_slots(reservations)
+                StatsService.record_reservations(reservations)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                ReservationIndex.invalidate(court_id)
+                raise ValueError("Otra reserva ocupó parte de la serie mientras se creaba. Intenta de nuevo")
+            return reservations
+        
+        reservations = ReservationService._with_lock_retries(attempt)
+        for result, reservation in zip(accepted, reservations):
+            result['reservation'] = reservation
+        
+        ReservationService._publish_changes(reservations)
+        PopularCourts.record_reservations(reservations, 1)
+        return results
+    
+    @staticmethod
+    def check_grid(start_time, end_time):
+        """Exigir que inicio y fin caigan en la rejilla de SLOT_MINUTES.
+        
+        Los reclamos cubren slots enteros: un horario fuera de la rejilla
+        reclamaría el slot compartido con una reserva contigua.
+        """
+        slot_minutes = current_app.config.get('SLOT_MINUTES', 15)
+        if not (on_grid(start_time, slot_minutes) and on_grid(end_time, slot_minutes)):
+            raise ValueError(f"Los horarios deben comenzar y terminar en bloques de {slot_minutes} minutos")
+    
+    @staticmethod
+    def reclaim_slots(chunk_size=None):
+        """Rehacer los reclamos de las reservas activas con el SLOT_MINUTES actual.
+        
+        Hay que ejecutarlo tras cambiar SLOT_MINUTES; descarta las retenciones de
+        checkout en curso. Devuelve los ids de las
+        reservas cuyos slots chocan con otra en la nueva rejilla (quedan sin reclamo).
+        """
+        chunk_size = chunk_size or current_app.config.get('EXPIRY_CHUNK_SIZE', 500)
+        # Las retenciones en curso también están en la rejilla anterior: se descartan
+        SlotHolds.clear()
+        db.session.execute(delete(ReservationSlot))
+        conflicts = []
+        last_id = 0
+        while True:
+            reservations = Reservation.query.filter(
+                Reservation.active_filter(), Reservation.id > last_id
+            ).order_by(Reservation.id).limit(chunk_size).all()
+            if not reservations:
+                break
+            try:
+                with db.session.begin_nested():
+                    ReservationService._claim_slots(reservations)
+            except IntegrityError:
+                # Reclamar de a una para encontrar las que chocan
+                for reservation in reservations:
+                    try:
+                        with db.session.begin_nested():
+                            ReservationService._claim_slots([reservation])
+                    except IntegrityError:
+                        conflicts.append(reservation.id)
+            last_id = reservations[-1].id
+        db.session.commit()
+        ReservationIndex.invalidate()
+        return conflicts
+    
+    @staticmethod
+    def _claim_slots(reservations):
+        """Reclamar los slots de la rejilla que ocupan las reservas (dentro de la transacción actual)"""
+        slot_minutes = current_app.config.get('SLOT_MINUTES', 15)
+        claims = [
+            {'court_id': reservation.court_id, 'slot_start': slot_start, 'reservation_id': reservation.id}
+            for reservation in reservations
+            for slot_start in grid_slots(reservation.start_time, reservation.end_time, slot_minutes)
+        ]
+        if claims:
+            # Una retención vencida todavía ocupa sus slots hasta que se borra
+            if SlotHolds.enabled():
+                SlotHolds.purge(court_ids={claim['court_id'] for claim in claims})
+            db.session.execute(insert(ReservationSlot), claims)
+    
+    @staticmethod
+    def _release_slots(reservation_ids):
+        """Liberar los slots reclamados por las reservas indicadas (dentro de la transacción actual)"""
+        db.session.execute(
+            delete(ReservationSlot).where(ReservationSlot.reservation_id.in_(reservation_ids))
+        )
+    
+    @staticmethod
+    def _publish_changes(reservations):
+        """Propagar reservas ya confirmadas en la base de datos a los índices y cachés en memoria"""
+        for reservation in reservations:
+            ReservationIndex.sync(reservation)
+            ScheduleCache.bump(reservation.court_id, reservation.start_time, reservation.end_time)
+    
+    @staticmethod
+    def _publish_bulk_changes(rows):
+        """Versión de _publish_changes para filas (id, court_id, start_time, end_time) canceladas en bloque"""
+        for row in rows:
+            ReservationIndex.discard(row.court_id, row.id)
+            ScheduleCache.bump(row.court_id, row.start_time, row.end_time)
+    
+    @staticmethod
+    def _is_lock_error(error):
+        """Errores transitorios de bloqueo de SQLite que vale la pena reintentar"""
+        message = str(error.orig).lower()
+        return 'locked' in message or 'busy' in message
+    
     @staticmethod
     def confirm_reservation(reservation_id):
         """Confirmar una reserva"""
+        reservation, publish = ReservationService.stage_confirmation(reservation_id)
+        db.session.commit()
+        publish()
+        return reservation
+    
+    @staticmethod
+    def confirmation_error(reservation_id):
+        """Motivo por el que la reserva no se puede confirmar ahora, o None si se puede.
+        
+        Se confirman las pendientes (que ya tienen sus slots) y las canceladas
+        cuyo horario sigue libre; no las confirmadas ni las completadas.
+        """
+        reservation = db.session.get(Reservation, reservation_id)
+        if not reservation:
+            return "Reserva no encontrada"
+        if reservation.status == ReservationStatus.PENDING:
+            return None
+        if reservation.status == ReservationStatus.CANCELLED and ReservationService.check_availability(
+            reservation.court_id, reservation.start_time, reservation.end_time, exclude_reservation_id=reservation.id
+        ):
+            return None
+        if reservation.status == ReservationStatus.CANCELLED:
+            return "La cancha no está disponible en el horario seleccionado"
+        return "La reserva ya no está pendiente de pago"
+    
+    @staticmethod
+    def stage_confirmation(reservation_id):
+        """Confirmar una reserva dentro de la transacción actual, sin commit.
+        
+        Devuelve (reserva, publish): `publish` propaga el cambio a los índices en
+        memoria y hay que llamarla después del commit.
+        """
         reservation = db.session.get(Reservation, reservation_id)
         if not reservation:
             raise ValueError("Reserva no encontrada")
         
+        # Una reserva cancelada que se vuelve a confirmar debe reclamar de nuevo sus slots
+        reclaim = not reservation.is_active()
+        old_status = reservation.status
         reservation.status = ReservationStatus.CONFIRMED
-        db.session.commit()
+        try:
+            if reclaim:
+                ReservationService._claim_slots([reservation])
+        except IntegrityError:
+            db.session.rollback()
+            ReservationIndex.invalidate(reservation.court_id)
+            raise ValueError("La cancha no está disponible en el horario seleccionado")
+        StatsService.record_reservations([reservation], old_status)
         
-        # Enviar confirmación por email
-        EmailService.send_reservation_confirmation(reservation.user, reservation)
+        # Confirmación por email, despachada por el outbox tras el commit
+        Outbox.add('email.reservation_confirmation', reservation_id=reservation.id)
         
-        return reservation
+        def publish():
+            ReservationService._publish_changes([reservation])
+            if old_status == ReservationStatus.CANCELLED:
+                PopularCourts.record_reservations([reservation], 1)
+        return reservation, publish
     
     @staticmethod
     def cancel_reservation(reservation_id, user_id=None):
@@ -87,18 +447,221 @@ class ReservationService:
         if user_id and reservation.user_id != user_id:
             raise ValueError("No tienes permisos para cancelar esta reserva")
         
-        # Actualizar estado de la reserva
+        # Actualizar estado de la reserva y liberar sus slots
+        old_status = reservation.status
         reservation.status = ReservationStatus.CANCELLED
+        ReservationService._release_slots([reservation.id])
+        StatsService.record_reservations([reservation], old_status)
         
         # Actualizar pagos asociados
+        refunded_ids = []
         for payment in reservation.payments:
             if payment.status == PaymentStatus.COMPLETED:
                 payment.status = PaymentStatus.REFUNDED
                 payment.gateway_response = "Refunded due to reservation cancellation"
+                StatsService.record_payment(payment, PaymentStatus.COMPLETED)
+                refunded_ids.append(payment.id)
         
+        if old_status != ReservationStatus.CANCELLED:
+            Outbox.add('email.reservation_cancellation', reservation_id=reservation.id)
         db.session.commit()
+        ReservationService._publish_changes([reservation])
+        if old_status != ReservationStatus.CANCELLED:
+            PopularCourts.record_reservations([reservation], -1)
+        if refunded_ids:
+            from app.services.payment_service import PaymentService
+            PaymentService.refund_at_gateway(PaymentService.payment_rows(Payment.id.in_(refunded_ids)))
+        
+        # Ofrecer el horario liberado a la lista de espera
+        from app.services.waitlist_service import WaitlistService
+        WaitlistService.promote_safely(reservation.court_id, reservation.start_time, reservation.end_time)
         return reservation
 
+    @staticmethod
+    def bulk_cancel(court_id, start_time, end_time, reason=None, chunk_size=None, notify=True):
+        """Cancelar y reembolsar todas las reservas activas de una cancha en un rango (cierre por mantenimiento o clima).
+        
+        Cada lote se cancela con UPDATEs por conjunto sobre reservas y pagos en
+        una sola transacción; después se piden los reembolsos al gateway y se
+        envían los avisos en paralelo. Los horarios liberados no se ofrecen a
+        la lista de espera porque la cancha está cerrada. Devuelve un resumen.
+        """
+        from app.services.payment_service import PaymentService
+        chunk_size = chunk_size or current_app.config.get('BULK_CANCEL_CHUNK_SIZE', 200)
+        note = f"Refunded: {reason}" if reason else "Refunded due to reservation cancellation"
+        report = {
+            'court_id': court_id,
+            'start': start_time.isoformat(),
+            'end': end_time.isoformat(),
+            'cancelled': 0,
+            'by_status': {ReservationStatus.PENDING.value: 0, ReservationStatus.CONFIRMED.value: 0},
+            'refunded': 0,
+            'refunded_amount': 0.0,
+            'refund_errors': [],
+            'notified': 0,
+        }
+        
+        while True:
+            candidates = db.session.query(Reservation.id, Reservation.status).filter(
+                Reservation.court_id == court_id,
+                Reservation.active_filter(),
+                Reservation.start_time < end_time,
+                Reservation.end_time > start_time
+            ).order_by(Reservation.start_time).limit(chunk_size).all()
+            if not candidates:
+                break
+            
+            rows = []
+            for old_status in ACTIVE_STATUSES:
+                ids = [candidate.id for candidate in candidates if candidate.status == old_status]
+                if not ids:
+                    continue
+                stamp = datetime.now(timezone.utc)
+                db.session.execute(
+                    update(Reservation)
+                    .where(Reservation.id.in_(ids), Reservation.status == old_status)
+                    .values(status=ReservationStatus.CANCELLED, updated_at=stamp)
+                    .execution_options(synchronize_session=False)
+                )
+                # Solo las que cambió este UPDATE, para registrar en los resúmenes su estado anterior real
+                changed = db.session.query(
+                    Reservation.id, Reservation.user_id, Reservation.court_id, Reservation.start_time,
+                    Reservation.end_time, Reservation.created_at
+                ).filter(
+                    Reservation.id.in_(ids),
+                    Reservation.status == ReservationStatus.CANCELLED,
+                    Reservation.updated_at == stamp
+                ).all()
+                if changed:
+                    StatsService.record_reservations(changed, old_status, ReservationStatus.CANCELLED)
+                    report['by_status'][old_status.value] += len(changed)
+                    rows.extend(changed)
+            
+            payments = []
+            if rows:
+                cancelled_ids = [row.id for row in rows]
+                ReservationService._release_slots(cancelled_ids)
+                payments = PaymentService.payment_rows(
+                    Payment.reservation_id.in_(cancelled_ids), Payment.status == PaymentStatus.COMPLETED
+                )
+                if payments:
+                    db.session.execute(
+                        update(Payment)
+                        .where(Payment.id.in_([payment.id for payment in payments]),
+                               Payment.status == PaymentStatus.COMPLETED)
+                        .values(status=PaymentStatus.REFUNDED, gateway_response=note)
+                        .execution_options(synchronize_session=False)
+                    )
+                    StatsService.record_payments(payments, PaymentStatus.COMPLETED, PaymentStatus.REFUNDED)
+                if notify:
+                    Outbox.add_many('email.reservation_cancellation', [{'reservation_id': row.id} for row in rows])
+            db.session.commit()
+            
+            ReservationService._publish_bulk_changes(rows)
+            PopularCourts.record_reservations(rows, -1)
+            refunded, errors = PaymentService.refund_at_gateway(payments, reason)
+            report['cancelled'] += len(rows)
+            report['refunded'] += len(refunded)
+            report['refunded_amount'] += sum(payment.amount for payment in refunded)
+            report['refund_errors'].extend(errors)
+            if notify:
+                report['notified'] += len(rows)
+            if len(candidates) < chunk_size:
+                break
+        
+        report['refunded_amount'] = round(report['refunded_amount'], 2)
+        return report
+    
+    @staticmethod
+    def expire_pending_reservations(now=None, hold_minutes=None, chunk_size=None):
+        """Cancelar en lotes las reservas pendientes cuyo tiempo de retención venció"""
+        hold_minutes = hold_minutes or current_app.config.get('PENDING_HOLD_MINUTES', 30)
+        chunk_size = chunk_size or current_app.config.get('EXPIRY_CHUNK_SIZE', 500)
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - timedelta(minutes=hold_minutes)
+        from app.services.waitlist_service import WaitlistService
+        
+        expired = 0
+        while True:
+            candidates = db.session.query(Reservation.id).filter(
+                Reservation.status_filter(ReservationStatus.PENDING),
+                Reservation.created_at < cutoff
+            ).order_by(Reservation.created_at).limit(chunk_size).all()
+            if not candidates:
+                break
+            
+            candidate_ids = [row.id for row in candidates]
+            db.session.execute(
+                update(Reservation)
+                .where(Reservation.id.in_(candidate_ids), Reservation.status == ReservationStatus.PENDING)
+                .values(status=ReservationStatus.CANCELLED, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            # Solo las que realmente cambió este UPDATE (otra petición pudo confirmarlas)
+            rows = db.session.query(
+                Reservation.id, Reservation.user_id, Reservation.court_id, Reservation.start_time,
+                Reservation.end_time, Reservation.created_at
+            ).filter(
+                Reservation.id.in_(candidate_ids),
+                Reservation.status == ReservationStatus.CANCELLED,
+                Reservation.updated_at == now
+            ).all()
+            if rows:
+                ReservationService._release_slots([row.id for row in rows])
+                StatsService.record_reservations(rows, ReservationStatus.PENDING, ReservationStatus.CANCELLED)
+            db.session.commit()
+            
+            ReservationService._publish_bulk_changes(rows)
+            PopularCourts.record_reservations(rows, -1)
+            for row in rows:
+                WaitlistService.promote_safely(row.court_id, row.start_time, row.end_time)
+            expired += len(rows)
+            if len(candidates) < chunk_size:
+                break
+        
+        return expired
+    
+    @staticmethod
+    def complete_finished_reservations(now=None, chunk_size=None):
+        """Marcar en lotes como completadas las reservas confirmadas que ya terminaron"""
+        chunk_size = chunk_size or current_app.config.get('EXPIRY_CHUNK_SIZE', 500)
+        now = now or datetime.now()
+        completed = 0
+        while True:
+            candidates = db.session.query(Reservation.id).filter(
+                Reservation.status_filter(ReservationStatus.CONFIRMED),
+                Reservation.end_time <= now
+            ).order_by(Reservation.end_time).limit(chunk_size).all()
+            if not candidates:
+                break
+            
+            candidate_ids = [row.id for row in candidates]
+            stamp = datetime.now(timezone.utc)
+            db.session.execute(
+                update(Reservation)
+                .where(Reservation.id.in_(candidate_ids), Reservation.status == ReservationStatus.CONFIRMED)
+                .values(status=ReservationStatus.COMPLETED, updated_at=stamp)
+                .execution_options(synchronize_session=False)
+            )
+            rows = db.session.query(
+                Reservation.id, Reservation.user_id, Reservation.court_id, Reservation.start_time, Reservation.end_time
+            ).filter(
+                Reservation.id.in_(candidate_ids),
+                Reservation.status == ReservationStatus.COMPLETED,
+                Reservation.updated_at == stamp
+            ).all()
+            if rows:
+                ReservationService._release_slots([row.id for row in rows])
+                StatsService.record_reservations(rows, ReservationStatus.CONFIRMED, ReservationStatus.COMPLETED)
+            db.session.commit()
+            
+            ReservationService._publish_bulk_changes(rows)
+            completed += len(rows)
+            if len(candidates) < chunk_size:
+                break
+        
+        return completed
+    
     @staticmethod
     def get_user_reservations(user_id, include_cancelled=False):
         """Obtener reservas de un usuario"""
@@ -112,11 +675,137 @@ class ReservationService:
     @staticmethod
     def get_court_schedule(court_id, date):
         """Obtener horarios ocupados de una cancha para una fecha específica"""
-        return Reservation.query.filter(
+        def load():
+            rows = db.session.query(
+                Reservation.id, Reservation.start_time, Reservation.end_time,
+                Reservation.user_id, Reservation.status
+            ).filter(
+                Reservation.court_id == court_id,
+                Reservation.start_time >= datetime.combine(date, datetime.min.time()),
+                Reservation.end_time <= datetime.combine(date, datetime.max.time()),
+                Reservation.active_filter()
+            ).order_by(Reservation.start_time).all()
+            return [ScheduleEntry(*row) for row in rows]
+        
+        if ScheduleCache.enabled():
+            return ScheduleCache.get(court_id, date, load)
+        return load()
+    
+    @staticmethod
+    def get_available_slots(court_id, date, duration_minutes=None, slot_minutes=None, min_duration_minutes=None,
+                            user_id=None):
+        """Obtener las horas de inicio libres de una cancha para una fecha y duración.
+        
+        Los horarios retenidos en un checkout cuentan como ocupados, salvo los del propio `user_id`.
+        """
+        slot_minutes = slot_minutes or current_app.config.get('SLOT_MINUTES', 15)
+        min_duration_minutes = min_duration_minutes or current_app.config.get('MIN_BOOKING_MINUTES', 60)
+        duration_minutes = duration_minutes or min_duration_minutes
+        
+        if duration_minutes < min_duration_minutes:
+            raise ValueError(f"La duración mínima de una reserva es de {min_duration_minutes} minutos")
+        if duration_minutes % slot_minutes:
+            raise ValueError("La duración debe ser múltiplo de la granularidad de los slots")
+        
+        court = db.session.get(Court, court_id)
+        if not court:
+            raise ValueError("Cancha no encontrada")
+        if not court.is_active:
+            return []
+        
+        # Construir el mapa de ocupación del día con las reservas activas
+        bitmap = SlotBitmap.for_day(court, date, slot_minutes)
+        day_end = bitmap.opening + bitmap.slot * bitmap.size
+        for start_time, end_time in ReservationService._active_intervals(court_id, bitmap.opening, day_end):
+            bitmap.occupy(start_time, end_time)
+        if SlotHolds.enabled():
+            for _, start_time, end_time in SlotHolds.intervals([court_id], bitmap.opening, day_end, user_id):
+                bitmap.occupy(start_time, end_time)
+        
+        # No ofrecer horarios que ya pasaron
+        now = datetime.now()
+        if bitmap.opening < now:
+            bitmap.block_before(now)
+        
+        starts = bitmap.free_starts(duration_minutes // slot_minutes)
+        return [slot.time() for slot in bitmap.slot_times(starts)]
+    
+    @staticmethod
+    def get_availability_grid(start_date, days=14, court_ids=None, slot_minutes=None, encoding='bits', user_id=None):
+        """Matriz canchas x días x slots de ocupación para un rango de fechas con una sola consulta de reservas.
+        
+        Los horarios retenidos en un checkout cuentan como ocupados, salvo los del propio `user_id`.
+        """
+        slot_minutes = slot_minutes or current_app.config.get('SLOT_MINUTES', 15)
+        if encoding not in ('bits', 'rle'):
+            raise ValueError("Codificación inválida. Use 'bits' o 'rle'")
+        
+        courts_query = Court.query.filter(Court.is_active == True)
+        if court_ids:
+            courts_query = courts_query.filter(Court.id.in_(court_ids))
+        courts = courts_query.order_by(Court.id).all()
+        
+        dates = [start_date + timedelta(days=i) for i in range(days)]
+        bitmaps = {
+            court.id: {day: SlotBitmap.for_day(court, day, slot_minutes) for day in dates}
+            for court in courts
+        }
+        
+        range_start = datetime.combine(start_date, datetime.min.time())
+        range_end = range_start + timedelta(days=days)
+        rows = db.session.query(
+            Reservation.court_id, Reservation.start_time, Reservation.end_time
+        ).filter(
+            Reservation.court_id.in_(list(bitmaps)),
+            Reservation.active_filter(),
+            Reservation.start_time < range_end,
+            Reservation.end_time > range_start
+        ).all()
+        if SlotHolds.enabled() and bitmaps:
+            rows += SlotHolds.intervals(list(bitmaps), range_start, range_end, user_id)
+        
+        # Agrupar en memoria: cada reserva o retención marca los días que toca
+        for court_id, start_time, end_time in rows:
+            court_days = bitmaps[court_id]
+            day = start_time.date()
+            while day <= end_time.date():
+                if day in court_days:
+                    court_days[day].occupy(start_time, end_time)
+                day += timedelta(days=1)
+        
+        return {
+            'start_date': start_date.isoformat(),
+            'days': days,
+            'slot_minutes': slot_minutes,
+            'encoding': encoding,
+            'courts': [
+                {
+                    'id': court.id,
+                    'name': court.name,
+                    'opening_time': court.opening_time.strftime('%H:%M'),
+                    'closing_time': court.closing_time.strftime('%H:%M'),
+                    'days': {
+                        day.isoformat(): bitmap.to_bitstring() if encoding == 'bits' else bitmap.to_runs()
+                        for day, bitmap in bitmaps[court.id].items()
+                    }
+                }
+                for court in courts
+            ]
+        }
+    
+    @staticmethod
+    def _active_intervals(court_id, range_start, range_end):
+        """Intervalos (start_time, end_time) activos de una cancha que cruzan el rango"""
+        if ReservationIndex.enabled():
+            return [
+                (start_time, end_time)
+                for _, start_time, end_time in ReservationIndex.overlaps(court_id, range_start, range_end)
+            ]
+        return db.session.query(Reservation.start_time, Reservation.end_time).filter(
             Reservation.court_id == court_id,
-            Reservation.start_time >= datetime.combine(date, datetime.min.time()),
-            Reservation.end_time <= datetime.combine(date, datetime.max.time()),
-            Reservation.status != 'cancelled'
+            Reservation.active_filter(),
+            Reservation.start_time < range_end,
+            Reservation.end_time > range_start
         ).all()
     
     @staticmethod
@@ -134,9 +823,8 @@ class ReservationService:
     def get_recent_reservations(user_id, limit=5):
         """Obtener reservas recientes del usuario (últimas completadas)"""
         now = datetime.now()
-        return Reservation.query.filter_by(
-            user_id=user_id,
-            status=ReservationStatus.CONFIRMED
-        ).filter(
+        return Reservation.query.filter(
+            Reservation.user_id == user_id,
+            Reservation.status_filter(ReservationStatus.CONFIRMED, ReservationStatus.COMPLETED),
             Reservation.end_time < now
         ).order_by(Reservation.end_time.desc()).limit(limit).all()
@@ -0,0 +1,127 @@
+from app.models.reservation import Reservation
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import event
+from threading import Lock
+import sys
+import time
+
+# Fila compacta del horario de una cancha (en lugar del objeto ORM)
+ScheduleEntry = namedtuple('ScheduleEntry', ['id', 'start_time', 'end_time', 'user_id', 'status'])
+
+
+def _entry_size(key, rows):
+    """Tamaño aproximado en bytes de una entrada de la caché, con su versión"""
+    size = sys.getsizeof(rows) + sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(0)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class ScheduleCache:
+    """Caché LRU de horarios por (court_id, fecha) invalidada por versiones.
+
+    Cada mutación de una reserva avanza un reloj global y le asigna ese valor
+    como versión a los días que toca; una entrada solo se sirve si se guardó
+    con la versión vigente de su día. Solo los días cacheados guardan su
+    versión (y se desalojan con ella); el resto comparte `_floor`, que avanza
+    cuando se invalida un día sin entrada o se descarta una versión, de modo
+    que la versión vigente de un día nunca retrocede.
+    """
+
+    _entries = OrderedDict()   # (court_id, date) -> (version, stored_at, size, rows)
+    _versions = {}             # (court_id, date) -> versión actual, solo de los días cacheados
+    _clock = 0
+    _floor = 0
+    _bytes = 0
+    _stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    _lock = Lock()
+
+    @staticmethod
+    def enabled():
+        return current_app.config.get('SCHEDULE_CACHE_ENABLED', True)
+
+    @classmethod
+    def get(cls, court_id, date, loader):
+        """Devolver el horario cacheado o cargarlo con `loader()` si no está vigente"""
+        key = (court_id, date)
+        ttl = current_app.config.get('SCHEDULE_CACHE_TTL', 60)
+        with cls._lock:
+            version = cls._versions.get(key, cls._floor)
+            entry = cls._entries.get(key)
+            if entry is not None and entry[0] == version and (not ttl or time.monotonic() - entry[1] < ttl):
+                cls._entries.move_to_end(key)
+                cls._stats['hits'] += 1
+                return entry[3]
+            cls._stats['misses'] += 1
+
+        rows = tuple(loader())
+        cls.put(court_id, date, version, rows)
+        return rows
+
+    @classmethod
+    def put(cls, court_id, date, version, rows):
+        key = (court_id, date)
+        size = _entry_size(key, rows)
+        max_entries = current_app.config.get('SCHEDULE_CACHE_MAX_ENTRIES', 2048)
+        max_bytes = current_app.config.get('SCHEDULE_CACHE_MAX_BYTES', 4 * 1024 * 1024)
+        with cls._lock:
+            # Si hubo una mutación mientras se cargaba, no guardar datos viejos
+            if cls._versions.get(key, cls._floor) != version:
+                return
+            old = cls._entries.pop(key, None)
+            if old is not None:
+                cls._bytes -= old[2]
+            cls._entries[key] = (version, time.monotonic(), size, rows)
+            cls._versions[key] = version
+            cls._bytes += size
+            while cls._entries and (len(cls._entries) > max_entries or cls._bytes > max_bytes):
+                evicted_key, evicted = cls._entries.popitem(last=False)
+                cls._bytes -= evicted[2]
+                cls._floor = max(cls._floor, cls._versions.pop(evicted_key))
+                cls._stats['evictions'] += 1
+
+    @classmethod
+    def bump(cls, court_id, start_time, end_time):
+        """Invalidar los días de una cancha que toca el intervalo de una reserva"""
+        with cls._lock:
+            cls._clock += 1
+            day = start_time.date()
+            while day <= end_time.date():
+                key = (court_id, day)
+                if key in cls._versions:
+                    cls._versions[key] = cls._clock
+                else:
+                    # Sin entrada que invalidar: basta con descartar las cargas en curso
+                    cls._floor = cls._clock
+                day += timedelta(days=1)
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            lookups = cls._stats['hits'] + cls._stats['misses']
+            return {
+                **cls._stats,
+                'hit_rate': cls._stats['hits'] / lookups if lookups else 0.0,
+                'entries': len(cls._entries),
+                'versions': len(cls._versions),
+                'bytes': cls._bytes,
+            }
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._versions.clear()
+            # El reloj no se reinicia: una carga en curso no puede guardar datos de antes
+            cls._clock += 1
+            cls._floor = cls._clock
+            cls._bytes = 0
+            cls._stats.update(hits=0, misses=0, evictions=0)
+
+
+@event.listens_for(Reservation.__table__, 'after_create')
+@event.listens_for(Reservation.__table__, 'after_drop')
+def _reset_cache(target, connection, **kw):
+    ScheduleCache.clear()
@@ -0,0 +1,38 @@
+from threading import Event, Thread
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """Ejecuta una función periódicamente en un hilo de fondo dentro del contexto de la app"""
+
+    def __init__(self, app, name, interval, func):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        from app import db
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.func()
+                except Exception:
+                    logger.exception("Error en la tarea periódica %s", self.name)
+                finally:
+                    db.session.remove()
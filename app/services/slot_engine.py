@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+
+def on_grid(moment, slot_minutes=15):
+    """True si `moment` cae en el borde de un slot de la rejilla diaria"""
+    midnight = datetime.combine(moment.date(), datetime.min.time())
+    return (moment - midnight) % timedelta(minutes=slot_minutes) == timedelta(0)
+
+
+def grid_slots(start_time, end_time, slot_minutes=15):
+    """Inicios de los slots de la rejilla diaria que toca el intervalo [start_time, end_time)"""
+    slot = timedelta(minutes=slot_minutes)
+    midnight = datetime.combine(start_time.date(), datetime.min.time())
+    current = midnight + slot * ((start_time - midnight) // slot)
+    slots = []
+    while current < end_time:
+        slots.append(current)
+        current += slot
+    return slots
+
+
+class SlotBitmap:
+    """Mapa de ocupación de una cancha en un día con slots de resolución fija.
+
+    El bit i representa el slot [opening + i*slot, opening + (i+1)*slot). Se usa un
+    entero de Python como vector de bits para que las operaciones sobre todos los
+    slots del día se resuelvan con unos pocos desplazamientos y máscaras.
+    """
+
+    def __init__(self, opening, closing, slot_minutes=15):
+        if slot_minutes <= 0:
+            raise ValueError("La granularidad de los slots debe ser positiva")
+        self.opening = opening
+        self.slot = timedelta(minutes=slot_minutes)
+        self.size = max(int((closing - opening) // self.slot), 0)
+        self.full_mask = (1 << self.size) - 1
+        self.occupied = 0
+
+    @classmethod
+    def for_day(cls, court, date, slot_minutes=15):
+        """Crear el mapa de un día según el horario de apertura y cierre de la cancha"""
+        return cls(
+            datetime.combine(date, court.opening_time),
+            datetime.combine(date, court.closing_time),
+            slot_minutes
+        )
+
+    def _slot_floor(self, moment):
+        return int((moment - self.opening) // self.slot)
+
+    def _slot_ceil(self, moment):
+        return -int((self.opening - moment) // self.slot)
+
+    def occupy(self, start_time, end_time):
+        """Marcar como ocupados todos los slots que toca el intervalo"""
+        first = max(self._slot_floor(start_time), 0)
+        last = min(self._slot_ceil(end_time), self.size)
+        if first < last:
+            self.occupied |= ((1 << (last - first)) - 1) << first
+
+    def block_before(self, moment):
+        """Marcar como ocupados los slots que empiezan antes de `moment`"""
+        self.occupy(self.opening, moment)
+
+    @property
+    def free(self):
+        return ~self.occupied & self.full_mask
+
+    def free_starts(self, duration_slots):
+        """Máscara con los slots donde cabe una reserva de `duration_slots` slots libres seguidos"""
+        if duration_slots <= 0:
+            raise ValueError("La duración debe ser de al menos un slot")
+        runs = self.free
+        covered = 1
+        # Duplicando la ventana en cada paso, runs conserva el bit i solo si los
+        # slots i .. i+covered-1 están libres; basta con log2(duration) pasadas.
+        while covered < duration_slots:
+            shift = min(covered, duration_slots - covered)
+            runs &= runs >> shift
+            covered += shift
+        return runs
+
+    def slot_times(self, mask):
+        """Convertir una máscara de slots en la lista de horas de inicio"""
+        times = []
+        while mask:
+            low = mask & -mask
+            times.append(self.opening + self.slot * (low.bit_length() - 1))
+            mask ^= low
+        return times
+
+    def to_bitstring(self):
+        """Representación compacta: '1' ocupado, '0' libre, un carácter por slot"""
+        return format(self.occupied, f'0{self.size}b')[::-1] if self.size else ''
+
+    def to_runs(self):
+        """Codificación run-length: lista de [ocupado, cantidad_de_slots]"""
+        runs = []
+        for bit in self.to_bitstring():
+            value = int(bit)
+            if runs and runs[-1][0] == value:
+                runs[-1][1] += 1
+            else:
+                runs.append([value, 1])
+        return runs
@@ -0,0 +1,132 @@
+from app import db
+from app.models.reservation_slot import ReservationSlot
+from app.models.slot_hold import SlotHold
+from app.services.slot_engine import grid_slots
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+
+class SlotHolds:
+    """Retenciones de slots durante el checkout guardadas en slot_holds.
+
+    Cada retención reclama sus slots en reservation_slots, de modo que la
+    exclusión entre retenciones y reservas la garantiza la restricción única de
+    la base de datos y vale entre procesos. Una retención vencida deja de
+    contar de inmediato (todas las lecturas filtran por expires_at) y sus filas
+    se borran la próxima vez que alguien reclama esos slots o toma una retención.
+    """
+
+    @staticmethod
+    def enabled():
+        return current_app.config.get('SLOT_HOLDS_ENABLED', True)
+
+    @staticmethod
+    def acquire(user_id, court_id, start_time, end_time, total_amount, notes=None, ttl=None, now=None):
+        """Retener [start_time, end_time) para el usuario; falla si otro usuario ya lo retiene"""
+        ttl = ttl or current_app.config.get('SLOT_HOLD_SECONDS', 600)
+        now = now or datetime.now(timezone.utc)
+        SlotHolds.purge(now)
+
+        # El mismo usuario cambiando de horario reemplaza su retención anterior
+        own = db.session.scalars(
+            SlotHolds._live(now).with_only_columns(SlotHold.id).where(
+                SlotHold.user_id == user_id, SlotHold.court_id == court_id,
+                SlotHold.start_time < end_time, SlotHold.end_time > start_time
+            )
+        ).all()
+        SlotHolds._delete(own)
+
+        limit = current_app.config.get('SLOT_HOLDS_PER_USER', 3)
+        held = db.session.scalar(
+            SlotHolds._live(now).with_only_columns(func.count()).where(SlotHold.user_id == user_id)
+        )
+        if held >= limit:
+            db.session.rollback()
+            raise ValueError(f"Ya tienes {held} horarios retenidos. Completa o abandona un pago antes de elegir otro")
+
+        hold = SlotHold(user_id=user_id, court_id=court_id, start_time=start_time, end_time=end_time,
+                        total_amount=total_amount, notes=notes, expires_at=now + timedelta(seconds=ttl))
+        try:
+            db.session.add(hold)
+            db.session.flush()
+            slot_minutes = current_app.config.get('SLOT_MINUTES', 15)
+            db.session.execute(insert(ReservationSlot), [
+                {'court_id': court_id, 'slot_start': slot_start, 'hold_id': hold.id}
+                for slot_start in grid_slots(start_time, end_time, slot_minutes)
+            ])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise ValueError("El horario está siendo reservado por otro usuario. Intenta en unos minutos")
+        return hold
+
+    @staticmethod
+    def get(hold_id, now=None):
+        """Devolver la retención vigente o None si no existe o ya venció"""
+        return db.session.scalars(
+            SlotHolds._live(now or datetime.now(timezone.utc)).where(SlotHold.id == hold_id)
+        ).first()
+
+    @staticmethod
+    def release(hold_id):
+        """Borrar la retención y liberar sus slots (dentro de la transacción actual)"""
+        return SlotHolds._delete([hold_id]) > 0
+
+    @staticmethod
+    def find_conflict(court_id, start_time, end_time, exclude_hold_id=None, now=None):
+        """Id de una retención vigente que se solape con [start_time, end_time) o None"""
+        query = SlotHolds._live(now or datetime.now(timezone.utc)).with_only_columns(SlotHold.id).where(
+            SlotHold.court_id == court_id, SlotHold.start_time < end_time, SlotHold.end_time > start_time
+        )
+        if exclude_hold_id:
+            query = query.where(SlotHold.id != exclude_hold_id)
+        return db.session.scalars(query.limit(1)).first()
+
+    @staticmethod
+    def intervals(court_ids, range_start, range_end, exclude_user_id=None, now=None):
+        """Filas (court_id, start_time, end_time) retenidas que cruzan el rango.
+
+        `exclude_user_id` omite las retenciones de ese usuario: su propio
+        checkout no le quita el horario que está pagando.
+        """
+        query = SlotHolds._live(now or datetime.now(timezone.utc)).with_only_columns(
+            SlotHold.court_id, SlotHold.start_time, SlotHold.end_time
+        ).where(
+            SlotHold.court_id.in_(court_ids), SlotHold.start_time < range_end, SlotHold.end_time > range_start
+        )
+        if exclude_user_id:
+            query = query.where(SlotHold.user_id != exclude_user_id)
+        return db.session.execute(query).all()
+
+    @staticmethod
+    def purge(now=None, court_ids=None):
+        """Borrar las retenciones vencidas y sus slots (dentro de la transacción actual); devuelve cuántas"""
+        query = select(SlotHold.id).where(SlotHold.expires_at <= (now or datetime.now(timezone.utc)))
+        if court_ids is not None:
+            query = query.where(SlotHold.court_id.in_(court_ids))
+        return SlotHolds._delete(db.session.scalars(query).all())
+
+    @staticmethod
+    def count(now=None):
+        return db.session.scalar(
+            SlotHolds._live(now or datetime.now(timezone.utc)).with_only_columns(func.count())
+        )
+
+    @staticmethod
+    def clear():
+        """Borrar todas las retenciones y sus slots (dentro de la transacción actual)"""
+        db.session.execute(delete(ReservationSlot).where(ReservationSlot.hold_id.isnot(None)))
+        db.session.execute(delete(SlotHold))
+
+    @staticmethod
+    def _live(now):
+        return select(SlotHold).where(SlotHold.expires_at > now)
+
+    @staticmethod
+    def _delete(hold_ids):
+        if not hold_ids:
+            return 0
+        db.session.execute(delete(ReservationSlot).where(ReservationSlot.hold_id.in_(hold_ids)))
+        return db.session.execute(delete(SlotHold).where(SlotHold.id.in_(hold_ids))).rowcount
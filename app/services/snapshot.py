@@ -0,0 +1,102 @@
+from app.models.reservation import Reservation
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event
+from threading import Condition, Lock, Thread
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+Snapshot = namedtuple('Snapshot', ['value', 'age', 'refreshing'])
+
+
+class SnapshotCache:
+    """Valor costoso de calcular servido desde memoria con stale-while-revalidate.
+
+    El primer pedido calcula el valor; los siguientes reciben la instantánea al
+    instante y, cuando supera su antigüedad máxima, se recalcula en un hilo de
+    fondo. Los recálculos concurrentes se agrupan en uno solo (single-flight).
+    """
+
+    _instances = []
+
+    def __init__(self, name, compute, max_age_key, default_max_age=30):
+        self.name = name
+        self.compute = compute
+        self.max_age_key = max_age_key
+        self.default_max_age = default_max_age
+        self._lock = Lock()
+        self._done = Condition(self._lock)
+        self._value = None
+        self._computed_at = None
+        self._refreshing = False
+        self._generation = 0
+        SnapshotCache._instances.append(self)
+
+    def get(self):
+        """Devolver la instantánea vigente (o la vencida mientras se recalcula)"""
+        app = current_app._get_current_object()
+        max_age = app.config.get(self.max_age_key, self.default_max_age)
+        with self._lock:
+            # Si otro pedido está haciendo la primera carga, esperarla en lugar de repetirla
+            while self._computed_at is None and self._refreshing:
+                self._done.wait()
+            compute_now = self._computed_at is None
+            if compute_now:
+                self._refreshing = True
+            elif not self._refreshing and time.monotonic() - self._computed_at >= max_age:
+                self._refreshing = True
+                Thread(target=self._refresh_in_background, args=(app, self._generation),
+                       name=f'snapshot-{self.name}', daemon=True).start()
+            generation = self._generation
+
+        if compute_now:
+            self._refresh(generation)
+
+        with self._lock:
+            age = time.monotonic() - self._computed_at if self._computed_at is not None else 0.0
+            return Snapshot(self._value, age, self._refreshing)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+            self._computed_at = None
+            self._refreshing = False
+            self._done.notify_all()
+
+    def _refresh(self, generation):
+        try:
+            value = self.compute()
+            with self._lock:
+                # Descartar el resultado si la caché se limpió mientras se calculaba
+                if generation == self._generation:
+                    self._value = value
+                    self._computed_at = time.monotonic()
+        finally:
+            with self._lock:
+                if generation == self._generation:
+                    self._refreshing = False
+                self._done.notify_all()
+
+    def _refresh_in_background(self, app, generation):
+        from app import db
+        with app.app_context():
+            try:
+                self._refresh(generation)
+            except Exception:
+                logger.exception("Error al recalcular la instantánea %s", self.name)
+            finally:
+                db.session.remove()
+
+    @classmethod
+    def clear_all(cls):
+        for instance in cls._instances:
+            instance.clear()
+
+
+@event.listens_for(Reservation.__table__, 'after_create')
+@event.listens_for(Reservation.__table__, 'after_drop')
+def _reset_snapshots(target, connection, **kw):
+    SnapshotCache.clear_all()
@@ -0,0 +1,419 @@
+from app import db
+from app.models.court import Court
+from app.models.daily_stat import DailyStat
+from app.models.payment import Payment, PaymentStatus
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.resource_version import ResourceVersion
+from app.models.user_stat import UserStat
+from app.services.time_buckets import TimeBuckets
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from math import ceil, isclose
+from sqlalchemy import case, delete, func, insert, literal, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+STATUS_COLUMNS = {
+    ReservationStatus.PENDING: 'pending_count',
+    ReservationStatus.CONFIRMED: 'confirmed_count',
+    ReservationStatus.CANCELLED: 'cancelled_count',
+    ReservationStatus.COMPLETED: 'completed_count',
+}
+
+# Estados cuyas horas cuentan como reservadas
+BOOKED_STATUSES = (ReservationStatus.PENDING, ReservationStatus.CONFIRMED, ReservationStatus.COMPLETED)
+
+ROLLUP_COLUMNS = list(STATUS_COLUMNS.values()) + ['booked_hours', 'revenue']
+
+USER_STATUS_COLUMNS = {
+    ReservationStatus.PENDING: 'pending_reservations',
+    ReservationStatus.CONFIRMED: 'active_reservations',
+    ReservationStatus.CANCELLED: 'cancelled_reservations',
+    ReservationStatus.COMPLETED: 'completed_reservations',
+}
+
+# Contadores de user_stats que se reinician al cambiar de mes
+MONTHLY_COLUMNS = ['reservations_this_month', 'spent_this_month']
+
+USER_COLUMNS = ['total_reservations', 'total_spent'] + list(USER_STATUS_COLUMNS.values()) + MONTHLY_COLUMNS
+
+# Métricas del resumen que acepta la API de análisis
+SERIES_METRICS = {
+    'reservations': DailyStat.total_reservations,
+    'revenue': DailyStat.revenue,
+    'booked_hours': DailyStat.booked_hours,
+}
+SERIES_GRANULARITIES = ('day', 'week', 'month')
+
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+class StatsService:
+    """Mantenimiento y lectura de los resúmenes `daily_stats` y `user_stats`"""
+
+    @staticmethod
+    def record_reservations(reservations, old_status=None, new_status=None):
+        """Aplicar a los resúmenes la transición de estado de las reservas (dentro de la transacción actual).
+
+        Acepta objetos o filas con user_id, court_id, start_time y end_time (y
+        created_at si son nuevas); si no se indica `new_status` se usa el estado
+        actual de cada reserva.
+        """
+        deltas = defaultdict(Counter)
+        user_deltas = defaultdict(Counter)
+        month = StatsService._current_month()
+        for reservation in reservations:
+            status = new_status or reservation.status
+            StatsService._reservation_delta(deltas, reservation, old_status, status)
+            StatsService._user_reservation_delta(user_deltas, reservation, old_status, status, month)
+        StatsService._apply(deltas)
+        StatsService._apply_user(user_deltas, month)
+        if deltas:
+            StatsService.bump_versions(
+                user_ids=user_deltas, court_ids={court_id for _, court_id in deltas}
+            )
+
+    @staticmethod
+    def record_payment(payment, old_status=None):
+        """Aplicar a los resúmenes el cambio de estado de un pago (dentro de la transacción actual)"""
+        deltas = defaultdict(Counter)
+        user_deltas = defaultdict(Counter)
+        month = StatsService._current_month()
+        StatsService._payment_delta(
+            deltas, payment.created_at.date(), payment.reservation.court_id,
+            payment.amount, old_status, payment.status
+        )
+        StatsService._user_payment_delta(
+            user_deltas, payment.user_id, payment.created_at.date(), payment.amount,
+            old_status, payment.status, month
+        )
+        StatsService._apply(deltas)
+        StatsService._apply_user(user_deltas, month)
+        if deltas:
+            StatsService.bump_versions(
+                user_ids=user_deltas, court_ids={court_id for _, court_id in deltas}
+            )
+
+    @staticmethod
+    def record_payments(rows, old_status, new_status):
+        """Versión de record_payment para filas (user_id, court_id, amount, created_at) cambiadas en bloque"""
+        deltas = defaultdict(Counter)
+        user_deltas = defaultdict(Counter)
+        month = StatsService._current_month()
+        for row in rows:
+            day = row.created_at.date()
+            StatsService._payment_delta(deltas, day, row.court_id, row.amount, old_status, new_status)
+            StatsService._user_payment_delta(user_deltas, row.user_id, day, row.amount, old_status, new_status, month)
+        StatsService._apply(deltas)
+        StatsService._apply_user(user_deltas, month)
+        if deltas:
+            StatsService.bump_versions(
+                user_ids=user_deltas, court_ids={court_id for _, court_id in deltas}
+            )
+
+    @staticmethod
+    def bump_versions(user_ids=(), court_ids=()):
+        """Incrementar la versión de los usuarios y canchas afectados.
+
+        No hay una versión global: el resumen de todas las canchas se versiona con
+        `get_scope_version('court')`, así dos reservas en canchas distintas no
+        compiten por la misma fila.
+        """
+        # Orden fijo para que transacciones concurrentes bloqueen las filas en el mismo orden
+        for scope, keys in (('court', court_ids), ('user', user_ids)):
+            for key in sorted(set(keys)):
+                StatsService._upsert(
+                    ResourceVersion, ['scope', 'key'], {'scope': scope, 'key': key, 'version': 1},
+                    lambda new: {'version': ResourceVersion.version + 1}
+                )
+
+    @staticmethod
+    def get_versions(*resources):
+        """Versiones de varios recursos (scope, key) con una sola consulta; 0 si nunca cambiaron"""
+        rows = db.session.query(ResourceVersion.scope, ResourceVersion.key, ResourceVersion.version).filter(
+            tuple_(ResourceVersion.scope, ResourceVersion.key).in_(resources)
+        )
+        versions = {(scope, key): version for scope, key, version in rows}
+        return [versions.get(resource, 0) for resource in resources]
+
+    @staticmethod
+    def get_scope_version(scope):
+        """Suma de las versiones de un scope: crece con cualquier cambio de cualquiera de sus recursos"""
+        return db.session.query(func.coalesce(func.sum(ResourceVersion.version), 0)).filter(
+            ResourceVersion.scope == scope
+        ).scalar()
+
+    @staticmethod
+    def _current_month():
+        return TimeBuckets.floor(date.today(), 'month')
+
+    @staticmethod
+    def _reservation_delta(deltas, reservation, old_status, new_status):
+        if old_status == new_status:
+            return
+        changes = deltas[(reservation.start_time.date(), reservation.court_id)]
+        hours = (reservation.end_time - reservation.start_time).total_seconds() / 3600
+        if old_status is not None:
+            changes[STATUS_COLUMNS[old_status]] -= 1
+            if old_status in BOOKED_STATUSES:
+                changes['booked_hours'] -= hours
+        changes[STATUS_COLUMNS[new_status]] += 1
+        if new_status in BOOKED_STATUSES:
+            changes['booked_hours'] += hours
+
+    @staticmethod
+    def _payment_delta(deltas, day, court_id, amount, old_status, new_status):
+        was_collected = old_status == PaymentStatus.COMPLETED
+        is_collected = new_status == PaymentStatus.COMPLETED
+        if was_collected != is_collected:
+            deltas[(day, court_id)]['revenue'] += amount if is_collected else -amount
+
+    @staticmethod
+    def _user_reservation_delta(deltas, reservation, old_status, new_status, month):
+        if old_status == new_status:
+            return
+        changes = deltas[reservation.user_id]
+        if old_status is None:
+            changes['total_reservations'] += 1
+            if TimeBuckets.floor(reservation.created_at.date(), 'month') == month:
+                changes['reservations_this_month'] += 1
+        else:
+            changes[USER_STATUS_COLUMNS[old_status]] -= 1
+        changes[USER_STATUS_COLUMNS[new_status]] += 1
+
+    @staticmethod
+    def _user_payment_delta(deltas, user_id, day, amount, old_status, new_status, month):
+        was_collected = old_status == PaymentStatus.COMPLETED
+        is_collected = new_status == PaymentStatus.COMPLETED
+        if was_collected == is_collected:
+            return
+        amount = amount if is_collected else -amount
+        deltas[user_id]['total_spent'] += amount
+        if TimeBuckets.floor(day, 'month') == month:
+            deltas[user_id]['spent_this_month'] += amount
+
+    @staticmethod
+    def _apply(deltas):
+        """Sumar los deltas a sus filas con un upsert por (día, cancha)"""
+        for (day, court_id), changes in deltas.items():
+            changes = {column: value for column, value in changes.items() if value}
+            if changes:
+                StatsService._upsert(
+                    DailyStat, ['day', 'court_id'],
+                    {'day': day, 'court_id': court_id, **dict.fromkeys(ROLLUP_COLUMNS, 0), **changes},
+                    lambda new: {column: getattr(DailyStat, column) + new[column] for column in changes}
+                )
+
+    @staticmethod
+    def _apply_user(deltas, month):
+        """Sumar los deltas a user_stats; los contadores del mes se reinician si la fila es de otro mes"""
+        for user_id, changes in deltas.items():
+            changes = {column: value for column, value in changes.items() if value}
+            if not changes:
+                continue
+            monthly = any(column in changes for column in MONTHLY_COLUMNS)
+
+            def build_set(new, changes=changes, monthly=monthly):
+                values = {
+                    column: getattr(UserStat, column) + new[column]
+                    for column in changes if column not in MONTHLY_COLUMNS
+                }
+                if monthly:
+                    same_month = UserStat.current_month == new['current_month']
+                    for column in MONTHLY_COLUMNS:
+                        values[column] = case((same_month, getattr(UserStat, column) + new[column]), else_=new[column])
+                    values['current_month'] = new['current_month']
+                return values
+
+            StatsService._upsert(
+                UserStat, ['user_id'],
+                {'user_id': user_id, **dict.fromkeys(USER_COLUMNS, 0), **changes,
+                 'current_month': month if monthly else None},
+                build_set
+            )
+
+    @staticmethod
+    def _upsert(model, key_columns, values, build_set):
+        """INSERT .. ON CONFLICT DO UPDATE; `build_set(new)` arma el SET a partir de los valores propuestos"""
+        dialect_insert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+        if dialect_insert:
+            statement = dialect_insert(model).values(**values)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=key_columns, set_=build_set(statement.excluded)
+            ))
+            return
+        # Otros motores: actualizar y, si la fila no existía, insertarla
+        result = db.session.execute(
+            update(model)
+            .where(*[getattr(model, column) == values[column] for column in key_columns])
+            .values(build_set({column: literal(value) for column, value in values.items()}))
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.session.execute(insert(model).values(**values))
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """Recalcular el resumen completo desde reservas y pagos; devuelve la cantidad de filas"""
+        deltas = defaultdict(Counter)
+        reservations = db.session.query(
+            Reservation.court_id, Reservation.start_time, Reservation.end_time, Reservation.status
+        ).filter(Reservation.status.isnot(None)).execution_options(yield_per=batch_size)
+        for row in reservations:
+            StatsService._reservation_delta(deltas, row, None, row.status)
+
+        payments = db.session.query(
+            Payment.created_at, Reservation.court_id, Payment.amount
+        ).join(Reservation, Payment.reservation_id == Reservation.id).filter(
+            Payment.status == PaymentStatus.COMPLETED
+        ).execution_options(yield_per=batch_size)
+        for created_at, court_id, amount in payments:
+            StatsService._payment_delta(deltas, created_at.date(), court_id, amount, None, PaymentStatus.COMPLETED)
+
+        rows = [
+            {'day': day, 'court_id': court_id, **dict.fromkeys(ROLLUP_COLUMNS, 0), **changes}
+            for (day, court_id), changes in deltas.items()
+        ]
+        db.session.execute(delete(DailyStat))
+        if rows:
+            db.session.execute(insert(DailyStat), rows)
+        # Las canchas que tenían resumen y las que lo tienen ahora
+        versioned = db.session.query(ResourceVersion.key).filter(ResourceVersion.scope == 'court')
+        StatsService.bump_versions(court_ids={court_id for court_id, in versioned} | {row['court_id'] for row in rows})
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def get_daily(start_date, end_date, court_id=None):
+        """Filas del resumen entre dos fechas (inclusive)"""
+        query = DailyStat.query.filter(DailyStat.day >= start_date, DailyStat.day <= end_date)
+        if court_id:
+            query = query.filter(DailyStat.court_id == court_id)
+        return query.order_by(DailyStat.day, DailyStat.court_id).all()
+
+    @staticmethod
+    def get_totals(start_date, end_date):
+        """Totales del resumen entre dos fechas (inclusive)"""
+        row = db.session.query(
+            *[func.coalesce(func.sum(getattr(DailyStat, column)), 0).label(column) for column in ROLLUP_COLUMNS]
+        ).filter(DailyStat.day >= start_date, DailyStat.day <= end_date).one()._asdict()
+        row['reservations'] = sum(row[column] for column in STATUS_COLUMNS.values())
+        return row
+
+    @staticmethod
+    def get_monthly_series(months, value):
+        """Serie mensual de una expresión agregada sobre el resumen, con una sola consulta"""
+        return TimeBuckets.series(DailyStat.query, DailyStat.day, value, months)
+
+    @staticmethod
+    def get_series(metric, start_date, end_date, granularity='day', court_ids=None, sport_type=None, max_points=None):
+        """Serie de una métrica del resumen para cualquier rango, con una sola consulta agregada.
+
+        Si hay más buckets que `max_points`, se fusionan buckets consecutivos
+        sumando sus valores (los totales se conservan); `step` indica cuántos
+        buckets representa cada punto.
+        """
+        if metric not in SERIES_METRICS:
+            raise ValueError(f"Métrica inválida. Use {', '.join(SERIES_METRICS)}")
+        if granularity not in SERIES_GRANULARITIES:
+            raise ValueError(f"Granularidad inválida. Use {', '.join(SERIES_GRANULARITIES)}")
+        if start_date > end_date:
+            raise ValueError("La fecha inicial debe ser anterior a la final")
+
+        # El resumen ya es diario: agrupar por día devuelve a lo sumo una fila por día del rango,
+        # que se reparten en semanas o meses en Python
+        query = db.session.query(DailyStat.day, func.sum(SERIES_METRICS[metric])).filter(
+            DailyStat.day >= start_date, DailyStat.day <= end_date
+        )
+        if court_ids:
+            query = query.filter(DailyStat.court_id.in_(court_ids))
+        if sport_type:
+            query = query.join(Court, Court.id == DailyStat.court_id).filter(Court.sport_type == sport_type)
+        totals = Counter()
+        for day, value in query.group_by(DailyStat.day):
+            totals[TimeBuckets.floor(day, granularity)] += value or 0
+
+        starts = TimeBuckets.between(start_date, end_date, granularity)
+        values = [totals.get(start, 0) for start in starts]
+        step = ceil(len(starts) / max_points) if max_points and len(starts) > max_points else 1
+        points = []
+        for i in range(0, len(starts), step):
+            last = starts[min(i + step, len(starts)) - 1]
+            points.append({
+                'start': max(starts[i], start_date).isoformat(),
+                'end': min(TimeBuckets.next_start(last, granularity) - timedelta(days=1), end_date).isoformat(),
+                'value': sum(values[i:i + step]),
+            })
+        return {
+            'metric': metric,
+            'granularity': granularity,
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'step': step,
+            'total': sum(values),
+            'points': points,
+        }
+
+    @staticmethod
+    def get_user_summary(user_id):
+        """Contadores del usuario con una sola lectura por clave primaria"""
+        return StatsService._summary(db.session.get(UserStat, user_id, populate_existing=True))
+
+    @staticmethod
+    def _summary(row):
+        if row is None:
+            return dict.fromkeys(USER_COLUMNS, 0)
+        summary = {column: getattr(row, column) for column in USER_COLUMNS}
+        if row.current_month != StatsService._current_month():
+            summary.update(dict.fromkeys(MONTHLY_COLUMNS, 0))
+        return summary
+
+    @staticmethod
+    def check_user_stats(repair=False):
+        """Comparar user_stats con reservas y pagos; devuelve los user_id con diferencias.
+
+        Con `repair=True` reescribe las filas que no coinciden.
+        """
+        month = StatsService._current_month()
+        month_start = datetime.combine(month, datetime.min.time())
+        expected = defaultdict(lambda: dict.fromkeys(USER_COLUMNS, 0))
+
+        for user_id, status, count in db.session.query(
+            Reservation.user_id, Reservation.status, func.count(Reservation.id)
+        ).group_by(Reservation.user_id, Reservation.status):
+            expected[user_id]['total_reservations'] += count
+            if status is not None:
+                expected[user_id][USER_STATUS_COLUMNS[status]] += count
+        for user_id, count in db.session.query(Reservation.user_id, func.count(Reservation.id)).filter(
+            Reservation.created_at >= month_start
+        ).group_by(Reservation.user_id):
+            expected[user_id]['reservations_this_month'] = count
+
+        completed = db.session.query(Payment.user_id, func.sum(Payment.amount)).filter(
+            Payment.status == PaymentStatus.COMPLETED
+        ).group_by(Payment.user_id)
+        for user_id, total in completed:
+            expected[user_id]['total_spent'] = total or 0
+        for user_id, total in completed.filter(Payment.created_at >= month_start):
+            expected[user_id]['spent_this_month'] = total or 0
+
+        rows = {row.user_id: row for row in UserStat.query}
+        mismatched = []
+        for user_id in sorted(set(expected) | set(rows)):
+            values = expected.get(user_id) or dict.fromkeys(USER_COLUMNS, 0)
+            row = rows.get(user_id)
+            current = StatsService._summary(row)
+            if row is not None and all(isclose(current[column], values[column], abs_tol=1e-6) for column in USER_COLUMNS):
+                continue
+            mismatched.append(user_id)
+            if repair:
+                if row is None:
+                    row = UserStat(user_id=user_id)
+                    db.session.add(row)
+                for column, value in values.items():
+                    setattr(row, column, value)
+                row.current_month = month
+
+        if repair:
+            StatsService.bump_versions(user_ids=mismatched)
+            db.session.commit()
+        return mismatched
@@ -0,0 +1,95 @@
+from app import db
+from datetime import datetime, timedelta
+from sqlalchemy import func
+
+# Clave textual de cada bucket: (strftime de SQLite y Python, to_char de PostgreSQL, date_format de MySQL)
+BUCKET_FORMATS = {
+    'hour': ('%Y-%m-%d %H:00', 'YYYY-MM-DD HH24:00', '%Y-%m-%d %H:00'),
+    'day': ('%Y-%m-%d', 'YYYY-MM-DD', '%Y-%m-%d'),
+    'month': ('%Y-%m', 'YYYY-MM', '%Y-%m'),
+}
+
+# Duración fija de los buckets que no son meses
+STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+
+class TimeBuckets:
+    """Agregaciones por intervalos de tiempo con un solo GROUP BY por serie"""
+
+    @staticmethod
+    def expression(column, unit='month'):
+        """Expresión SQL que convierte `column` en la clave de su bucket según el dialecto"""
+        if unit not in BUCKET_FORMATS:
+            raise ValueError("Unidad inválida. Use 'hour', 'day' o 'month'")
+        strftime_format, to_char_format, date_format = BUCKET_FORMATS[unit]
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return func.to_char(column, to_char_format)
+        if dialect in ('mysql', 'mariadb'):
+            return func.date_format(column, date_format)
+        return func.strftime(strftime_format, column)
+
+    @staticmethod
+    def floor(moment, unit='month'):
+        """Inicio del bucket que contiene `moment` (acepta datetime o date); las semanas empiezan el lunes"""
+        if unit == 'month':
+            moment = moment.replace(day=1)
+        elif unit == 'week':
+            moment = moment - timedelta(days=moment.weekday())
+        if not isinstance(moment, datetime):
+            return moment
+        if unit == 'hour':
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def next_start(start, unit='month'):
+        """Inicio del bucket siguiente (los meses se recorren por calendario, no de a 30 días)"""
+        if unit == 'month':
+            return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        return start + STEPS[unit]
+
+    @staticmethod
+    def previous_start(start, unit='month'):
+        """Inicio del bucket anterior"""
+        if unit == 'month':
+            return start.replace(year=start.year - (start.month == 1), month=(start.month - 2) % 12 + 1)
+        return start - STEPS[unit]
+
+    @staticmethod
+    def last(count, unit='month', now=None):
+        """Inicios de los últimos `count` buckets, en orden cronológico y terminando en el actual"""
+        start = TimeBuckets.floor(now or datetime.now(), unit)
+        starts = [start]
+        for _ in range(count - 1):
+            start = TimeBuckets.previous_start(start, unit)
+            starts.append(start)
+        return list(reversed(starts))
+
+    @staticmethod
+    def between(start, end, unit='month'):
+        """Inicios de los buckets que cubren [start, end], en orden cronológico"""
+        starts = []
+        bucket = TimeBuckets.floor(start, unit)
+        while bucket <= end:
+            starts.append(bucket)
+            bucket = TimeBuckets.next_start(bucket, unit)
+        return starts
+
+    @staticmethod
+    def series(query, column, value, starts, unit='month', default=0):
+        """Agregar `value` por bucket de `column` y rellenar en Python los buckets sin filas.
+
+        Devuelve una lista de (inicio_del_bucket, valor) alineada con `starts`.
+        """
+        if not starts:
+            return []
+        bucket = TimeBuckets.expression(column, unit).label('bucket')
+        rows = query.filter(
+            column >= starts[0],
+            column < TimeBuckets.next_start(starts[-1], unit)
+        ).with_entities(bucket, value).group_by(bucket).all()
+
+        values = dict(rows)
+        key_format = BUCKET_FORMATS[unit][0]
+        return [(start, values.get(start.strftime(key_format)) or default) for start in starts]
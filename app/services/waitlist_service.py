@@ -0,0 +1,120 @@
+from app.models.user import db
+from app.models.court import Court
+from app.models.waitlist import WaitlistEntry, WaitlistStatus
+from app.services.outbox import Outbox
+from app.services.reservation_service import ReservationService
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WaitlistService:
+    @staticmethod
+    def join(user_id, court_id, start_time, end_time):
+        """Anotar a un usuario en la lista de espera de un horario ocupado"""
+        court = db.session.get(Court, court_id)
+        if not court:
+            raise ValueError("Cancha no encontrada")
+        
+        if (start_time.time() < court.opening_time) or (end_time.time() > court.closing_time):
+            raise ValueError("La reserva está fuera del horario de la cancha")
+        ReservationService.check_grid(start_time, end_time)
+        
+        if ReservationService.check_availability(court_id, start_time, end_time):
+            raise ValueError("El horario está disponible, puedes reservarlo directamente")
+        
+        existing = WaitlistEntry.query.filter(
+            WaitlistEntry.user_id == user_id,
+            WaitlistEntry.court_id == court_id,
+            WaitlistEntry.start_time == start_time,
+            WaitlistEntry.end_time == end_time,
+            WaitlistEntry.waiting_filter()
+        ).first()
+        if existing:
+            return existing
+        
+        entry = WaitlistEntry(
+            user_id=user_id,
+            court_id=court_id,
+            start_time=start_time,
+            end_time=end_time,
+            status=WaitlistStatus.WAITING
+        )
+        db.session.add(entry)
+        db.session.commit()
+        return entry
+    
+    @staticmethod
+    def leave(entry_id, user_id=None):
+        """Salir de la lista de espera"""
+        entry = db.session.get(WaitlistEntry, entry_id)
+        if not entry:
+            raise ValueError("Entrada de lista de espera no encontrada")
+        
+        if user_id and entry.user_id != user_id:
+            raise ValueError("No tienes permisos para modificar esta entrada")
+        
+        if entry.status == WaitlistStatus.WAITING:
+            entry.status = WaitlistStatus.CANCELLED
+            db.session.commit()
+        return entry
+    
+    @staticmethod
+    def get_user_entries(user_id):
+        """Entradas en espera de un usuario"""
+        return WaitlistEntry.query.filter(
+            WaitlistEntry.user_id == user_id,
+            WaitlistEntry.status == WaitlistStatus.WAITING
+        ).order_by(WaitlistEntry.start_time.asc()).all()
+    
+    @staticmethod
+    def promote(court_id, start_time, end_time):
+        """Ofrecer un horario liberado a quienes esperan, por orden de llegada.
+        
+        Para cada interesado cuyo horario se cruza con el liberado (consulta sobre el
+        índice parcial de entradas en espera) se intenta crear una reserva PENDING
+        que le retiene el horario; se notifica por email a cada usuario promovido.
+        Si no la paga, el barrido de pendientes (PENDING_EXPIRY_INTERVAL) la cancela
+        pasados PENDING_HOLD_MINUTES y el horario pasa al siguiente de la lista.
+        """
+        candidates = WaitlistEntry.query.filter(
+            WaitlistEntry.court_id == court_id,
+            WaitlistEntry.waiting_filter(),
+            WaitlistEntry.start_time < end_time,
+            WaitlistEntry.end_time > start_time
+        ).order_by(WaitlistEntry.created_at.asc(), WaitlistEntry.id.asc()).all()
+        
+        promoted = []
+        for entry in candidates:
+            if entry.start_time <= datetime.now():
+                continue
+            # La reserva, la entrada promovida y el aviso se confirman en una sola transacción
+            try:
+                reservation = ReservationService.stage_reservation(
+                    entry.user_id, entry.court_id, entry.start_time, entry.end_time,
+                    notes="Reserva desde lista de espera"
+                )
+            except ValueError:
+                # El horario del interesado sigue ocupado (total o parcialmente)
+                continue
+            
+            entry.status = WaitlistStatus.PROMOTED
+            entry.reservation_id = reservation.id
+            entry.promoted_at = datetime.now(timezone.utc)
+            Outbox.add('email.waitlist_promotion', reservation_id=reservation.id)
+            db.session.commit()
+            ReservationService.publish_created([reservation])
+            
+            promoted.append(entry)
+        
+        return promoted
+    
+    @staticmethod
+    def promote_safely(court_id, start_time, end_time):
+        """promote() sin propagar errores: la liberación del horario ya fue confirmada"""
+        try:
+            return WaitlistService.promote(court_id, start_time, end_time)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Error al promover la lista de espera de la cancha %s", court_id)
+            return []
@@ -0,0 +1,30 @@
+from flask import current_app, jsonify, request
+from app.services.stats_service import StatsService
+
+
+def resource_etag(scope, key=0, *parts):
+    """ETag a partir de la versión de un recurso y de otros valores que cambian la respuesta (p. ej. la fecha)"""
+    version, = StatsService.get_versions((scope, key))
+    return '-'.join(str(part) for part in (scope, key, version, *parts))
+
+
+def scope_etag(scope, *parts):
+    """ETag de un resumen que abarca todos los recursos de un scope (p. ej. todas las canchas)"""
+    version = StatsService.get_scope_version(scope)
+    return '-'.join(str(part) for part in (scope, 'all', version, *parts))
+
+
+def conditional_json(etag, build):
+    """Responder 304 si el cliente ya tiene `etag`; si no, jsonify(build()) con esa ETag.
+
+    `build` solo se llama cuando hay que enviar el cuerpo, así que el trabajo
+    de consultar y serializar se evita en cada sondeo sin cambios.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # El cliente puede guardar la respuesta pero debe revalidarla en cada pedido
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
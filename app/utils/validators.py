@@ -181,6 +181,12 @@ class ReservationValidator(BaseValidator):
         if duration > datetime.timedelta(hours=4):
             raise ValidationError("La reserva no puede exceder 4 horas", "time_slot")
         
+        # Los horarios deben caer en la rejilla de slots (ver ReservationService.check_grid)
+        slot_minutes = current_app.config.get('SLOT_MINUTES', 15) if current_app else 15
+        for moment in (start_time, end_time):
+            if (moment.hour * 60 + moment.minute) % slot_minutes or moment.second or moment.microsecond:
+                raise ValidationError(f"Los horarios deben comenzar y terminar en bloques de {slot_minutes} minutos", "time_slot")
+        
         return start_time, end_time
     
     @classmethod
@@ -1,12 +1,24 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, make_response, Response, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
 from app.models.user import User
-from app.models.reservation import Reservation
+from app.models.reservation import Reservation, ReservationStatus
 from app.models.court import Court
 from app.models.payment import Payment
+from app.models.daily_stat import DailyStat
+from app.services.export_service import ExportService
+from app.services.leaderboard import PopularCourts
+from app.services.occupancy_service import OccupancyService
+from app.services.payment_gateway import get_gateway
+from app.services.reservation_service import ReservationService
+from app.services.schedule_cache import ScheduleCache
+from app.services.snapshot import SnapshotCache
+from app.services.stats_service import StatsService
+from app.services.time_buckets import TimeBuckets
+from app.utils.helpers import conditional_json, scope_etag
 from app import db
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
 import json
 
 admin_bp = Blueprint('admin', __name__)
@@ -21,34 +33,28 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@admin_bp.route('/dashboard')
-@login_required
-@admin_required
-def dashboard():
-    """Dashboard principal del administrador"""
+def build_dashboard_snapshot():
+    """Calcular las estadísticas del panel (se sirve desde dashboard_snapshot)"""
     # Estadísticas generales
     total_users = User.query.count()
     total_reservations = Reservation.query.count()
     total_courts = Court.query.count()
-    
-    # Reservas del día
-    today = datetime.now().date()
-    today_reservations = Reservation.query.filter(
-        db.func.date(Reservation.start_time) == today
-    ).count()
-    
-    # Ingresos del mes
-    current_month = datetime.now().replace(day=1)
-    monthly_payments = Payment.query.filter(
-        Payment.created_at >= current_month,
-        Payment.status == 'completed'
-    ).all()
-    monthly_revenue = sum(p.amount for p in monthly_payments)
-    
-    # Reservas recientes
-    recent_reservations = Reservation.query.order_by(
-        Reservation.created_at.desc()
-    ).limit(10).all()
+    active_courts = Court.query.filter(Court.is_active == True).count()
+    
+    # Reservas del día e ingresos del mes desde el resumen diario
+    today = date.today()
+    today_reservations = StatsService.get_totals(today, today)['reservations']
+    monthly_revenue = StatsService.get_totals(TimeBuckets.floor(today, 'month'), today)['revenue']
+    
+    # Reservas recientes, como datos planos para poder compartirlas entre pedidos
+    recent_reservations = [{
+        'id': reservation.id,
+        'user': {'first_name': reservation.user.first_name, 'last_name': reservation.user.last_name},
+        'court': {'name': reservation.court.name},
+        'date': reservation.start_time.date(),
+        'total_amount': reservation.total_amount,
+        'status': reservation.status.value if reservation.status else None
+    } for reservation in Reservation.query.order_by(Reservation.created_at.desc()).limit(10)]
     
     # Usuarios nuevos (últimos 30 días)
     thirty_days_ago = datetime.now() - timedelta(days=30)
@@ -60,14 +66,42 @@ def dashboard():
         'total_users': total_users,
         'total_reservations': total_reservations,
         'total_courts': total_courts,
+        'active_courts': active_courts,
         'today_reservations': today_reservations,
+        'reservations_today': today_reservations,
         'monthly_revenue': monthly_revenue,
         'new_users': new_users
     }
-    
-    return render_template('dashboard/admin_dashboard.html', 
-                         stats=stats, 
-                         recent_reservations=recent_reservations)
+    return {'stats': stats, 'recent_reservations': recent_reservations}
+
+dashboard_snapshot = SnapshotCache('admin-dashboard', build_dashboard_snapshot, 'ADMIN_SNAPSHOT_MAX_AGE')
+
+@admin_bp.route('/dashboard')
+@login_required
+@admin_required
+def dashboard():
+    """Dashboard principal del administrador"""
+    snapshot = dashboard_snapshot.get()
+    response = make_response(render_template('dashboard/admin_dashboard.html',
+                                             stats=snapshot.value['stats'],
+                                             recent_reservations=snapshot.value['recent_reservations'],
+                                             snapshot_age=int(snapshot.age)))
+    response.headers['Age'] = str(int(snapshot.age))
+    return response
+
+@admin_bp.route('/api/dashboard-snapshot')
+@login_required
+@admin_required
+def api_dashboard_snapshot():
+    """Estadísticas del panel para refrescos periódicos, con la antigüedad de la instantánea"""
+    snapshot = dashboard_snapshot.get()
+    response = jsonify({
+        'stats': snapshot.value['stats'],
+        'snapshot_age': round(snapshot.age, 3),
+        'refreshing': snapshot.refreshing
+    })
+    response.headers['Age'] = str(int(snapshot.age))
+    return response
 
 @admin_bp.route('/users')
 @login_required
@@ -175,6 +209,7 @@ def edit_court(court_id):
         court.is_active = bool(request.form.get('is_active'))
         
         db.session.commit()
+        PopularCourts.invalidate()
         flash(f'Cancha {court.name} actualizada exitosamente.', 'success')
         return redirect(url_for('admin.courts'))
     
@@ -188,6 +223,7 @@ def toggle_court_active(court_id):
     court = Court.query.get_or_404(court_id)
     court.is_active = not court.is_active
     db.session.commit()
+    PopularCourts.invalidate()
     
     status = 'activada' if court.is_active else 'desactivada'
     flash(f'Cancha {court.name} ha sido {status}.', 'success')
@@ -221,15 +257,32 @@ def cancel_reservation(reservation_id):
     """Cancelar reserva"""
     reservation = Reservation.query.get_or_404(reservation_id)
     
-    if reservation.status == 'cancelled':
+    if reservation.status == ReservationStatus.CANCELLED:
         return jsonify({'error': 'La reserva ya está cancelada'}), 400
     
-    reservation.status = 'cancelled'
-    db.session.commit()
+    # Mismo camino que la cancelación del usuario: libera slots, reembolsa y avisa a la lista de espera
+    ReservationService.cancel_reservation(reservation.id)
     
     flash(f'Reserva #{reservation.id} cancelada exitosamente.', 'success')
     return jsonify({'success': True})
 
+@admin_bp.route('/courts/<int:court_id>/bulk-cancel', methods=['POST'])
+@login_required
+@admin_required
+def bulk_cancel(court_id):
+    """Cancelar y reembolsar todas las reservas activas de una cancha entre dos fechas y horas"""
+    court = Court.query.get_or_404(court_id)
+    try:
+        start_time = datetime.fromisoformat(request.form['start'])
+        end_time = datetime.fromisoformat(request.form['end'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Indica inicio y fin con formato YYYY-MM-DDTHH:MM'}), 400
+    if end_time <= start_time:
+        return jsonify({'error': 'El fin debe ser posterior al inicio'}), 400
+    
+    report = ReservationService.bulk_cancel(court.id, start_time, end_time, request.form.get('reason') or None)
+    return jsonify(report)
+
 @admin_bp.route('/payments')
 @login_required
 @admin_required
@@ -257,48 +310,141 @@ def reports():
     """Página de reportes"""
     return render_template('admin/reports.html')
 
+@admin_bp.route('/export/<dataset>')
+@login_required
+@admin_required
+def export_data(dataset):
+    """Descargar reservas o pagos de un rango de fechas (?format=csv|ndjson|parquet&gzip=1)"""
+    try:
+        start_date, end_date = date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas, use YYYY-MM-DD'}), 400
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', type=int) == 1
+    try:
+        chunks = ExportService.stream(dataset, start_date, end_date, fmt, compress)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = Response(stream_with_context(chunks), mimetype=ExportService.mimetype(fmt, compress))
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{ExportService.filename(dataset, start_date, end_date, fmt, compress)}"'
+    )
+    return response
+
+def date_range_args(default_days=30):
+    """Rango ?start=&end= (YYYY-MM-DD); por defecto, los últimos `default_days` días"""
+    end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else date.today()
+    start_date = (datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start')
+                  else end_date - timedelta(days=default_days - 1))
+    return start_date, end_date
+
+@admin_bp.route('/api/gateway')
+@login_required
+@admin_required
+def api_gateway():
+    """Estado del circuito y latencias del gateway de pagos en este proceso"""
+    return jsonify(get_gateway().stats())
+
 @admin_bp.route('/api/stats')
 @login_required
 @admin_required
 def api_stats():
     """API para estadísticas del dashboard"""
-    # Reservas por mes (últimos 6 meses)
-    months_data = []
-    for i in range(6):
-        month_start = datetime.now().replace(day=1) - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=32)
-        month_end = month_end.replace(day=1) - timedelta(days=1)
-        
-        reservations_count = Reservation.query.filter(
-            Reservation.created_at >= month_start,
-            Reservation.created_at <= month_end
-        ).count()
-        
-        months_data.append({
-            'month': month_start.strftime('%B'),
-            'reservations': reservations_count
-        })
-    
-    # Ingresos por mes
-    revenue_data = []
-    for i in range(6):
-        month_start = datetime.now().replace(day=1) - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=32)
-        month_end = month_end.replace(day=1) - timedelta(days=1)
-        
-        payments = Payment.query.filter(
-            Payment.created_at >= month_start,
-            Payment.created_at <= month_end,
-            Payment.status == 'completed'
-        ).all()
+    months = TimeBuckets.last(6, 'month', now=date.today())
+    
+    def build():
+        # Reservas e ingresos por mes (últimos 6 meses) leídos del resumen diario
+        reservations_by_month = StatsService.get_monthly_series(months, func.sum(DailyStat.total_reservations))
+        revenue_by_month = StatsService.get_monthly_series(months, func.sum(DailyStat.revenue))
         
-        revenue = sum(p.amount for p in payments)
-        revenue_data.append({
-            'month': month_start.strftime('%B'),
-            'revenue': float(revenue)
-        })
+        return {
+            'reservations_by_month': [
+                {'month': month.strftime('%B'), 'reservations': count} for month, count in reservations_by_month
+            ],
+            'revenue_by_month': [
+                {'month': month.strftime('%B'), 'revenue': float(revenue)} for month, revenue in revenue_by_month
+            ]
+        }
+    
+    return conditional_json(scope_etag('court', 'stats', months[-1].strftime('%Y-%m')), build)
+
+@admin_bp.route('/api/analytics')
+@login_required
+@admin_required
+def api_analytics():
+    """Serie de reservas, ingresos u horas reservadas por día, semana o mes para cualquier rango"""
+    try:
+        start_date, end_date = date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas, use YYYY-MM-DD'}), 400
+    
+    limit = current_app.config.get('ANALYTICS_MAX_POINTS', 366)
+    max_points = min(request.args.get('max_points', limit, type=int), limit)
+    if max_points < 1:
+        return jsonify({'error': 'max_points debe ser mayor que cero'}), 400
+    
+    def build():
+        return StatsService.get_series(
+            request.args.get('metric', 'reservations'), start_date, end_date,
+            granularity=request.args.get('granularity', 'day'),
+            court_ids=request.args.getlist('court_id', type=int) or None,
+            sport_type=request.args.get('sport') or None,
+            max_points=max_points
+        )
     
+    try:
+        # El rango por defecto depende de la fecha: la ETag incluye el rango efectivo
+        etag = scope_etag('court', 'analytics', start_date.isoformat(), end_date.isoformat(), max_points)
+        return conditional_json(etag, build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@admin_bp.route('/api/daily-stats')
+@login_required
+@admin_required
+def api_daily_stats():
+    """Resumen diario por cancha para reportes (por defecto, los últimos 30 días)"""
+    try:
+        start_date, end_date = date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas, use YYYY-MM-DD'}), 400
+    
+    rows = StatsService.get_daily(start_date, end_date, request.args.get('court_id', type=int))
     return jsonify({
-        'reservations_by_month': list(reversed(months_data)),
-        'revenue_by_month': list(reversed(revenue_data))
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'totals': StatsService.get_totals(start_date, end_date),
+        'days': [{
+            'day': row.day.isoformat(),
+            'court_id': row.court_id,
+            'pending': row.pending_count,
+            'confirmed': row.confirmed_count,
+            'cancelled': row.cancelled_count,
+            'completed': row.completed_count,
+            'booked_hours': row.booked_hours,
+            'revenue': row.revenue
+        } for row in rows]
     })
+
+@admin_bp.route('/api/occupancy-heatmap')
+@login_required
+@admin_required
+def api_occupancy_heatmap():
+    """Ocupación (%) por cancha, día de la semana y hora (por defecto, los últimos 30 días)"""
+    try:
+        start_date, end_date = date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas, use YYYY-MM-DD'}), 400
+    if start_date > end_date:
+        return jsonify({'error': 'La fecha inicial debe ser anterior a la final'}), 400
+    
+    court_ids = request.args.getlist('court_id', type=int)
+    return jsonify(OccupancyService.heatmap(start_date, end_date, court_ids or None))
+
+@admin_bp.route('/api/cache-stats')
+@login_required
+@admin_required
+def api_cache_stats():
+    """Contadores de la caché de horarios para ajustar su tamaño"""
+    return jsonify({'schedule_cache': ScheduleCache.stats()})
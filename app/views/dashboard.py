@@ -1,10 +1,15 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, jsonify
 from flask_login import login_required, current_user
-from app.models.reservation import Reservation, ReservationStatus
+from app.models.reservation import Reservation
 from app.models.court import Court
-from app.models.payment import Payment
+from app.models.payment import Payment, PaymentStatus
+from app.services.leaderboard import PopularCourts
+from app.services.parallel import ParallelQueries
 from app.services.reservation_service import ReservationService
-from datetime import datetime, timedelta
+from app.services.stats_service import StatsService
+from app.services.time_buckets import TimeBuckets
+from app.utils.helpers import conditional_json, resource_etag
+from datetime import datetime
 from sqlalchemy import func
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -46,7 +51,7 @@ def dashboard_stats():
 @login_required
 def get_chart_data():
     """API para obtener datos para gráficos del dashboard"""
-    try:
+    def build():
         # Reservas por mes (últimos 6 meses)
         reservations_by_month = get_reservations_by_month(current_user.id)
         
@@ -56,11 +61,16 @@ def get_chart_data():
         # Deportes más practicados
         sports_distribution = get_sports_distribution(current_user.id)
         
-        return jsonify({
+        return {
             'reservations_by_month': reservations_by_month,
             'expenses_by_month': expenses_by_month,
             'sports_distribution': sports_distribution
-        })
+        }
+    
+    try:
+        # Los meses mostrados dependen de la fecha: la ETag incluye el mes actual
+        etag = resource_etag('user', current_user.id, 'charts', datetime.now().strftime('%Y-%m'))
+        return conditional_json(etag, build)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -69,68 +79,56 @@ def get_chart_data():
 def get_quick_stats():
     """API para obtener estadísticas rápidas"""
     try:
-        stats = get_user_stats(current_user.id)
-        return jsonify(stats)
+        etag = resource_etag('user', current_user.id, 'quick', datetime.now().strftime('%Y-%m'))
+        return conditional_json(etag, lambda: get_user_stats(current_user.id))
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@dashboard_bp.route('/api/dashboard/bundle')
+@login_required
+def get_dashboard_bundle():
+    """Todos los widgets del dashboard en una sola respuesta, con el tiempo de cada uno"""
+    user_id = current_user.id
+    widgets, errors, timings = ParallelQueries.run({
+        'stats': lambda: get_user_stats(user_id),
+        'upcoming': lambda: serialize_reservations(ReservationService.get_upcoming_reservations(user_id, limit=5)),
+        'recent': lambda: serialize_reservations(ReservationService.get_recent_reservations(user_id, limit=5)),
+        'popular_courts': get_popular_courts,
+        'reservations_by_month': lambda: get_reservations_by_month(user_id),
+        'expenses_by_month': lambda: get_expenses_by_month(user_id),
+        'sports_distribution': lambda: get_sports_distribution(user_id),
+    })
+    
+    response = jsonify({**widgets, 'errors': errors, 'timings': timings})
+    response.headers['Server-Timing'] = ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+    return response
+
+def serialize_reservations(reservations):
+    """Reservas como diccionarios (los objetos ORM no pueden salir del hilo que los cargó)"""
+    return [{
+        'id': reservation.id,
+        'court_id': reservation.court_id,
+        'court_name': reservation.court.name,
+        'start_time': reservation.start_time.isoformat(),
+        'end_time': reservation.end_time.isoformat(),
+        'status': reservation.status.name,
+        'total_amount': reservation.total_amount
+    } for reservation in reservations]
+
 def get_user_stats(user_id):
     """Obtener estadísticas básicas del usuario"""
-    now = datetime.now()
-    
-    # Total de reservas
-    total_reservations = Reservation.query.filter_by(user_id=user_id).count()
-    
-    # Reservas activas
-    active_reservations = Reservation.query.filter(
-        Reservation.user_id == user_id,
-        Reservation.status == ReservationStatus.CONFIRMED,
-        Reservation.start_time > now
-    ).count()
-    
-    # Reservas este mes
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    reservations_this_month = Reservation.query.filter(
-        Reservation.user_id == user_id,
-        Reservation.created_at >= start_of_month
-    ).count()
-    
-    # Gasto total
-    total_spent = Payment.query.join(Reservation).filter(
-        Reservation.user_id == user_id,
-        Payment.status == 'completed'
-    ).with_entities(func.sum(Payment.amount)).scalar() or 0
-    
-    # Gasto este mes
-    spent_this_month = Payment.query.join(Reservation).filter(
-        Reservation.user_id == user_id,
-        Payment.status == 'completed',
-        Payment.created_at >= start_of_month
-    ).with_entities(func.sum(Payment.amount)).scalar() or 0
-    
+    summary = StatsService.get_user_summary(user_id)
     return {
-        'total_reservations': total_reservations,
-        'active_reservations': active_reservations,
-        'reservations_this_month': reservations_this_month,
-        'total_spent': float(total_spent),
-        'spent_this_month': float(spent_this_month)
+        'total_reservations': summary['total_reservations'],
+        'active_reservations': summary['active_reservations'],
+        'reservations_this_month': summary['reservations_this_month'],
+        'total_spent': float(summary['total_spent']),
+        'spent_this_month': float(summary['spent_this_month'])
     }
 
 def get_detailed_user_stats(user_id):
     """Obtener estadísticas detalladas del usuario"""
-    basic_stats = get_user_stats(user_id)
-    
-    # Reservas canceladas
-    cancelled_reservations = Reservation.query.filter(
-        Reservation.user_id == user_id,
-        Reservation.status == ReservationStatus.CANCELLED
-    ).count()
-    
-    # Reservas completadas
-    completed_reservations = Reservation.query.filter(
-        Reservation.user_id == user_id,
-        Reservation.status == ReservationStatus.COMPLETED
-    ).count()
+    summary = StatsService.get_user_summary(user_id)
     
     # Cancha favorita
     favorite_court = get_favorite_court(user_id)
@@ -139,69 +137,39 @@ def get_detailed_user_stats(user_id):
     preferred_time = get_preferred_time(user_id)
     
     return {
-        **basic_stats,
-        'cancelled_reservations': cancelled_reservations,
-        'completed_reservations': completed_reservations,
+        'total_reservations': summary['total_reservations'],
+        'active_reservations': summary['active_reservations'],
+        'reservations_this_month': summary['reservations_this_month'],
+        'total_spent': float(summary['total_spent']),
+        'spent_this_month': float(summary['spent_this_month']),
+        'cancelled_reservations': summary['cancelled_reservations'],
+        'completed_reservations': summary['completed_reservations'],
         'favorite_court': favorite_court,
         'preferred_time': preferred_time
     }
 
 def get_reservations_by_month(user_id, months=6):
     """Obtener reservas por mes"""
-    result = []
-    now = datetime.now()
-    
-    for i in range(months):
-        # Calcular el mes
-        month_date = now - timedelta(days=30 * i)
-        start_of_month = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if month_date.month == 12:
-            end_of_month = month_date.replace(year=month_date.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            end_of_month = month_date.replace(month=month_date.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        count = Reservation.query.filter(
-            Reservation.user_id == user_id,
-            Reservation.created_at >= start_of_month,
-            Reservation.created_at < end_of_month
-        ).count()
-        
-        result.append({
-            'month': month_date.strftime('%Y-%m'),
-            'count': count
-        })
-    
-    return list(reversed(result))
+    series = TimeBuckets.series(
+        Reservation.query.filter(Reservation.user_id == user_id),
+        Reservation.created_at,
+        func.count(Reservation.id),
+        TimeBuckets.last(months, 'month')
+    )
+    return [{'month': month.strftime('%Y-%m'), 'count': count} for month, count in series]
 
 def get_expenses_by_month(user_id, months=6):
     """Obtener gastos por mes"""
-    result = []
-    now = datetime.now()
-    
-    for i in range(months):
-        # Calcular el mes
-        month_date = now - timedelta(days=30 * i)
-        start_of_month = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if month_date.month == 12:
-            end_of_month = month_date.replace(year=month_date.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            end_of_month = month_date.replace(month=month_date.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        total = Payment.query.join(Reservation).filter(
+    series = TimeBuckets.series(
+        Payment.query.join(Reservation).filter(
             Reservation.user_id == user_id,
-            Payment.status == 'completed',
-            Payment.created_at >= start_of_month,
-            Payment.created_at < end_of_month
-        ).with_entities(func.sum(Payment.amount)).scalar() or 0
-        
-        result.append({
-            'month': month_date.strftime('%Y-%m'),
-            'amount': float(total)
-        })
-    
-    return list(reversed(result))
+            Payment.status == PaymentStatus.COMPLETED
+        ),
+        Payment.created_at,
+        func.sum(Payment.amount),
+        TimeBuckets.last(months, 'month')
+    )
+    return [{'month': month.strftime('%Y-%m'), 'amount': float(total)} for month, total in series]
 
 def get_sports_distribution(user_id):
     """Obtener distribución de deportes/canchas"""
@@ -221,25 +189,7 @@ def get_sports_distribution(user_id):
 
 def get_popular_courts(limit=5):
     """Obtener canchas más populares"""
-    from sqlalchemy import func
-    
-    result = Court.query.join(Reservation).filter(
-        Court.is_active == True
-    ).with_entities(
-        Court.id,
-        Court.name,
-        Court.sport_type,
-        func.count(Reservation.id).label('reservation_count')
-    ).group_by(Court.id).order_by(
-        func.count(Reservation.id).desc()
-    ).limit(limit).all()
-    
-    return [{
-        'id': court_id,
-        'name': name,
-        'sport_type': sport_type,
-        'reservation_count': count
-    } for court_id, name, sport_type, count in result]
+    return PopularCourts.top(limit)
 
 def get_favorite_court(user_id):
     """Obtener cancha favorita del usuario"""
@@ -40,8 +40,16 @@ def available_slots():
     except ValueError:
         return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
     
-    # Obtener slots disponibles
-    available_slots = ReservationService.get_available_slots(court_id, date)
+    # Obtener slots disponibles (duración y granularidad en minutos)
+    try:
+        available_slots = ReservationService.get_available_slots(
+            court_id, date,
+            duration_minutes=request.args.get('duration', type=int),
+            slot_minutes=request.args.get('slot_minutes', type=int),
+            user_id=current_user.id if current_user.is_authenticated else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'available_slots': [
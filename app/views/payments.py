@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
+from app import db
+from app.models.court import Court
 from app.models.reservation import Reservation
-from app.models.payment import PaymentMethod
+from app.models.payment import Payment, PaymentMethod, PaymentStatus
 from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+from app.services.slot_holds import SlotHolds
+import hashlib
+import uuid
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -16,7 +22,45 @@ def process_payment(reservation_id):
         flash('No tienes permisos para pagar esta reserva', 'error')
         return redirect(url_for('reservations.my_reservations'))
     
-    return render_template('payments/process_payment.html', reservation=reservation)
+    # Una clave por formulario: los reenvíos del mismo formulario no cobran dos veces
+    return render_template('payments/process_payment.html', reservation=reservation,
+                           idempotency_key=uuid.uuid4().hex)
+
+@payments_bp.route('/checkout/<hold_id>')
+@login_required
+def checkout(hold_id):
+    """Mostrar página de pago de un horario retenido (aún sin reserva en la base de datos)"""
+    hold = SlotHolds.get(hold_id)
+    if not hold or hold.user_id != current_user.id:
+        flash('La retención del horario expiró. Selecciona el horario de nuevo', 'error')
+        return redirect(url_for('reservations.make_reservation'))
+    
+    return render_template(
+        'payments/process_payment.html',
+        reservation=hold,
+        court=db.session.get(Court, hold.court_id),
+        form_action=url_for('payments.complete_checkout', hold_id=hold.id),
+        hold_minutes=max(int(hold.seconds_left() // 60), 1),
+        idempotency_key=uuid.uuid4().hex
+    )
+
+@payments_bp.route('/checkout/<hold_id>', methods=['POST'])
+@login_required
+def complete_checkout(hold_id):
+    """Convertir la retención en reserva y procesar el pago"""
+    # Reenvío de un checkout ya procesado: la retención ya se convirtió en reserva
+    key = idempotency_key_arg()
+    previous = Payment.query.filter_by(idempotency_key=key).first() if key else None
+    if previous is not None and previous.user_id == current_user.id:
+        return complete_payment(previous.reservation_id)
+    
+    try:
+        reservation = ReservationService.reserve_held_slot(hold_id, current_user.id)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('reservations.make_reservation'))
+    
+    return complete_payment(reservation.id)
 
 @payments_bp.route('/complete_payment/<int:reservation_id>', methods=['POST'])
 @login_required
@@ -41,19 +85,42 @@ def complete_payment(reservation_id):
         }
         print("Datos de tarjeta recibidos:", card_data)
         
-        payment = PaymentService.process_payment(
-            user_id=current_user.id,
-            reservation_id=reservation_id,
-            payment_method=payment_method,
-            amount=reservation.total_amount,
-            card_data=card_data
-        )
+        if current_app.config.get('PAYMENTS_ASYNC'):
+            # Encolar y responder sin esperar al gateway
+            payment = PaymentService.submit_payment(
+                user_id=current_user.id,
+                reservation_id=reservation_id,
+                payment_method=payment_method,
+                amount=reservation.total_amount,
+                card_data=card_data,
+                idempotency_key=idempotency_key_arg()
+            )
+            if payment.status == PaymentStatus.PENDING and request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'payment_id': payment.id,
+                    'status': payment.status.value,
+                    'status_url': url_for('payments.payment_status', payment_id=payment.id)
+                }), 202
+        else:
+            payment = PaymentService.process_payment(
+                user_id=current_user.id,
+                reservation_id=reservation_id,
+                payment_method=payment_method,
+                amount=reservation.total_amount,
+                card_data=card_data,
+                idempotency_key=idempotency_key_arg()
+            )
         
         print("Pago procesado:", payment)
         
         if payment.status.value == 'completed':
             flash('Pago procesado exitosamente', 'success')
             return redirect(url_for('reservations.my_reservations'))
+        elif payment.status.value == 'pending':
+            return redirect(url_for('payments.payment_pending', payment_id=payment.id))
+        elif payment.status.value == 'refunded':
+            flash('La reserva ya no estaba disponible: el cobro fue reembolsado', 'error')
+            return redirect(url_for('reservations.my_reservations'))
         else:
             flash('Error al procesar el pago', 'error')
             return redirect(url_for('payments.process_payment', reservation_id=reservation.id))
@@ -62,4 +129,47 @@ def complete_payment(reservation_id):
         print("ERROR AL PROCESAR EL PAGO:", e)
         import traceback; traceback.print_exc()
         flash(f'Error al procesar el pago: {str(e)}', 'error')
-        return redirect(url_for('payments.process_payment', reservation_id=reservation.id))
\ No newline at end of file
+        return redirect(url_for('payments.process_payment', reservation_id=reservation.id))
+
+@payments_bp.route('/<int:payment_id>/status')
+@login_required
+def payment_status(payment_id):
+    """Estado de un pago; con ?wait=N espera hasta N segundos mientras siga pendiente"""
+    row = PaymentService.get_status(payment_id)
+    if row is None or row.user_id != current_user.id:
+        return jsonify({'error': 'Pago no encontrado'}), 404
+    
+    wait = min(max(request.args.get('wait', 0, type=float), 0), current_app.config.get('PAYMENT_STATUS_MAX_WAIT', 10))
+    if row.status == PaymentStatus.PENDING and wait:
+        row = PaymentService.get_status(payment_id, wait)
+    return jsonify({
+        'id': row.id,
+        'reservation_id': row.reservation_id,
+        'status': row.status.value,
+        'message': row.gateway_response if row.status == PaymentStatus.FAILED else None
+    })
+
+@payments_bp.route('/<int:payment_id>/pending')
+@login_required
+def payment_pending(payment_id):
+    """Página que espera el resultado de un pago en proceso"""
+    row = PaymentService.get_status(payment_id)
+    if row is None or row.user_id != current_user.id:
+        flash('Pago no encontrado', 'error')
+        return redirect(url_for('reservations.my_reservations'))
+    if row.status == PaymentStatus.COMPLETED:
+        flash('Pago procesado exitosamente', 'success')
+        return redirect(url_for('reservations.my_reservations'))
+    if row.status != PaymentStatus.PENDING:
+        flash('Error al procesar el pago', 'error')
+        return redirect(url_for('payments.process_payment', reservation_id=row.reservation_id))
+    
+    return render_template('payments/payment_pending.html', payment_id=payment_id)
+
+def idempotency_key_arg():
+    """Clave de idempotencia del formulario o del encabezado Idempotency-Key"""
+    key = request.form.get('idempotency_key') or request.headers.get('Idempotency-Key')
+    if key and len(key) > 64:
+        # La columna guarda 64 caracteres: las claves más largas se reducen a su hash
+        key = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return key or None
@@ -3,13 +3,17 @@ from flask_login import login_required, current_user
 from app.models.court import Court
 from app.models.reservation import Reservation
 from app.services.reservation_service import ReservationService
-from app.services.email_service import EmailService
+from app.services.waitlist_service import WaitlistService
+from app.services.slot_holds import SlotHolds
+from app.utils.helpers import conditional_json, resource_etag
 from app.models.user import User
 from datetime import datetime, timedelta
 import json
 
 reservations_bp = Blueprint('reservations', __name__)
 
+MAX_GRID_DAYS = 31
+
 @reservations_bp.route('/courts')
 @login_required
 def view_courts():
@@ -45,6 +49,17 @@ def make_reservation():
                 flash('La hora de fin debe ser posterior a la hora de inicio', 'error')
                 return redirect(url_for('reservations.make_reservation'))
 
+            # Retener el horario: la reserva se escribe recién al iniciar el pago
+            if SlotHolds.enabled():
+                hold = ReservationService.hold_slot(
+                    user_id=current_user.id,
+                    court_id=court_id,
+                    start_time=start_datetime,
+                    end_time=end_datetime,
+                    notes=notes
+                )
+                return redirect(url_for('payments.checkout', hold_id=hold.id))
+
             # Crear reserva
             reservation = ReservationService.create_reservation(
                 user_id=current_user.id,
@@ -70,6 +85,66 @@ def make_reservation():
         timedelta=timedelta
     )
 
+@reservations_bp.route('/make_recurring_reservation', methods=['POST'])
+@login_required
+def make_recurring_reservation():
+    """Crear una serie de reservas semanales o quincenales (formulario o JSON)"""
+    data = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    try:
+        court_id = int(data.get('court_id'))
+        date = datetime.strptime(data.get('date'), '%Y-%m-%d').date()
+        start_time = datetime.strptime(data.get('start_time'), '%H:%M').time()
+        duration = int(data.get('duration'))
+        count = int(data['count']) if data.get('count') else None
+        until = datetime.strptime(data['until'], '%Y-%m-%d').date() if data.get('until') else None
+    except (TypeError, ValueError):
+        message = 'Datos inválidos: court_id, date (YYYY-MM-DD), start_time (HH:MM), duration y count o until son requeridos'
+        if request.is_json:
+            return jsonify(success=False, message=message), 400
+        flash(message, 'error')
+        return redirect(url_for('reservations.make_reservation'))
+    
+    start_datetime = datetime.combine(date, start_time)
+    try:
+        if start_datetime <= datetime.now():
+            raise ValueError('No puedes reservar en el pasado')
+        results = ReservationService.create_recurring_reservations(
+            user_id=current_user.id,
+            court_id=court_id,
+            start_time=start_datetime,
+            end_time=start_datetime + timedelta(hours=duration),
+            frequency=data.get('frequency', 'weekly'),
+            count=count,
+            until=until,
+            notes=data.get('notes')
+        )
+    except ValueError as e:
+        if request.is_json:
+            return jsonify(success=False, message=str(e)), 400
+        flash(f'Error al crear la serie: {e}', 'error')
+        return redirect(url_for('reservations.make_reservation'))
+    
+    created = [r for r in results if r['reservation']]
+    if request.is_json:
+        return jsonify(
+            success=True,
+            created=len(created),
+            conflicts=len(results) - len(created),
+            occurrences=[
+                {
+                    'start_time': r['start_time'].isoformat(),
+                    'end_time': r['end_time'].isoformat(),
+                    'reservation_id': r['reservation'].id if r['reservation'] else None,
+                    'conflict_with': r['conflict_with']
+                }
+                for r in results
+            ]
+        ), 201 if created else 409
+    
+    flash(f'Serie creada: {len(created)} reservas, {len(results) - len(created)} con conflicto', 
+          'success' if created else 'error')
+    return redirect(url_for('reservations.my_reservations'))
+
 @reservations_bp.route('/my_reservations')
 @login_required
 def my_reservations():
@@ -83,33 +158,114 @@ def my_reservations():
 def cancel_reservation(reservation_id):
     try:
         reservation = Reservation.query.get_or_404(reservation_id)
+        # El aviso por email lo encola cancel_reservation en el outbox
         ReservationService.cancel_reservation(reservation_id, current_user.id)
-        # Notificar por email
-        EmailService.send_reservation_cancellation(current_user, reservation)
         flash(f'Reserva #{reservation.id} cancelada correctamente.', 'success')
         return jsonify(success=True)
     except ValueError as e:
         flash(f'Error al cancelar la reserva: {str(e)}', 'error')
         return jsonify(success=False, message=str(e)), 400
 
-@reservations_bp.route('/api/court/<int:court_id>/schedule')
+@reservations_bp.route('/waitlist', methods=['POST'])
 @login_required
-def api_court_schedule(court_id):
-    date_str = request.args.get('date')
-    from datetime import datetime
-    date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    reservations = ReservationService.get_court_schedule(court_id, date)
+def join_waitlist():
+    """Anotarse en la lista de espera de un horario ocupado"""
+    data = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    try:
+        court_id = int(data.get('court_id'))
+        date = datetime.strptime(data.get('date'), '%Y-%m-%d').date()
+        start_time = datetime.strptime(data.get('start_time'), '%H:%M').time()
+        duration = int(data.get('duration'))
+    except (TypeError, ValueError):
+        return jsonify(success=False, message='Datos inválidos: court_id, date, start_time y duration son requeridos'), 400
+    
+    start_datetime = datetime.combine(date, start_time)
+    try:
+        if start_datetime <= datetime.now():
+            raise ValueError('No puedes anotarte para un horario pasado')
+        entry = WaitlistService.join(
+            current_user.id, court_id, start_datetime, start_datetime + timedelta(hours=duration)
+        )
+    except ValueError as e:
+        return jsonify(success=False, message=str(e)), 400
+    return jsonify(success=True, entry_id=entry.id), 201
+
+@reservations_bp.route('/waitlist/<int:entry_id>/leave', methods=['POST'])
+@login_required
+def leave_waitlist(entry_id):
+    try:
+        WaitlistService.leave(entry_id, current_user.id)
+        return jsonify(success=True)
+    except ValueError as e:
+        return jsonify(success=False, message=str(e)), 400
+
+@reservations_bp.route('/api/waitlist')
+@login_required
+def api_waitlist():
+    entries = WaitlistService.get_user_entries(current_user.id)
     return jsonify({
-        "occupied_slots": [
+        "entries": [
             {
-                "start_time": r.start_time.strftime('%H:%M'),
-                "end_time": r.end_time.strftime('%H:%M'),
-                "user_id": r.user_id
+                "id": e.id,
+                "court_id": e.court_id,
+                "start_time": e.start_time.isoformat(),
+                "end_time": e.end_time.isoformat()
             }
-            for r in reservations
+            for e in entries
         ]
     })
 
+@reservations_bp.route('/api/court/<int:court_id>/schedule')
+@login_required
+def api_court_schedule(court_id):
+    date_str = request.args.get('date')
+    from datetime import datetime
+    date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    
+    def build():
+        reservations = ReservationService.get_court_schedule(court_id, date)
+        return {
+            "occupied_slots": [
+                {
+                    "start_time": r.start_time.strftime('%H:%M'),
+                    "end_time": r.end_time.strftime('%H:%M'),
+                    "user_id": r.user_id
+                }
+                for r in reservations
+            ]
+        }
+    
+    return conditional_json(resource_etag('court', court_id, date.isoformat()), build)
+
+@reservations_bp.route('/api/availability-grid')
+@login_required
+def api_availability_grid():
+    """Disponibilidad de varias canchas y días en una sola respuesta"""
+    start_str = request.args.get('start')
+    days = request.args.get('days', 14, type=int)
+    courts_str = request.args.get('courts', '')
+    encoding = request.args.get('encoding', 'bits')
+    
+    try:
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else datetime.today().date()
+        court_ids = [int(c) for c in courts_str.split(',') if c.strip()]
+    except ValueError:
+        return jsonify({'error': 'Parámetros inválidos. Use start=YYYY-MM-DD y courts=1,2,3'}), 400
+    
+    if not 1 <= days <= MAX_GRID_DAYS:
+        return jsonify({'error': f'El rango debe estar entre 1 y {MAX_GRID_DAYS} días'}), 400
+    
+    try:
+        grid = ReservationService.get_availability_grid(
+            start_date, days, court_ids or None,
+            slot_minutes=request.args.get('slot_minutes', type=int),
+            encoding=encoding,
+            user_id=current_user.id
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(grid)
+
 @reservations_bp.route('/court_schedule/<int:court_id>/<date>')
 @login_required
 def court_schedule(court_id, date):
@@ -0,0 +1,49 @@
+"""add reservation and payment indexes
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+ACTIVE_STATUSES_SQL = "status IN ('PENDING', 'CONFIRMED')"
+
+
+def upgrade():
+    # Asume que las tablas ya existen (el proyecto no incluye migración inicial);
+    # if_not_exists permite aplicarla sobre bases creadas con db.create_all().
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_index('ix_reservations_court_status_time', ['court_id', 'status', 'start_time', 'end_time'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_reservations_user_status_start', ['user_id', 'status', 'start_time'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_reservations_created_at', ['created_at'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_reservations_start_time', ['start_time'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_reservations_active_court_time', ['court_id', 'start_time', 'end_time'], unique=False, if_not_exists=True,
+                              sqlite_where=sa.text(ACTIVE_STATUSES_SQL), postgresql_where=sa.text(ACTIVE_STATUSES_SQL))
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_status_created', ['status', 'created_at'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_payments_reservation_id', ['reservation_id'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_payments_user_id', ['user_id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_user_id')
+        batch_op.drop_index('ix_payments_reservation_id')
+        batch_op.drop_index('ix_payments_status_created')
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_active_court_time')
+        batch_op.drop_index('ix_reservations_start_time')
+        batch_op.drop_index('ix_reservations_created_at')
+        batch_op.drop_index('ix_reservations_user_status_start')
+        batch_op.drop_index('ix_reservations_court_status_time')
@@ -0,0 +1,38 @@
+"""add reservation slots
+
+Revision ID: 8b4e6d2c5a31
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d2c5a31'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reservation_slots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('court_id', sa.Integer(), nullable=False),
+    sa.Column('slot_start', sa.DateTime(), nullable=False),
+    sa.Column('reservation_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['court_id'], ['courts.id'], ),
+    sa.ForeignKeyConstraint(['reservation_id'], ['reservations.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('court_id', 'slot_start', name='uq_reservation_slots_court_slot')
+    )
+    with op.batch_alter_table('reservation_slots', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reservation_slots_reservation_id'), ['reservation_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reservation_slots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reservation_slots_reservation_id'))
+
+    op.drop_table('reservation_slots')
@@ -0,0 +1,29 @@
+"""add resource versions for conditional GET
+
+Revision ID: a9e3c5f7d1b2
+Revises: f1c4a7e2b8d3
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e3c5f7d1b2'
+down_revision = 'f1c4a7e2b8d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resource_versions',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('resource_versions')
@@ -0,0 +1,28 @@
+"""add payment idempotency key
+
+Revision ID: b4d8f2a6c3e7
+Revises: a9e3c5f7d1b2
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d8f2a6c3e7'
+down_revision = 'a9e3c5f7d1b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_payments_idempotency_key', ['idempotency_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_idempotency_key')
+        batch_op.drop_column('idempotency_key')
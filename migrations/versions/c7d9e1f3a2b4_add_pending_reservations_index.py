@@ -0,0 +1,29 @@
+"""add pending reservations index
+
+Revision ID: c7d9e1f3a2b4
+Revises: 8b4e6d2c5a31
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d9e1f3a2b4'
+down_revision = '8b4e6d2c5a31'
+branch_labels = None
+depends_on = None
+
+PENDING_STATUS_SQL = "status IN ('PENDING')"
+
+
+def upgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_index('ix_reservations_pending_created', ['created_at'], unique=False, if_not_exists=True,
+                              sqlite_where=sa.text(PENDING_STATUS_SQL), postgresql_where=sa.text(PENDING_STATUS_SQL))
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_pending_created')
@@ -0,0 +1,48 @@
+"""add waitlist entries
+
+Revision ID: d2a8f4b6c9e1
+Revises: c7d9e1f3a2b4
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f4b6c9e1'
+down_revision = 'c7d9e1f3a2b4'
+branch_labels = None
+depends_on = None
+
+WAITING_STATUS_SQL = "status IN ('WAITING')"
+
+
+def upgrade():
+    op.create_table('waitlist_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('court_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.Enum('WAITING', 'PROMOTED', 'CANCELLED', name='waitliststatus'), nullable=False),
+    sa.Column('reservation_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('promoted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['court_id'], ['courts.id'], ),
+    sa.ForeignKeyConstraint(['reservation_id'], ['reservations.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('waitlist_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_waitlist_user_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_waitlist_waiting_court_start', ['court_id', 'start_time', 'created_at'], unique=False,
+                              sqlite_where=sa.text(WAITING_STATUS_SQL), postgresql_where=sa.text(WAITING_STATUS_SQL))
+
+
+def downgrade():
+    with op.batch_alter_table('waitlist_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_waitlist_waiting_court_start')
+        batch_op.drop_index('ix_waitlist_user_status')
+
+    op.drop_table('waitlist_entries')
@@ -0,0 +1,58 @@
+"""add slot holds
+
+Revision ID: d8f3b1e7a5c2
+Revises: c7e1a5d9b3f4
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b1e7a5c2'
+down_revision = 'c7e1a5d9b3f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('slot_holds',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('court_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['court_id'], ['courts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('slot_holds', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_slot_holds_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_slot_holds_user_id'), ['user_id'], unique=False)
+
+    # Los slots pasan a reclamarse también por retenciones: reservation_id admite NULL
+    with op.batch_alter_table('reservation_slots', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hold_id', sa.String(length=32), nullable=True))
+        batch_op.alter_column('reservation_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_index(batch_op.f('ix_reservation_slots_hold_id'), ['hold_id'], unique=False)
+        batch_op.create_foreign_key('fk_reservation_slots_hold_id', 'slot_holds', ['hold_id'], ['id'])
+
+
+def downgrade():
+    op.execute('DELETE FROM reservation_slots WHERE reservation_id IS NULL')
+    with op.batch_alter_table('reservation_slots', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_reservation_slots_hold_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_reservation_slots_hold_id'))
+        batch_op.alter_column('reservation_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('hold_id')
+
+    with op.batch_alter_table('slot_holds', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_slot_holds_user_id'))
+        batch_op.drop_index(batch_op.f('ix_slot_holds_expires_at'))
+
+    op.drop_table('slot_holds')
@@ -0,0 +1,36 @@
+"""add daily stats rollup
+
+Revision ID: e5b7c3d9f2a4
+Revises: d2a8f4b6c9e1
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7c3d9f2a4'
+down_revision = 'd2a8f4b6c9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('court_id', sa.Integer(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('confirmed_count', sa.Integer(), nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('booked_hours', sa.Float(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['court_id'], ['courts.id'], ),
+    sa.PrimaryKeyConstraint('day', 'court_id')
+    )
+    # Los datos existentes se cargan con `flask rebuild-stats`
+
+
+def downgrade():
+    op.drop_table('daily_stats')
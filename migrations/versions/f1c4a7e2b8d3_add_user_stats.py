@@ -0,0 +1,38 @@
+"""add user stats summary
+
+Revision ID: f1c4a7e2b8d3
+Revises: e5b7c3d9f2a4
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c4a7e2b8d3'
+down_revision = 'e5b7c3d9f2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_reservations', sa.Integer(), nullable=False),
+    sa.Column('pending_reservations', sa.Integer(), nullable=False),
+    sa.Column('active_reservations', sa.Integer(), nullable=False),
+    sa.Column('cancelled_reservations', sa.Integer(), nullable=False),
+    sa.Column('completed_reservations', sa.Integer(), nullable=False),
+    sa.Column('total_spent', sa.Float(), nullable=False),
+    sa.Column('current_month', sa.Date(), nullable=True),
+    sa.Column('reservations_this_month', sa.Integer(), nullable=False),
+    sa.Column('spent_this_month', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Los contadores existentes se cargan con `flask check-user-stats --repair`
+
+
+def downgrade():
+    op.drop_table('user_stats')
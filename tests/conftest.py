@@ -3,6 +3,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
 from app import create_app, db
 from app.models.user import User
 from app.models.court import Court
@@ -86,6 +88,56 @@ def db_session(app):
         db.session.remove()
         db.drop_all()
 
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'file_config(**options): configuración extra para la fixture file_app')
+
+@pytest.fixture
+def file_app(request, tmp_path):
+    """App sobre un archivo SQLite con testuser y una cancha: cada hilo obtiene su propia conexión.
+
+    La marca `file_config(**opciones)` del test o del módulo agrega configuración.
+    """
+    marker = request.node.get_closest_marker('file_config')
+    FileConfig = type('FileConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        **(marker.kwargs if marker else {})
+    })
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='testuser', email='test@example.com', first_name='Test', last_name='User')
+        user.set_password('password123')
+        court = Court(name='Test Court', sport_type='futbol', capacity=10, hourly_rate=50.0,
+                      opening_time=time(8, 0), closing_time=time(22, 0))
+        db.session.add_all([user, court])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def capture_sql(app):
+    """Context manager que registra las sentencias SQL ejecutadas dentro del bloque.
+
+    `selects_only` descarta las escrituras y `with_parameters` guarda pares
+    (sentencia, parámetros) en lugar de solo la sentencia.
+    """
+    @contextmanager
+    def capture(selects_only=False, with_parameters=False):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if selects_only and not statement.lstrip().upper().startswith('SELECT'):
+                return
+            statements.append((statement, parameters) if with_parameters else statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return capture
+
 @pytest.fixture
 def sample_user(db_session):
     """Fixture de usuario de prueba"""
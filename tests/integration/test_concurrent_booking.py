@@ -0,0 +1,96 @@
+import random
+import threading
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta, time as dtime
+from app import db
+from app.models import User, Court, Reservation
+from app.services.reservation_service import ReservationService
+
+WORKERS = 8
+ATTEMPTS_PER_WORKER = 40
+DAY = datetime(2030, 5, 6)
+
+def concurrent_config(index_enabled):
+    return pytest.mark.file_config(RESERVATION_INDEX_ENABLED=index_enabled, BOOKING_MAX_RETRIES=20)
+
+@pytest.fixture
+def players(file_app):
+    """Un usuario por hilo y una segunda cancha; devuelve (ids de usuarios, ids de canchas)"""
+    with file_app.app_context():
+        users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x',
+                      first_name='Test', last_name='User') for i in range(WORKERS)]
+        court = Court(name='Cancha 2', sport_type='futbol', capacity=10, hourly_rate=10.0,
+                      opening_time=dtime(8, 0), closing_time=dtime(22, 0))
+        db.session.add_all([*users, court])
+        db.session.commit()
+        court_ids = [court_id for court_id, in db.session.query(Court.id).order_by(Court.id)]
+        return [user.id for user in users], court_ids
+
+def book(app, user_id, court_ids, results, barrier):
+    rng = random.Random(user_id)
+    booked = conflicts = 0
+    with app.app_context():
+        barrier.wait()
+        for _ in range(ATTEMPTS_PER_WORKER):
+            # Inicios cada 30 minutos y duraciones de 1 a 2 horas: muchos solapes posibles
+            start_time = DAY + timedelta(hours=8, minutes=30 * rng.randrange(24))
+            end_time = start_time + timedelta(minutes=rng.choice([60, 90, 120]))
+            try:
+                ReservationService.create_reservation(user_id, rng.choice(court_ids), start_time, end_time)
+                booked += 1
+            except ValueError:
+                conflicts += 1
+        db.session.remove()
+    results.append((booked, conflicts))
+
+@pytest.mark.parametrize('mode', [
+    pytest.param('index', marks=concurrent_config(True)),
+    pytest.param('sql', marks=concurrent_config(False)),
+])
+def test_concurrent_bookings_never_overlap(file_app, players, mode):
+    assert file_app.config['RESERVATION_INDEX_ENABLED'] == (mode == 'index')
+    assert file_app.config['BOOKING_MAX_RETRIES'] == 20
+    user_ids, court_ids = players
+    results = []
+    barrier = threading.Barrier(WORKERS)
+    threads = [threading.Thread(target=book, args=(file_app, user_id, court_ids, results, barrier))
+               for user_id in user_ids]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    booked = sum(r[0] for r in results)
+    conflicts = sum(r[1] for r in results)
+
+    with file_app.app_context():
+        reservations = Reservation.query.filter(Reservation.active_filter()).order_by(
+            Reservation.court_id, Reservation.start_time
+        ).all()
+        double_bookings = [
+            (a.id, b.id) for a, b in zip(reservations, reservations[1:])
+            if a.court_id == b.court_id and b.start_time < a.end_time
+        ]
+
+    assert double_bookings == []
+    assert len(reservations) == booked > 0
+    assert booked + conflicts == WORKERS * ATTEMPTS_PER_WORKER
+
+def test_slot_claims_reject_overlap_missed_by_check(db_session, sample_user, sample_court):
+    start_time = DAY.replace(hour=10)
+    first = ReservationService.create_reservation(sample_user.id, sample_court.id, start_time, start_time + timedelta(hours=1))
+
+    # Simular la carrera: la verificación no ve la reserva que otro escritor acaba de crear
+    with patch.object(ReservationService, 'check_availability', return_value=True):
+        with pytest.raises(ValueError):
+            ReservationService.create_reservation(
+                sample_user.id, sample_court.id, start_time + timedelta(minutes=30), start_time + timedelta(hours=2)
+            )
+
+    ReservationService.cancel_reservation(first.id)
+    with patch.object(ReservationService, 'check_availability', return_value=True):
+        second = ReservationService.create_reservation(
+            sample_user.id, sample_court.id, start_time + timedelta(minutes=30), start_time + timedelta(hours=2)
+        )
+    assert second.id is not None
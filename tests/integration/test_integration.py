@@ -18,7 +18,7 @@ def test_integration_reservation_payment_email(init_database):
     end_time = start_time + timedelta(hours=1)
     
     with patch('app.services.email_service.EmailService.send_email'), \
-         patch('app.services.payment_service.PaymentService._simulate_payment_gateway', return_value=True):
+         patch('app.services.payment_service.PaymentService._charge_gateway', return_value=True):
         
         # Verify no conflicting reservations exist
         assert ReservationService.check_availability(court.id, start_time, end_time), "Court should be available"
@@ -71,14 +71,14 @@ def test_integration_user_multiple_reservations(db_session, sample_user, sample_
     # Horarios dentro del rango permitido
     reservation1 = ReservationService.create_reservation(
         sample_user.id, sample_court.id,
-        datetime.now().replace(hour=10, minute=0) + timedelta(days=1),
-        datetime.now().replace(hour=11, minute=0) + timedelta(days=1)
+        datetime.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1),
+        datetime.now().replace(hour=11, minute=0, second=0, microsecond=0) + timedelta(days=1)
     )
     
     reservation2 = ReservationService.create_reservation(
         sample_user.id, sample_court.id,
-        datetime.now().replace(hour=14, minute=0) + timedelta(days=2),
-        datetime.now().replace(hour=15, minute=0) + timedelta(days=2)
+        datetime.now().replace(hour=14, minute=0, second=0, microsecond=0) + timedelta(days=2),
+        datetime.now().replace(hour=15, minute=0, second=0, microsecond=0) + timedelta(days=2)
     )
     
     # Refrescar el usuario para obtener las relaciones actualizadas
@@ -89,7 +89,7 @@ def test_integration_user_multiple_reservations(db_session, sample_user, sample_
 # def test_integration_failed_payment_reservation_status(init_database):
 #     reservation = db.session.get(Reservation, 1)
     
-#     with patch('app.services.payment_service.PaymentService._simulate_payment_gateway', return_value=False):
+#     with patch('app.services.payment_service.PaymentService._charge_gateway', return_value=False):
 #         payment = PaymentService.process_payment(1, reservation.id, PaymentMethod.CREDIT_CARD, 100.0)
 #         updated_reservation = db.session.get(Reservation, reservation.id)
         
@@ -0,0 +1,87 @@
+"""
+Prueba de carga del adaptador HTTP del gateway contra el gateway local de prueba.
+
+Compara la sesión persistente con pool de conexiones frente a abrir una conexión por
+llamada, y muestra el histograma de latencias y el estado del circuito.
+
+Uso:
+    python tests/rendimiento/benchmark_gateway.py --calls 2000 --concurrency 16 --latency-ms 20 --failure-rate 0.02
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.models.payment import PaymentMethod
+from app.services.gateway_stub import create_stub_gateway
+from app.services.payment_gateway import GatewayError, HttpGateway
+
+
+class UnpooledGateway(HttpGateway):
+    """Una conexión nueva por llamada, como un requests.post suelto"""
+
+    def _post(self, path, idempotency_key, payload):
+        self.session.close()
+        self.session = requests.Session()
+        return super()._post(path, idempotency_key, payload)
+
+
+def run(gateway_class, url, args):
+    gateway = gateway_class(url, pool_size=args.concurrency, read_timeout=args.timeout,
+                            failure_threshold=args.failure_threshold, reset_timeout=1)
+    outcomes = {'approved': 0, 'declined': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def call(index):
+        payment = SimpleNamespace(transaction_id=f'{gateway_class.__name__}-{index}', amount=10.0,
+                                  payment_method=PaymentMethod.CREDIT_CARD)
+        try:
+            outcome = 'approved' if gateway.charge(payment) else 'declined'
+        except GatewayError:
+            outcome = 'errors'
+        with lock:
+            outcomes[outcome] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(call, range(args.calls)))
+    elapsed = time.perf_counter() - started
+
+    latency = gateway.stats()['latency']['charge']
+    print(f'{gateway_class.__name__:>15} | {args.calls / elapsed:8.1f} llamadas/s | '
+          f'p50 {latency["p50"]} ms p95 {latency["p95"]} ms p99 {latency["p99"]} ms | '
+          f'circuito {gateway.breaker.state} | {outcomes}')
+    gateway.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--decline-rate', type=float, default=0.05)
+    parser.add_argument('--timeout', type=float, default=2, help='Timeout de lectura por llamada (s)')
+    parser.add_argument('--failure-threshold', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    stub = create_stub_gateway(args.latency_ms, args.jitter_ms, args.failure_rate, args.decline_rate)
+    server = make_server('127.0.0.1', 0, stub, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    try:
+        for gateway_class in (HttpGateway, UnpooledGateway):
+            run(gateway_class, url, args)
+    finally:
+        server.shutdown()
@@ -0,0 +1,120 @@
+"""
+Benchmark de check_availability: consulta SQL frente al índice en memoria por cancha.
+
+Uso:
+    python tests/rendimiento/benchmark_interval_index.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, time as dtime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import User, Court, Reservation
+from app.models.reservation import ReservationStatus
+from app.services.interval_index import ReservationIndex
+from app.services.reservation_service import ReservationService
+from app.services.slot_holds import SlotHolds
+
+COURTS = 10
+START = datetime(2024, 1, 1, 8, 0)
+
+
+def build_config(path):
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        # Con retenciones activas check_availability no debe consultar la base de datos
+        SLOT_HOLDS_ENABLED = True
+        SLOT_HOLDS_PER_USER = COURTS
+    return BenchmarkConfig
+
+
+def populate(size):
+    """Insertar `size` reservas de 1 hora repartidas entre las canchas, sin solapes"""
+    db.session.add(User(username='bench', email='bench@example.com', password_hash='x',
+                        first_name='Bench', last_name='User'))
+    for i in range(COURTS):
+        db.session.add(Court(name=f'Cancha {i}', sport_type='futbol', capacity=10, hourly_rate=10.0,
+                             opening_time=dtime(0, 0), closing_time=dtime(23, 59)))
+    db.session.commit()
+
+    statuses = [ReservationStatus.PENDING, ReservationStatus.CONFIRMED, ReservationStatus.CANCELLED]
+    table = Reservation.__table__
+    chunk = []
+    for i in range(size):
+        court_id = i % COURTS + 1
+        # Cada cancha ocupa una hora de cada dos
+        start_time = START + timedelta(hours=2 * (i // COURTS))
+        chunk.append({
+            'user_id': 1, 'court_id': court_id,
+            'start_time': start_time, 'end_time': start_time + timedelta(hours=1),
+            'total_amount': 10.0, 'status': random.choice(statuses).name,
+            'created_at': START, 'updated_at': START,
+        })
+        if len(chunk) == 50000:
+            db.session.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+    db.session.commit()
+    return START + timedelta(hours=2 * (size // COURTS))
+
+
+def probes(count, last_start):
+    span = int((last_start - START).total_seconds() // 1800) or 1
+    for _ in range(count):
+        start_time = START + timedelta(minutes=30 * random.randrange(span))
+        yield random.randint(1, COURTS), start_time, start_time + timedelta(hours=1)
+
+
+def run(size, queries):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app(build_config(path))
+        with app.app_context():
+            db.create_all()
+            last_start = populate(size)
+            # Una retención vigente por cancha, en la hora libre siguiente a la primera reserva
+            for court_id in range(1, COURTS + 1):
+                SlotHolds.acquire(1, court_id, START + timedelta(hours=1), START + timedelta(hours=2), 10.0)
+            sample = list(probes(queries, last_start))
+
+            started = time.perf_counter()
+            sql_results = [ReservationService._check_availability_sql(*p) for p in sample]
+            sql_elapsed = time.perf_counter() - started
+
+            ReservationIndex.invalidate()
+            started = time.perf_counter()
+            for court_id in range(1, COURTS + 1):
+                ReservationIndex.get(court_id)
+            load_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            index_results = [ReservationService.check_availability(*p) for p in sample]
+            index_elapsed = time.perf_counter() - started
+
+            assert sql_results == index_results, 'El índice y SQL devolvieron resultados distintos'
+            db.session.remove()
+            db.drop_all()
+    finally:
+        os.remove(path)
+
+    print(f'{size:>9} reservas | SQL {sql_elapsed / queries * 1e6:9.1f} us/consulta | '
+          f'índice {index_elapsed / queries * 1e6:7.1f} us/consulta | carga índice {load_elapsed:6.2f} s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+    random.seed(42)
+    for size in args.sizes:
+        run(size, args.queries)
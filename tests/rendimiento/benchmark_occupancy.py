@@ -0,0 +1,123 @@
+"""
+Benchmark del mapa de calor de ocupación: arreglo de diferencias frente a recorrer cada hora de cada reserva.
+
+Uso:
+    python tests/rendimiento/benchmark_occupancy.py --sizes 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, time as dtime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import User, Court, Reservation
+from app.models.reservation import ReservationStatus
+from app.services.occupancy_service import OccupancyService
+
+COURTS = 10
+START = datetime(2024, 1, 1, 8, 0)
+
+
+def build_config(path):
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    return BenchmarkConfig
+
+
+def populate(size):
+    """Insertar `size` reservas de 30 a 180 minutos repartidas entre las canchas durante un año"""
+    db.session.add(User(username='bench', email='bench@example.com', password_hash='x',
+                        first_name='Bench', last_name='User'))
+    for i in range(COURTS):
+        db.session.add(Court(name=f'Cancha {i}', sport_type='futbol', capacity=10, hourly_rate=10.0,
+                             opening_time=dtime(8, 0), closing_time=dtime(22, 0)))
+    db.session.commit()
+
+    statuses = [ReservationStatus.PENDING, ReservationStatus.CONFIRMED, ReservationStatus.CANCELLED]
+    table = Reservation.__table__
+    chunk = []
+    for _ in range(size):
+        start_time = START + timedelta(days=random.randrange(365), minutes=15 * random.randrange(48))
+        chunk.append({
+            'user_id': 1, 'court_id': random.randint(1, COURTS),
+            'start_time': start_time, 'end_time': start_time + timedelta(minutes=30 * random.randint(1, 6)),
+            'total_amount': 10.0, 'status': random.choice(statuses).name,
+            'created_at': START, 'updated_at': START,
+        })
+        if len(chunk) == 50000:
+            db.session.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+    db.session.commit()
+
+
+def naive_heatmap(start_date, end_date):
+    """Referencia: cargar objetos ORM y repartir cada reserva hora por hora"""
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    booked = {}
+    reservations = Reservation.query.filter(
+        Reservation.status != ReservationStatus.CANCELLED,
+        Reservation.start_time < range_end,
+        Reservation.end_time > range_start
+    ).all()
+    for reservation in reservations:
+        cursor = max(reservation.start_time, range_start)
+        end = min(reservation.end_time, range_end)
+        while cursor < end:
+            hour_end = min(cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), end)
+            key = (reservation.court_id, cursor.weekday(), cursor.hour)
+            booked[key] = booked.get(key, 0) + (hour_end - cursor).total_seconds() / 60
+            cursor = hour_end
+    return booked
+
+
+def run(size, naive):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app(build_config(path))
+        with app.app_context():
+            db.create_all()
+            populate(size)
+            start_date, end_date = START.date(), START.date() + timedelta(days=364)
+
+            started = time.perf_counter()
+            heatmap = OccupancyService.heatmap(start_date, end_date, batch_size=10000)
+            heatmap_elapsed = time.perf_counter() - started
+
+            naive_text = ''
+            if naive:
+                started = time.perf_counter()
+                booked = naive_heatmap(start_date, end_date)
+                naive_elapsed = time.perf_counter() - started
+                weekday_counts = OccupancyService._weekday_counts(start_date, end_date)
+                for court in heatmap['courts']:
+                    for weekday, row in enumerate(court['utilization']):
+                        for hour in range(8, 22):
+                            expected = 100.0 * booked.get((court['id'], weekday, hour), 0) / (60 * weekday_counts[weekday])
+                            assert row[hour] == round(expected, 1), 'Los mapas de calor no coinciden'
+                naive_text = f' | objetos ORM {naive_elapsed:7.2f} s'
+            db.session.remove()
+            db.drop_all()
+    finally:
+        os.remove(path)
+
+    print(f'{size:>9} reservas | arreglo de diferencias {heatmap_elapsed:6.2f} s{naive_text}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--skip-naive', action='store_true', help='No medir la versión con objetos ORM')
+    args = parser.parse_args()
+    random.seed(42)
+    for size in args.sizes:
+        run(size, not args.skip_naive)
@@ -0,0 +1,88 @@
+import pytest
+from datetime import date, time, timedelta
+from app.models import db, User, Court, DailyStat
+from app.services.stats_service import StatsService
+from app.services.time_buckets import TimeBuckets
+
+START = date(2027, 1, 1)
+
+@pytest.fixture
+def rollup(db_session, sample_court):
+    """Tres años de resumen diario: la cancha de fútbol un pendiente por día, la de tenis dos confirmadas"""
+    tennis = Court(name='Tenis', sport_type='tenis', capacity=4, hourly_rate=30.0,
+                   opening_time=time(8, 0), closing_time=time(22, 0))
+    db.session.add(tennis)
+    db.session.commit()
+    days = [START + timedelta(days=i) for i in range(3 * 365)]
+    db.session.bulk_insert_mappings(DailyStat, [
+        {'day': day, 'court_id': sample_court.id, 'pending_count': 1, 'confirmed_count': 0, 'cancelled_count': 0,
+         'completed_count': 0, 'booked_hours': 1.5, 'revenue': 0} for day in days
+    ] + [
+        {'day': day, 'court_id': tennis.id, 'pending_count': 0, 'confirmed_count': 2, 'cancelled_count': 0,
+         'completed_count': 0, 'booked_hours': 2, 'revenue': 60} for day in days
+    ])
+    db.session.commit()
+    return sample_court, tennis, days
+
+def test_weeks_start_on_monday():
+    assert TimeBuckets.floor(date(2027, 1, 3), 'week') == date(2026, 12, 28)
+    assert TimeBuckets.between(date(2027, 1, 3), date(2027, 1, 12), 'week') == [
+        date(2026, 12, 28), date(2027, 1, 4), date(2027, 1, 11)
+    ]
+
+def test_three_years_of_days_in_one_query(rollup, capture_sql):
+    _, _, days = rollup
+    with capture_sql() as statements:
+        series = StatsService.get_series('reservations', days[0], days[-1], 'day', max_points=100)
+
+    assert len(statements) == 1
+    assert series['step'] == 11
+    assert len(series['points']) == 100
+    assert series['total'] == 3 * len(days)
+    assert sum(point['value'] for point in series['points']) == series['total']
+    assert series['points'][0] == {'start': '2027-01-01', 'end': '2027-01-11', 'value': 33}
+    assert series['points'][-1]['end'] == days[-1].isoformat()
+
+def test_weekly_and_monthly_buckets_are_clipped_to_the_range(rollup):
+    # Del domingo 3 al martes 12 de enero: la primera semana solo tiene un día
+    weekly = StatsService.get_series('revenue', date(2027, 1, 3), date(2027, 1, 12), 'week')
+    assert [(p['start'], p['end'], p['value']) for p in weekly['points']] == [
+        ('2027-01-03', '2027-01-03', 60), ('2027-01-04', '2027-01-10', 420), ('2027-01-11', '2027-01-12', 120)
+    ]
+
+    monthly = StatsService.get_series('booked_hours', date(2027, 1, 15), date(2027, 3, 31), 'month')
+    assert [p['value'] for p in monthly['points']] == [17 * 3.5, 28 * 3.5, 31 * 3.5]
+
+def test_court_and_sport_filters(rollup):
+    football, tennis, days = rollup
+    month = (date(2027, 2, 1), date(2027, 2, 28))
+    assert StatsService.get_series('reservations', *month, 'month', sport_type='tenis')['total'] == 56
+    assert StatsService.get_series('reservations', *month, 'month', court_ids=[football.id])['total'] == 28
+    assert StatsService.get_series('reservations', *month, 'month', court_ids=[football.id], sport_type='tenis')['total'] == 0
+
+def test_invalid_parameters(db_session):
+    with pytest.raises(ValueError):
+        StatsService.get_series('visits', START, START)
+    with pytest.raises(ValueError):
+        StatsService.get_series('revenue', START, START, 'year')
+    with pytest.raises(ValueError):
+        StatsService.get_series('revenue', START, START - timedelta(days=1))
+
+def test_admin_analytics_endpoint(app, client, rollup):
+    admin = User(username='admin', email='admin@example.com', first_name='Admin', last_name='User', is_admin=True)
+    admin.set_password('password123')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+
+    url = '/admin/api/analytics?metric=revenue&granularity=day&start=2027-01-01&end=2029-12-31'
+    response = client.get(url + '&max_points=100000')
+    data = response.get_json()
+    assert len(data['points']) <= app.config['ANALYTICS_MAX_POINTS']
+    assert data['total'] == 60 * 3 * 365
+
+    etag = response.headers['ETag']
+    assert client.get(url + '&max_points=100000', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(url + '&max_points=0').status_code == 400
+    assert client.get('/admin/api/analytics?metric=visits').status_code == 400
+    client.get('/auth/logout')
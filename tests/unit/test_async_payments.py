@@ -0,0 +1,103 @@
+import threading
+import pytest
+from datetime import datetime, date, timedelta
+from unittest.mock import patch
+from app.models import User, Court, Payment
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.models.reservation import ReservationStatus
+from app.services.payment_queue import PaymentQueue
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+DAY = date(2030, 8, 1)
+
+def at(hour):
+    return datetime.combine(DAY, datetime.min.time()) + timedelta(hours=hour)
+
+def submit(reservation, key=None):
+    return PaymentService.submit_payment(
+        reservation.user_id, reservation.id, PaymentMethod.CREDIT_CARD, reservation.total_amount,
+        card_data={'card_number': '4111111111111111'}, idempotency_key=key
+    )
+
+@pytest.fixture
+def inline_async(app):
+    """Modo asíncrono con PAYMENT_WORKERS = 0: los pagos se procesan al encolarlos"""
+    app.config.update(PAYMENTS_ASYNC=True, PAYMENT_WORKERS=0, PAYMENT_RETRY_BACKOFF=0)
+    yield app
+    app.config.update(PAYMENTS_ASYNC=False, PAYMENT_WORKERS=4, PAYMENT_RETRY_BACKOFF=0.5)
+
+@pytest.fixture
+def reservation(db_session, sample_user, sample_court):
+    return ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+
+def test_gateway_errors_are_retried(inline_async, reservation):
+    with patch.object(PaymentService, '_charge_gateway',
+                      side_effect=[ConnectionError('timeout'), ConnectionError('timeout'), True]) as gateway:
+        payment = submit(reservation)
+
+    assert gateway.call_count == 3
+    assert payment.status == PaymentStatus.COMPLETED
+    assert reservation.status == ReservationStatus.CONFIRMED
+
+def test_declines_are_not_retried(inline_async, reservation):
+    with patch.object(PaymentService, '_charge_gateway', return_value=False) as gateway:
+        payment = submit(reservation)
+    assert gateway.call_count == 1
+    assert payment.status == PaymentStatus.FAILED
+
+def test_submit_and_status_endpoints(inline_async, client, reservation):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        response = client.post(f'/payments/complete_payment/{reservation.id}',
+                               data={'payment_method': 'credit_card', 'idempotency_key': 'async-1'})
+    assert response.status_code == 302
+
+    payment = Payment.query.filter_by(idempotency_key='async-1').one()
+    data = client.get(f'/payments/{payment.id}/status?wait=1').get_json()
+    assert data == {'id': payment.id, 'reservation_id': reservation.id, 'status': 'completed', 'message': None}
+    assert client.get('/payments/999999/status').status_code == 404
+    client.get('/auth/logout')
+
+@pytest.fixture
+def file_reservation(file_app):
+    """Reserva sobre file_app; al terminar espera a que los workers reales vacíen la cola"""
+    reservation = ReservationService.create_reservation(User.query.one().id, Court.query.one().id, at(10), at(11))
+    yield reservation
+    PaymentQueue.join()
+
+@pytest.mark.file_config(PAYMENTS_ASYNC=True, PAYMENT_RETRY_BACKOFF=0)
+def test_submit_returns_before_the_gateway_answers(file_app, file_reservation):
+    release = threading.Event()
+
+    def slow_gateway(*args):
+        release.wait(5)
+        return True
+
+    with patch.object(PaymentService, '_charge_gateway', side_effect=slow_gateway):
+        payment = submit(file_reservation, 'async-2')
+        assert payment.status == PaymentStatus.PENDING
+        assert PaymentService.get_status(payment.id).status == PaymentStatus.PENDING
+
+        # Un reenvío devuelve el mismo pago sin volver a encolarlo
+        assert submit(file_reservation, 'async-2').id == payment.id
+
+        release.set()
+        row = PaymentService.get_status(payment.id, wait=5)
+
+    assert row.status == PaymentStatus.COMPLETED
+    assert Payment.query.count() == 1
+
+@pytest.mark.file_config(PAYMENTS_ASYNC=True, PAYMENT_RETRY_BACKOFF=0)
+def test_json_clients_get_202_with_a_status_url(file_app, file_reservation):
+    client = file_app.test_client()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        response = client.post(f'/payments/complete_payment/{file_reservation.id}',
+                               data={'payment_method': 'credit_card', 'idempotency_key': 'async-3'},
+                               headers={'Accept': 'application/json'})
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['status'] == 'pending'
+        status = client.get(data['status_url'] + '?wait=5').get_json()
+    assert status['status'] == 'completed'
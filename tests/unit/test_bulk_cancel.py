@@ -0,0 +1,116 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from unittest.mock import patch
+from app.models import db, User, Court, DailyStat, Payment, Reservation
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.models.reservation import ReservationStatus
+from app.services.email_service import EmailService
+from app.services.outbox import Outbox
+from app.services.payment_gateway import GatewayError
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+from app.services.stats_service import StatsService
+
+DAY = date(2030, 11, 4)
+
+def at(hour, day=DAY):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+def snapshot():
+    """Filas del resumen diario; las que quedaron en cero no cuentan (el recálculo no las crea)"""
+    rows = {
+        (row.day, row.court_id): (row.pending_count, row.confirmed_count, row.cancelled_count,
+                                  row.completed_count, round(row.booked_hours, 6), round(row.revenue, 6))
+        for row in DailyStat.query.all()
+    }
+    return {key: values for key, values in rows.items() if any(values)}
+
+def paid(user, court, start, end):
+    reservation = ReservationService.create_reservation(user.id, court.id, start, end)
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        payment = PaymentService.process_payment(user.id, reservation.id, PaymentMethod.CREDIT_CARD,
+                                                 reservation.total_amount)
+    return reservation, payment
+
+@pytest.fixture
+def closure(db_session, sample_user, sample_court):
+    """Un día con reservas pagadas y pendientes en la cancha, una fuera del rango y otra en otra cancha"""
+    other = Court(name='Otra', sport_type='futbol', capacity=10, hourly_rate=50.0,
+                  opening_time=time(8, 0), closing_time=time(22, 0))
+    db.session.add(other)
+    db.session.commit()
+    paid_ids = [paid(sample_user, sample_court, at(hour), at(hour + 1))[1].id for hour in (9, 11, 13)]
+    pending = [ReservationService.create_reservation(sample_user.id, sample_court.id, at(hour), at(hour + 1)).id
+               for hour in (15, 17)]
+    outside = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10, DAY + timedelta(days=1)),
+                                                    at(11, DAY + timedelta(days=1)))
+    elsewhere = ReservationService.create_reservation(sample_user.id, other.id, at(10), at(11))
+    return paid_ids, pending, outside, elsewhere
+
+def test_cancels_and_refunds_in_chunks(closure, sample_court):
+    paid_ids, pending, outside, elsewhere = closure
+    Outbox.drain()  # confirmaciones de los pagos del fixture
+    with patch.object(EmailService, 'send_reservation_cancellation') as email:
+        report = ReservationService.bulk_cancel(sample_court.id, at(8), at(22), 'Lluvia', chunk_size=2)
+        assert Outbox.drain() == 5
+
+    assert report['cancelled'] == 5
+    assert report['by_status'] == {'pending': 2, 'confirmed': 3}
+    assert report['refunded'] == 3 and report['refunded_amount'] == 150.0
+    assert report['refund_errors'] == [] and report['notified'] == 5
+    assert email.call_count == 5
+
+    db.session.expire_all()
+    assert {p.status for p in Payment.query.filter(Payment.id.in_(paid_ids))} == {PaymentStatus.REFUNDED}
+    assert db.session.get(Payment, paid_ids[0]).gateway_response == 'Refunded: Lluvia'
+    assert outside.status == ReservationStatus.PENDING and elsewhere.status == ReservationStatus.PENDING
+    assert Reservation.query.filter_by(status=ReservationStatus.CANCELLED).count() == 5
+
+    # El horario queda libre y los resúmenes coinciden con un recálculo completo
+    assert ReservationService.check_availability(sample_court.id, at(9), at(10))
+    incremental = snapshot()
+    StatsService.rebuild()
+    assert snapshot() == incremental
+
+def test_failed_gateway_refunds_stay_completed(closure, sample_court):
+    paid_ids, *_ = closure
+    failing = paid_ids[1]
+
+    def refund(payment, reason=None):
+        if payment.id == failing:
+            raise GatewayError('timeout')
+        return True
+
+    with patch.object(PaymentService, '_refund_gateway', side_effect=refund):
+        report = ReservationService.bulk_cancel(sample_court.id, at(8), at(22), notify=False)
+
+    assert report['refunded'] == 2
+    assert report['refund_errors'] == [{'payment_id': failing, 'reservation_id': report['refund_errors'][0]['reservation_id'],
+                                        'error': 'timeout'}]
+    payment = db.session.get(Payment, failing)
+    assert payment.status == PaymentStatus.COMPLETED
+    assert payment.gateway_response == 'Refund failed: timeout'
+
+    incremental = snapshot()
+    StatsService.rebuild()
+    assert snapshot() == incremental
+
+def test_admin_routes_cancel_and_refund(client, closure, sample_court):
+    paid_ids, *_ = closure
+    admin = User(username='admin', email='admin@example.com', first_name='Admin', last_name='User', is_admin=True)
+    admin.set_password('password123')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+
+    # La cancelación individual ahora reembolsa
+    reservation_id = db.session.get(Payment, paid_ids[0]).reservation_id
+    assert client.post(f'/admin/reservations/{reservation_id}/cancel').status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Payment, paid_ids[0]).status == PaymentStatus.REFUNDED
+
+    response = client.post(f'/admin/courts/{sample_court.id}/bulk-cancel',
+                           data={'start': at(8).isoformat(), 'end': at(22).isoformat(), 'reason': 'Mantenimiento'})
+    assert response.get_json()['cancelled'] == 4
+    assert client.post(f'/admin/courts/{sample_court.id}/bulk-cancel', data={'start': 'ayer'}).status_code == 400
+    client.get('/auth/logout')
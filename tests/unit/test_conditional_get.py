@@ -0,0 +1,106 @@
+from datetime import datetime, date, time, timedelta
+from unittest.mock import patch
+from app.models import db, User, Court, ResourceVersion
+from app.models.payment import PaymentMethod
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+DAY = date(2030, 8, 5)
+
+def at(hour):
+    return datetime.combine(DAY, datetime.min.time()) + timedelta(hours=hour)
+
+def login(client, username):
+    client.post('/auth/login', data={'username': username, 'password': 'password123'})
+
+def add_user(username, is_admin=False):
+    user = User(username=username, email=f'{username}@example.com', first_name='Otro', last_name='User',
+                is_admin=is_admin)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_user_endpoints_answer_304_until_the_user_changes(client, db_session, sample_user, sample_court, capture_sql):
+    other = add_user('other')
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    login(client, 'testuser')
+
+    for url in ('/api/dashboard/quick_stats', '/api/dashboard/chart_data'):
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+
+        with capture_sql() as statements:
+            cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+        # Solo la carga del usuario de la sesión y la versión: nada de reservas ni pagos
+        assert not [s for s in statements if 'FROM reservations' in s or 'FROM payments' in s or 'FROM user_stats' in s]
+
+        # Los cambios de otro usuario no invalidan la respuesta
+        ReservationService.create_reservation(other.id, sample_court.id, at(12 + len(url) % 5), at(13 + len(url) % 5))
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        ReservationService.create_reservation(sample_user.id, sample_court.id, at(18 + len(url) % 3), at(19 + len(url) % 3))
+        changed = client.get(url, headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+    client.get('/auth/logout')
+
+def test_schedule_etag_is_per_court_and_day(client, db_session, sample_user, sample_court):
+    other_court = Court(name='Other Court', sport_type='tenis', capacity=4, hourly_rate=30.0,
+                        opening_time=time(8, 0), closing_time=time(22, 0))
+    db.session.add(other_court)
+    db.session.commit()
+    login(client, 'testuser')
+
+    url = f'/api/court/{sample_court.id}/schedule?date={DAY.isoformat()}'
+    etag = client.get(url).headers['ETag']
+    next_day = client.get(f'/api/court/{sample_court.id}/schedule?date={(DAY + timedelta(days=1)).isoformat()}')
+    assert next_day.headers['ETag'] != etag
+
+    ReservationService.create_reservation(sample_user.id, other_court.id, at(10), at(11))
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['occupied_slots'][0]['start_time'] == '10:00'
+
+    etag = response.headers['ETag']
+    ReservationService.cancel_reservation(reservation.id)
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+    client.get('/auth/logout')
+
+def test_admin_stats_revalidate_after_payments(client, db_session, sample_user, sample_court):
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    add_user('admin', is_admin=True)
+    login(client, 'admin')
+
+    etag = client.get('/admin/api/stats').headers['ETag']
+    assert client.get('/admin/api/stats', headers={'If-None-Match': etag}).status_code == 304
+
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        PaymentService.process_payment(sample_user.id, reservation.id, PaymentMethod.CREDIT_CARD,
+                                       reservation.total_amount)
+    assert client.get('/admin/api/stats', headers={'If-None-Match': etag}).status_code == 200
+    client.get('/auth/logout')
+
+def test_bookings_on_different_courts_do_not_share_a_version_row(client, db_session, sample_user, sample_court):
+    other = Court(name='Cancha 2', sport_type='futbol', capacity=10, hourly_rate=50.0,
+                  opening_time=time(8, 0), closing_time=time(22, 0))
+    db.session.add(other)
+    db.session.commit()
+    add_user('admin', is_admin=True)
+    login(client, 'admin')
+    etag = client.get('/admin/api/stats').headers['ETag']
+
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    ReservationService.create_reservation(sample_user.id, other.id, at(10), at(11))
+
+    # Cada transacción toca solo la versión de su cancha y del usuario, no una fila global
+    scopes = {(row.scope, row.key) for row in ResourceVersion.query}
+    assert scopes == {('court', sample_court.id), ('court', other.id), ('user', sample_user.id)}
+    assert client.get('/admin/api/stats', headers={'If-None-Match': etag}).status_code == 200
+    client.get('/auth/logout')
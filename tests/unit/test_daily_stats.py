@@ -0,0 +1,73 @@
+import pytest
+from datetime import datetime, date, timedelta
+from unittest.mock import patch
+from app.models import db, User, DailyStat
+from app.models.payment import PaymentMethod
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+from app.services.stats_service import StatsService
+
+DAY = date(2030, 10, 7)
+
+def at(hour, day=DAY):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+def snapshot():
+    return {
+        (row.day, row.court_id): (row.pending_count, row.confirmed_count, row.cancelled_count,
+                                  row.completed_count, round(row.booked_hours, 6), round(row.revenue, 6))
+        for row in DailyStat.query.all()
+    }
+
+@pytest.fixture
+def booked_day(db_session, sample_user, sample_court):
+    paid = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(12))
+    pending = ReservationService.create_reservation(sample_user.id, sample_court.id, at(14), at(15))
+    cancelled = ReservationService.create_reservation(sample_user.id, sample_court.id, at(16), at(17))
+    ReservationService.cancel_reservation(cancelled.id)
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        payment = PaymentService.process_payment(
+            sample_user.id, paid.id, PaymentMethod.CREDIT_CARD, paid.total_amount
+        )
+    return paid, pending, payment
+
+def test_rollup_tracks_reservation_and_payment_changes(booked_day, sample_court):
+    paid, pending, payment = booked_day
+    row = db.session.get(DailyStat, (DAY, sample_court.id))
+    assert (row.pending_count, row.confirmed_count, row.cancelled_count) == (1, 1, 1)
+    assert row.booked_hours == 3
+    assert row.total_reservations == 3
+
+    revenue_day = db.session.get(DailyStat, (payment.created_at.date(), sample_court.id))
+    assert revenue_day.revenue == paid.total_amount
+
+    ReservationService.cancel_reservation(paid.id)
+    totals = StatsService.get_totals(min(DAY, payment.created_at.date()), DAY)
+    assert totals['cancelled_count'] == 2
+    assert totals['booked_hours'] == 1
+    assert totals['revenue'] == 0
+
+def test_rebuild_matches_incremental_rollup(booked_day):
+    paid, pending, payment = booked_day
+    ReservationService.expire_pending_reservations(now=datetime.now() + timedelta(days=1))
+    incremental = snapshot()
+
+    assert StatsService.rebuild() == len(incremental)
+    assert snapshot() == incremental
+
+def test_admin_stats_read_rollup(client, db_session, booked_day):
+    admin = User(username='admin', email='admin@example.com', first_name='Admin', last_name='User', is_admin=True)
+    admin.set_password('password123')
+    db_session.add(admin)
+    db_session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get(f'/admin/api/daily-stats?start={DAY.isoformat()}&end={DAY.isoformat()}')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['totals']['reservations'] == 3
+    assert data['days'][0]['booked_hours'] == 3
+
+    response = client.get('/admin/api/stats')
+    assert response.status_code == 200
+    assert len(response.get_json()['revenue_by_month']) == 6
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from datetime import datetime, time, timedelta
+from app import db
+from app.models import User, Court
+from app.services.parallel import ParallelQueries
+from app.services.reservation_service import ReservationService
+
+WIDGETS = {'stats', 'upcoming', 'recent', 'popular_courts', 'reservations_by_month',
+           'expenses_by_month', 'sports_distribution'}
+
+@pytest.fixture
+def booked_file_app(file_app):
+    """file_app con una reserva confirmada de testuser"""
+    user, court = User.query.one(), Court.query.one()
+    start = datetime.combine(datetime.now().date() + timedelta(days=3), time(10, 0))
+    reservation = ReservationService.create_reservation(user.id, court.id, start, start + timedelta(hours=1))
+    ReservationService.confirm_reservation(reservation.id)
+    return file_app
+
+def test_bundle_returns_every_widget(client, db_session, sample_user, sample_court):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    response = client.get('/api/dashboard/bundle')
+    client.get('/auth/logout')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert WIDGETS <= set(data)
+    assert set(data['timings']) == WIDGETS
+    assert data['errors'] == {}
+    assert 'stats;dur=' in response.headers['Server-Timing']
+
+def test_queries_run_on_the_pool_with_separate_sessions(file_app):
+    seen = []
+    barrier = threading.Barrier(2, timeout=5)
+
+    def task():
+        # Las dos tareas solo pasan la barrera si corren al mismo tiempo
+        barrier.wait()
+        seen.append((threading.current_thread().name, id(db.session())))
+        return Court.query.count()
+
+    with file_app.app_context():
+        results, errors, timings = ParallelQueries.run({'a': task, 'b': task})
+
+    assert results == {'a': 1, 'b': 1} and errors == {}
+    assert all(name.startswith('parallel-queries') for name, _ in seen)
+    assert len({session for _, session in seen}) == 2
+
+def test_bundle_on_the_pool(booked_file_app):
+    client = booked_file_app.test_client()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    data = client.get('/api/dashboard/bundle').get_json()
+
+    assert data['errors'] == {}
+    assert [r['court_name'] for r in data['upcoming']] == ['Test Court']
+    assert data['stats']['active_reservations'] == 1
+    assert data['popular_courts'][0]['reservation_count'] == 1
+
+def test_failing_widget_does_not_break_the_rest(app):
+    def broken():
+        raise RuntimeError('sin conexión')
+
+    with app.app_context():
+        results, errors, timings = ParallelQueries.run({'ok': lambda: 42, 'broken': broken})
+    assert results == {'ok': 42, 'broken': None}
+    assert errors == {'broken': 'sin conexión'}
+    assert set(timings) == {'ok', 'broken'}
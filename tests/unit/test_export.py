@@ -0,0 +1,94 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from datetime import datetime, date, timedelta, timezone
+from unittest.mock import patch
+from app.models import db, User
+from app.models.payment import PaymentMethod
+from app.services.export_service import ExportService
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+DAY = date(2030, 9, 2)
+
+def at(hour, day=DAY):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+@pytest.fixture
+def bookings(db_session, sample_user, sample_court):
+    reservations = [
+        ReservationService.create_reservation(sample_user.id, sample_court.id, at(hour), at(hour + 1))
+        for hour in (9, 11, 13)
+    ]
+    # Fuera del rango exportado
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(9, DAY + timedelta(days=1)),
+                                          at(10, DAY + timedelta(days=1)))
+    ReservationService.cancel_reservation(reservations[1].id)
+    return reservations
+
+def test_csv_is_streamed_in_batches(bookings):
+    chunks = list(ExportService.stream('reservations', DAY, DAY, 'csv', batch_size=2))
+    assert len(chunks) == 2
+
+    rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert [int(row['id']) for row in rows] == [r.id for r in bookings]
+    assert [row['status'] for row in rows] == ['PENDING', 'CANCELLED', 'PENDING']
+    assert rows[0]['court_name'] == 'Test Court'
+    assert rows[0]['start_time'] == at(9).isoformat()
+
+def test_ndjson_gzip_round_trip(bookings):
+    data = b''.join(ExportService.stream('reservations', DAY, DAY, 'ndjson', compress=True, batch_size=2))
+    lines = gzip.decompress(data).decode('utf-8').splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [r.id for r in bookings]
+
+def test_empty_range_still_has_header(db_session):
+    data = b''.join(ExportService.stream('payments', DAY, DAY, 'csv'))
+    assert data.decode('utf-8').splitlines() == [
+        'id,reservation_id,user_id,amount,payment_method,status,transaction_id,created_at,completed_at'
+    ]
+
+def test_invalid_requests(db_session):
+    with pytest.raises(ValueError):
+        ExportService.stream('users', DAY, DAY)
+    with pytest.raises(ValueError):
+        ExportService.stream('reservations', DAY, DAY, 'xlsx')
+
+def test_parquet_export(bookings):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    data = b''.join(ExportService.stream('reservations', DAY, DAY, 'parquet', batch_size=2))
+    table = parquet.read_table(io.BytesIO(data))
+    assert table.column('id').to_pylist() == [r.id for r in bookings]
+
+def test_admin_export_endpoint(client, bookings, sample_user):
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        PaymentService.process_payment(sample_user.id, bookings[0].id, PaymentMethod.CREDIT_CARD,
+                                       bookings[0].total_amount)
+    admin = User(username='admin', email='admin@example.com', first_name='Admin', last_name='User', is_admin=True)
+    admin.set_password('password123')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    response = client.get(f'/admin/export/payments?start={today}&end={today}&gzip=1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/gzip'
+    assert f'payments_{today}_{today}.csv.gz' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.get_data()).decode('utf-8'))))
+    assert [(row['reservation_id'], row['status']) for row in rows] == [(str(bookings[0].id), 'COMPLETED')]
+
+    assert client.get('/admin/export/reservations?format=xlsx').status_code == 400
+    assert client.get('/admin/export/reservations?start=ayer').status_code == 400
+    client.get('/auth/logout')
+
+def test_export_cli(app, bookings, tmp_path):
+    output = tmp_path / 'reservations.ndjson'
+    result = app.test_cli_runner().invoke(args=[
+        'export-data', 'reservations', '--start', DAY.isoformat(), '--end', DAY.isoformat(),
+        '--format', 'ndjson', '--output', str(output)
+    ])
+    assert result.exit_code == 0, result.output
+    assert len(output.read_text().splitlines()) == 3
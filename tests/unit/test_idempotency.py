@@ -0,0 +1,115 @@
+import threading
+import time as time_module
+import pytest
+from datetime import datetime, date, timedelta
+from unittest.mock import patch
+from app import db
+from app.models import User, Court, Payment, Reservation
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+DAY = date(2030, 7, 1)
+
+def at(hour):
+    return datetime.combine(DAY, datetime.min.time()) + timedelta(hours=hour)
+
+def pay(reservation, key):
+    return PaymentService.process_payment(
+        reservation.user_id, reservation.id, PaymentMethod.CREDIT_CARD, reservation.total_amount,
+        idempotency_key=key
+    )
+
+@pytest.fixture
+def reservation(db_session, sample_user, sample_court):
+    return ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+
+def test_retries_replay_the_first_attempt(reservation):
+    with patch.object(PaymentService, '_charge_gateway', return_value=True) as gateway:
+        first = pay(reservation, 'clave-1')
+        retry = pay(reservation, 'clave-1')
+
+    assert gateway.call_count == 1
+    assert retry.id == first.id
+    assert retry.status == PaymentStatus.COMPLETED
+    assert Payment.query.count() == 1
+
+def test_failed_attempts_are_replayed_too(reservation):
+    with patch.object(PaymentService, '_charge_gateway', return_value=False) as gateway:
+        assert pay(reservation, 'clave-1').status == PaymentStatus.FAILED
+        assert pay(reservation, 'clave-1').status == PaymentStatus.FAILED
+    assert gateway.call_count == 1
+
+    # Un intento nuevo usa otra clave
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        assert pay(reservation, 'clave-2').status == PaymentStatus.COMPLETED
+
+def test_key_reused_for_another_payment(reservation, sample_user, sample_court):
+    other = ReservationService.create_reservation(sample_user.id, sample_court.id, at(12), at(13))
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        pay(reservation, 'clave-1')
+        with pytest.raises(ValueError):
+            pay(other, 'clave-1')
+
+def test_pending_attempt_from_another_process_is_awaited(app, reservation):
+    db.session.add(Payment(user_id=reservation.user_id, reservation_id=reservation.id,
+                           amount=reservation.total_amount, payment_method=PaymentMethod.CREDIT_CARD,
+                           status=PaymentStatus.PENDING, transaction_id='tx-1', idempotency_key='clave-1'))
+    db.session.commit()
+    app.config.update(IDEMPOTENCY_WAIT_SECONDS=0.3, IDEMPOTENCY_POLL_SECONDS=0.05)
+    try:
+        with patch.object(PaymentService, '_charge_gateway', return_value=True) as gateway:
+            payment = pay(reservation, 'clave-1')
+    finally:
+        app.config.update(IDEMPOTENCY_WAIT_SECONDS=30, IDEMPOTENCY_POLL_SECONDS=0.2)
+    assert gateway.call_count == 0
+    assert payment.status == PaymentStatus.PENDING
+
+def test_form_resubmission_charges_once(client, reservation):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    form = {'payment_method': 'credit_card', 'idempotency_key': 'formulario-1'}
+    with patch.object(PaymentService, '_charge_gateway', return_value=True) as gateway:
+        for _ in range(3):
+            response = client.post(f'/payments/complete_payment/{reservation.id}', data=form)
+            assert response.status_code == 302
+    client.get('/auth/logout')
+
+    assert gateway.call_count == 1
+    assert Payment.query.count() == 1
+
+@pytest.fixture
+def file_reservation_id(file_app):
+    reservation = ReservationService.create_reservation(User.query.one().id, Court.query.one().id, at(10), at(11))
+    return reservation.id
+
+def test_concurrent_duplicates_wait_for_the_in_flight_attempt(file_app, file_reservation_id):
+    release = threading.Event()
+    results = []
+
+    def slow_gateway(*args):
+        release.wait(5)
+        return True
+
+    def attempt():
+        with file_app.app_context():
+            reservation = db.session.get(Reservation, file_reservation_id)
+            results.append(pay(reservation, 'clave-concurrente').id)
+            db.session.remove()
+
+    with patch.object(PaymentService, '_charge_gateway', side_effect=slow_gateway) as gateway:
+        threads = [threading.Thread(target=attempt) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        # Dar tiempo a que los duplicados lleguen mientras el primero espera al gateway
+        while gateway.call_count == 0:
+            time_module.sleep(0.01)
+        time_module.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+
+    assert gateway.call_count == 1
+    assert len(results) == 4 and len(set(results)) == 1
+    with file_app.app_context():
+        assert Payment.query.count() == 1
+        assert db.session.get(Payment, results[0]).status == PaymentStatus.COMPLETED
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from app.models import User, Court, Reservation
+from app.services.interval_index import CourtIntervalIndex, ReservationIndex
+from app.services.reservation_service import ReservationService
+
+BASE = datetime(2030, 1, 10, 10, 0)
+
+def test_court_interval_index_overlap():
+    index = CourtIntervalIndex([
+        (1, BASE, BASE + timedelta(hours=1)),
+        (2, BASE + timedelta(hours=3), BASE + timedelta(hours=5)),
+    ])
+
+    assert index.find_overlap(BASE + timedelta(minutes=30), BASE + timedelta(hours=2)) == 1
+    assert index.find_overlap(BASE + timedelta(hours=4), BASE + timedelta(hours=4, minutes=30)) == 2
+    assert index.find_overlap(BASE - timedelta(hours=1), BASE + timedelta(hours=6)) in (1, 2)
+    # Intervalos que solo se tocan no se solapan
+    assert index.find_overlap(BASE + timedelta(hours=1), BASE + timedelta(hours=3)) is None
+    assert index.find_overlap(BASE, BASE + timedelta(hours=1), exclude_reservation_id=1) is None
+
+def test_court_interval_index_add_remove():
+    index = CourtIntervalIndex()
+    index.add(7, BASE, BASE + timedelta(hours=2))
+    assert 7 in index
+    assert index.find_overlap(BASE + timedelta(hours=1), BASE + timedelta(hours=3)) == 7
+
+    # Reemplazar el intervalo de una reserva existente
+    index.add(7, BASE + timedelta(hours=4), BASE + timedelta(hours=5))
+    assert len(index) == 1
+    assert index.find_overlap(BASE + timedelta(hours=1), BASE + timedelta(hours=3)) is None
+
+    assert index.remove(7) is True
+    assert index.remove(7) is False
+    assert len(index) == 0
+
+def test_index_matches_sql_path(init_database):
+    court = Court.query.first()
+    existing = Reservation.query.first()
+
+    for offset in range(-2, 3):
+        start_time = existing.start_time + timedelta(minutes=30 * offset)
+        end_time = start_time + timedelta(hours=1)
+        assert ReservationService.check_availability(court.id, start_time, end_time) == \
+            ReservationService._check_availability_sql(court.id, start_time, end_time)
+
+def test_index_kept_in_sync_by_service(init_database):
+    court = Court.query.first()
+    user = User.query.first()
+    start_time = (datetime.now() + timedelta(days=5)).replace(hour=12, minute=0, second=0, microsecond=0)
+    end_time = start_time + timedelta(hours=1)
+
+    # Cargar el índice antes de crear la reserva
+    assert ReservationService.check_availability(court.id, start_time, end_time) is True
+
+    reservation = ReservationService.create_reservation(user.id, court.id, start_time, end_time)
+    assert reservation.id in ReservationIndex.get(court.id)
+    assert ReservationService.check_availability(court.id, start_time, end_time) is False
+
+    ReservationService.cancel_reservation(reservation.id)
+    assert ReservationService.check_availability(court.id, start_time, end_time) is True
+
+    ReservationService.confirm_reservation(reservation.id)
+    assert ReservationService.check_availability(court.id, start_time, end_time) is False
@@ -0,0 +1,76 @@
+from datetime import datetime, date, time, timedelta, timezone
+from app.models import db, Court, Reservation
+from app.services.leaderboard import PopularCourts
+from app.services.reservation_service import ReservationService
+from app.views.dashboard import get_popular_courts
+
+DAY = date(2030, 11, 4)
+
+def at(hour):
+    return datetime.combine(DAY, datetime.min.time()) + timedelta(hours=hour)
+
+def add_court(name):
+    court = Court(name=name, sport_type='tenis', capacity=4, hourly_rate=30.0,
+                  opening_time=time(8, 0), closing_time=time(22, 0))
+    db.session.add(court)
+    db.session.commit()
+    return court
+
+def test_top_courts_follow_bookings_and_cancellations(db_session, sample_user, sample_court, capture_sql):
+    other = add_court('Other Court')
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    ReservationService.create_reservation(sample_user.id, other.id, at(10), at(11))
+    ReservationService.create_reservation(sample_user.id, other.id, at(12), at(13))
+    assert [c['id'] for c in get_popular_courts()] == [other.id, sample_court.id]
+
+    # Las actualizaciones posteriores se aplican en memoria
+    first = ReservationService.create_reservation(sample_user.id, sample_court.id, at(14), at(15))
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(16), at(17))
+    cancelled = ReservationService.create_reservation(sample_user.id, other.id, at(14), at(15))
+    ReservationService.cancel_reservation(cancelled.id)
+    ReservationService.cancel_reservation(first.id)
+    with capture_sql() as statements:
+        top = get_popular_courts(limit=1)
+    assert statements == []
+    # Empate a 2 reservas: gana el id más bajo
+    assert top == [{'id': sample_court.id, 'name': 'Test Court', 'sport_type': 'futbol', 'reservation_count': 2}]
+    assert [c['reservation_count'] for c in get_popular_courts()] == [2, 2]
+
+def test_deactivated_courts_leave_the_ranking(db_session, sample_user, sample_court):
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    assert len(get_popular_courts()) == 1
+
+    sample_court.is_active = False
+    db.session.commit()
+    PopularCourts.invalidate()
+    assert get_popular_courts() == []
+
+def test_window_only_counts_recent_bookings(app, db_session, sample_user, sample_court):
+    app.config['POPULAR_COURTS_WINDOW_DAYS'] = 7
+    try:
+        old = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+        old.created_at = datetime.now(timezone.utc) - timedelta(days=30)
+        db.session.commit()
+        ReservationService.create_reservation(sample_user.id, sample_court.id, at(12), at(13))
+        PopularCourts.invalidate()
+
+        assert get_popular_courts()[0]['reservation_count'] == 1
+        ReservationService.create_reservation(sample_user.id, sample_court.id, at(14), at(15))
+        # Cancelar una reserva fuera de la ventana no la descuenta
+        ReservationService.cancel_reservation(old.id)
+        assert get_popular_courts()[0]['reservation_count'] == 2
+    finally:
+        app.config['POPULAR_COURTS_WINDOW_DAYS'] = 0
+
+def test_reconcile_repairs_drift(db_session, sample_user, sample_court):
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    assert get_popular_courts()[0]['reservation_count'] == 1
+
+    # Un cambio hecho por fuera del servicio no llega al ranking en memoria
+    db.session.delete(db.session.get(Reservation, reservation.id))
+    db.session.commit()
+    assert get_popular_courts()[0]['reservation_count'] == 1
+
+    assert PopularCourts.reconcile() == {sample_court.id: -1}
+    assert get_popular_courts() == []
+    assert PopularCourts.reconcile() == {}
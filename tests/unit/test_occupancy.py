@@ -0,0 +1,93 @@
+import random
+from datetime import datetime, date, time, timedelta
+from app.models import db, User, Court, Reservation
+from app.models.reservation import ReservationStatus
+from app.services.occupancy_service import OccupancyService
+
+MONDAY = date(2030, 9, 2)
+
+def at(day, hour, minute=0):
+    return datetime.combine(MONDAY + timedelta(days=day), time(hour, minute))
+
+def add_reservation(user, court, start, end, status=ReservationStatus.CONFIRMED):
+    db.session.add(Reservation(user_id=user.id, court_id=court.id, start_time=start, end_time=end,
+                               total_amount=10.0, status=status))
+
+def add_court(name, opening, closing):
+    court = Court(name=name, sport_type='tenis', capacity=4, hourly_rate=30.0,
+                  opening_time=opening, closing_time=closing)
+    db.session.add(court)
+    db.session.commit()
+    return court
+
+def test_durations_are_spread_across_hours(db_session, sample_user, sample_court):
+    add_reservation(sample_user, sample_court, at(0, 10), at(0, 12))
+    add_reservation(sample_user, sample_court, at(0, 13, 30), at(0, 14, 15))
+    add_reservation(sample_user, sample_court, at(0, 16), at(0, 17), ReservationStatus.CANCELLED)
+    db.session.commit()
+
+    heatmap = OccupancyService.heatmap(MONDAY, MONDAY + timedelta(days=6))
+    monday = heatmap['courts'][0]['utilization'][0]
+    assert monday[7] is None and monday[22] is None  # cancha cerrada
+    assert monday[10] == monday[11] == 100.0
+    assert (monday[13], monday[14], monday[16]) == (50.0, 25.0, 0.0)
+    assert heatmap['courts'][0]['utilization'][1][10] == 0.0
+
+    # Dos lunes en el rango: la misma reserva pesa la mitad
+    two_weeks = OccupancyService.heatmap(MONDAY, MONDAY + timedelta(days=13))
+    assert two_weeks['courts'][0]['utilization'][0][10] == 50.0
+
+def test_reservation_across_sunday_midnight(db_session, sample_user):
+    court = add_court('24 horas', time(0, 0), time(0, 0))
+    add_reservation(sample_user, court, at(6, 23), at(7, 1))
+    db.session.commit()
+
+    # El rango empieza un miércoles, así que el domingo y el lunes siguiente caen dentro
+    utilization = OccupancyService.heatmap(MONDAY + timedelta(days=2), MONDAY + timedelta(days=8))['courts'][0]['utilization']
+    assert utilization[6][23] == 100.0
+    assert utilization[0][0] == 100.0
+    assert utilization[0][1] == 0.0
+
+def test_matches_minute_by_minute_count(db_session, sample_user, sample_court):
+    random.seed(3)
+    start_date, end_date = MONDAY, MONDAY + timedelta(days=20)
+    reservations = []
+    for _ in range(60):
+        start = at(random.randrange(-2, 23), random.randrange(8, 21), random.choice([0, 15, 30, 45]))
+        end = start + timedelta(minutes=random.choice([30, 60, 90, 120, 150]))
+        reservations.append((start, end))
+        add_reservation(sample_user, sample_court, start, end)
+    db.session.commit()
+
+    range_start = datetime.combine(start_date, time())
+    range_end = datetime.combine(end_date + timedelta(days=1), time())
+    booked = [[0] * 24 for _ in range(7)]
+    for start, end in reservations:
+        minute = max(start, range_start)
+        while minute < min(end, range_end):
+            booked[minute.weekday()][minute.hour] += 1
+            minute += timedelta(minutes=1)
+
+    utilization = OccupancyService.heatmap(start_date, end_date, batch_size=7)['courts'][0]['utilization']
+    for weekday in range(7):
+        for hour in range(8, 22):
+            assert utilization[weekday][hour] == round(100.0 * booked[weekday][hour] / (60 * 3), 1)
+
+def test_admin_heatmap_endpoint(client, db_session, sample_user, sample_court):
+    add_court('Otra', time(8, 0), time(22, 0))
+    add_reservation(sample_user, sample_court, at(0, 10), at(0, 11))
+    admin = User(username='admin', email='admin@example.com', first_name='Admin', last_name='User', is_admin=True)
+    admin.set_password('password123')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get(f'/admin/api/occupancy-heatmap?start={MONDAY}&end={MONDAY}&court_id={sample_court.id}')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [court['id'] for court in data['courts']] == [sample_court.id]
+    assert data['courts'][0]['utilization'][0][10] == 100.0
+    assert data['courts'][0]['utilization'][1][10] is None  # el martes no está en el rango
+
+    assert client.get(f'/admin/api/occupancy-heatmap?start={MONDAY}&end=2030-01-01').status_code == 400
+    client.get('/auth/logout')
@@ -0,0 +1,148 @@
+import pytest
+from datetime import datetime, date, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import event
+from flask_mail import Connection
+from app import mail
+from app.models import db, OutboxMessage
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.services.email_service import EmailService
+from app.services.outbox import Outbox
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+DAY = date(2030, 12, 2)
+
+def at(hour):
+    return datetime.combine(DAY, datetime.min.time()) + timedelta(hours=hour)
+
+@pytest.fixture
+def echo():
+    """Manejador de prueba que registra cada lote recibido"""
+    batches = []
+    Outbox.register('test.echo')(batches.append)
+    yield batches
+    Outbox._handlers.pop('test.echo')
+
+def test_checkout_settles_with_one_commit(db_session, sample_user, sample_court):
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(11))
+    commits = []
+    listener = lambda session: commits.append(session)
+    event.listen(db.session(), 'after_commit', listener)
+    try:
+        with patch.object(PaymentService, '_charge_gateway', return_value=True):
+            payment = PaymentService.process_payment(sample_user.id, reservation.id, PaymentMethod.CREDIT_CARD,
+                                                     reservation.total_amount)
+    finally:
+        event.remove(db.session(), 'after_commit', listener)
+
+    # Uno para el pago pendiente antes de llamar al gateway y otro para el resultado
+    assert len(commits) == 2
+    assert payment.status == PaymentStatus.COMPLETED
+    assert sorted(kind for kind, in db.session.query(OutboxMessage.kind)) == [
+        'email.payment_confirmation', 'email.reservation_confirmation'
+    ]
+
+    with patch.object(EmailService, 'send_payment_confirmation') as paid, \
+         patch.object(EmailService, 'send_reservation_confirmation') as confirmed:
+        assert Outbox.drain() == 2
+    paid.assert_called_once()
+    confirmed.assert_called_once()
+    assert Outbox.drain() == 0
+
+def test_messages_only_exist_if_the_change_commits(db_session, echo):
+    Outbox.add('test.echo', value=1)
+    db.session.rollback()
+    assert OutboxMessage.query.count() == 0
+
+def test_one_handler_call_per_kind_and_batch(db_session, echo):
+    Outbox.add_many('test.echo', [{'value': i} for i in range(5)])
+    db.session.commit()
+
+    assert Outbox.dispatch(batch_size=3) == (3, 0)
+    assert echo == [[{'value': 0}, {'value': 1}, {'value': 2}]]
+    assert Outbox.drain(batch_size=3) == 2
+    assert len(echo) == 2
+    assert OutboxMessage.query.filter(OutboxMessage.dispatched_at.is_(None)).count() == 0
+
+def test_failed_batches_are_retried_with_backoff(app, db_session):
+    calls = []
+
+    def flaky(payloads):
+        calls.append(payloads)
+        if len(calls) == 1:
+            raise RuntimeError('SMTP caído')
+
+    Outbox.register('test.flaky')(flaky)
+    try:
+        Outbox.add('test.flaky', value=1)
+        db.session.commit()
+        assert Outbox.dispatch() == (0, 1)
+        message = OutboxMessage.query.one()
+        assert (message.attempts, message.last_error) == (1, 'SMTP caído')
+
+        # Todavía no vence el backoff
+        assert Outbox.dispatch() == (0, 0)
+        later = datetime.now(timezone.utc) + timedelta(seconds=app.config['OUTBOX_RETRY_BACKOFF'] + 1)
+        assert Outbox.dispatch(now=later) == (1, 0)
+    finally:
+        Outbox._handlers.pop('test.flaky')
+
+def test_batched_emails_share_one_connection(app):
+    app.config['TESTING'] = False
+    try:
+        with mail.record_messages() as outbox, patch.object(mail, 'connect', wraps=mail.connect) as connect:
+            with EmailService.batched():
+                EmailService.send_email('a@example.com', 'Uno', '<p>1</p>')
+                EmailService.send_email('b@example.com', 'Dos', '<p>2</p>')
+    finally:
+        app.config['TESTING'] = True
+    assert connect.call_count == 1
+    assert [msg.subject for msg in outbox] == ['Uno', 'Dos']
+
+def test_only_failed_messages_of_a_batch_are_retried(app, db_session, sample_user, sample_court):
+    reservations = [ReservationService.create_reservation(sample_user.id, sample_court.id, at(hour), at(hour + 1))
+                    for hour in (10, 12, 14)]
+    for reservation in reservations:
+        ReservationService.confirm_reservation(reservation.id)
+
+    sent = []
+
+    def send(user, reservation):
+        if reservation.id == reservations[1].id and len(sent) == 1:
+            raise RuntimeError('SMTP caído')
+        sent.append(reservation.id)
+
+    with patch.object(EmailService, 'send_reservation_confirmation', side_effect=send):
+        assert Outbox.dispatch() == (2, 1)
+        assert sent == [reservations[0].id, reservations[2].id]
+        failed = OutboxMessage.query.filter(OutboxMessage.dispatched_at.is_(None)).one()
+        assert (failed.attempts, failed.last_error) == (1, 'SMTP caído')
+
+        # Solo el mensaje fallido vuelve a enviarse
+        later = datetime.now(timezone.utc) + timedelta(seconds=app.config['OUTBOX_RETRY_BACKOFF'] + 1)
+        assert Outbox.dispatch(now=later) == (1, 0)
+    assert sent == [reservations[0].id, reservations[2].id, reservations[1].id]
+
+def test_batched_sends_raise_on_the_message_that_failed(app):
+    original = Connection.send
+
+    def send(connection, msg, *args, **kwargs):
+        if msg.subject == 'Dos':
+            raise OSError('conexión cerrada')
+        return original(connection, msg, *args, **kwargs)
+
+    app.config['TESTING'] = False
+    try:
+        with mail.record_messages() as outbox, patch.object(mail, 'connect', wraps=mail.connect) as connect, \
+             patch.object(Connection, 'send', send):
+            with EmailService.batched():
+                EmailService.send_email('a@example.com', 'Uno', '<p>1</p>')
+                with pytest.raises(OSError):
+                    EmailService.send_email('b@example.com', 'Dos', '<p>2</p>')
+                EmailService.send_email('c@example.com', 'Tres', '<p>3</p>')
+    finally:
+        app.config['TESTING'] = True
+    # Tras el error se descarta la conexión y el siguiente correo abre otra
+    assert connect.call_count == 2
+    assert [msg.subject for msg in outbox] == ['Uno', 'Tres']
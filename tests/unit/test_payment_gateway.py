@@ -0,0 +1,140 @@
+import threading
+import time
+import pytest
+from datetime import datetime, date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+from werkzeug.serving import make_server
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.services.gateway_stub import create_stub_gateway
+from app.services.payment_gateway import (
+    CircuitBreaker, GatewayError, GatewayRejected, GatewayUnavailable, HttpGateway, LatencyHistogram, PaymentGateway
+)
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+def payment(reference='tx-1'):
+    return SimpleNamespace(transaction_id=reference, amount=50.0, payment_method=PaymentMethod.CREDIT_CARD)
+
+@pytest.fixture
+def stub():
+    """Gateway de prueba escuchando en un puerto libre"""
+    app = create_stub_gateway(latency_ms=0)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield app, f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+def test_histogram_buckets_and_percentiles():
+    histogram = LatencyHistogram()
+    for ms in [3] * 90 + [40] * 9 + [20000]:
+        histogram.observe(ms / 1000)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['buckets']['<=5'] == 90 and snapshot['buckets']['<=50'] == 9 and snapshot['buckets']['+Inf'] == 1
+    assert (snapshot['p50'], snapshot['p95'], snapshot['p99']) == (5, 50, 50)
+
+def test_breaker_opens_and_recovers_after_a_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(GatewayUnavailable):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # llamada de prueba
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(GatewayUnavailable):
+        breaker.before_call()  # solo una prueba a la vez
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_http_gateway_against_the_stub(stub):
+    app, url = stub
+    gateway = HttpGateway(url, pool_size=2)
+    assert gateway.charge(payment('tx-1')) is True
+
+    app.config['DECLINE_RATE'] = 1.0
+    assert gateway.charge(payment('tx-2')) is False
+    # La misma referencia devuelve la respuesta original: reintentar no cobra dos veces
+    assert gateway.charge(payment('tx-1')) is True
+
+    stats = gateway.stats()
+    assert stats['circuit'] == 'closed'
+    assert stats['latency']['charge']['count'] == 3
+    gateway.close()
+
+def test_failures_and_timeouts_open_the_circuit(stub):
+    app, url = stub
+    gateway = HttpGateway(url, read_timeout=0.05, failure_threshold=2, reset_timeout=60)
+    app.config['FAILURE_RATE'] = 1.0
+    with pytest.raises(GatewayError):
+        gateway.charge(payment('tx-1'))
+
+    app.config.update(FAILURE_RATE=0.0, LATENCY_MS=200)
+    with pytest.raises(GatewayError):
+        gateway.charge(payment('tx-2'))
+
+    # Abierto: falla sin llamar al gateway
+    requests_before = app.test_client().get('/stats').get_json()['requests']
+    started = time.perf_counter()
+    with pytest.raises(GatewayUnavailable):
+        gateway.charge(payment('tx-3'))
+    assert time.perf_counter() - started < 0.05
+    assert app.test_client().get('/stats').get_json()['requests'] == requests_before
+    gateway.close()
+
+def test_incomplete_adapter_fails_on_instantiation():
+    class ChargeOnly(PaymentGateway):
+        def _charge(self, payment, card_data):
+            return True
+
+    with pytest.raises(TypeError):
+        ChargeOnly()
+
+def test_rejections_and_declines_do_not_open_the_circuit(stub):
+    app, url = stub
+    # Una ruta inexistente responde 404: la solicitud es inválida, el gateway está sano
+    rejecting = HttpGateway(url + '/v0', failure_threshold=2, reset_timeout=60)
+    for reference in ('tx-1', 'tx-2', 'tx-3'):
+        with pytest.raises(GatewayRejected):
+            rejecting.charge(payment(reference))
+    assert rejecting.stats()['circuit'] == 'closed'
+    rejecting.close()
+
+    app.config['DECLINE_RATE'] = 1.0
+    declining = HttpGateway(url, failure_threshold=2, reset_timeout=60)
+    assert [declining.charge(payment(f'tx-d{n}')) for n in range(3)] == [False] * 3
+    assert declining.stats()['circuit'] == 'closed'
+    declining.close()
+
+def test_rejected_charges_are_not_retried(app):
+    with patch.dict(app.config, PAYMENT_RETRY_BACKOFF=0):
+        with patch('app.services.payment_service.PaymentService._charge_gateway',
+                   side_effect=GatewayRejected("El gateway rechazó la solicitud (400)")) as charge:
+            with pytest.raises(GatewayRejected):
+                PaymentService._call_gateway(payment(), None, attempts=3)
+        assert charge.call_count == 1
+
+        with patch('app.services.payment_service.PaymentService._charge_gateway',
+                   side_effect=[GatewayError("El gateway respondió 503"), True]) as charge:
+            assert PaymentService._call_gateway(payment(), None, attempts=3) is True
+        assert charge.call_count == 2
+
+def test_payments_go_through_the_configured_adapter(app, stub, db_session, sample_user, sample_court):
+    _, url = stub
+    start = datetime.combine(date(2030, 9, 1), datetime.min.time()) + timedelta(hours=10)
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, start, start + timedelta(hours=1))
+    app.config.update(PAYMENT_GATEWAY='http', PAYMENT_GATEWAY_URL=url)
+    app.extensions.pop('payment_gateway', None)
+    try:
+        result = PaymentService.process_payment(sample_user.id, reservation.id, PaymentMethod.CREDIT_CARD,
+                                                reservation.total_amount)
+        assert result.status == PaymentStatus.COMPLETED
+        assert app.extensions['payment_gateway'].stats()['latency']['charge']['count'] == 1
+    finally:
+        app.config.update(PAYMENT_GATEWAY='simulated')
+        app.extensions.pop('payment_gateway').close()
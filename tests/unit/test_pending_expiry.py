@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from app.models import db, User, Reservation, ReservationSlot
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.models.reservation import ReservationStatus
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+
+START = datetime(2030, 7, 1, 10, 0)
+
+def make_reservations(user, court, count, first_hour=0):
+    reservations = [
+        ReservationService.create_reservation(user.id, court.id, START + timedelta(hours=i), START + timedelta(hours=i + 1))
+        for i in range(first_hour, first_hour + count)
+    ]
+    return [r.id for r in reservations]
+
+def age(reservation_ids, minutes):
+    for reservation_id in reservation_ids:
+        reservation = db.session.get(Reservation, reservation_id)
+        reservation.created_at = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    db.session.commit()
+
+def test_expire_pending_reservations(db_session, sample_user, sample_court):
+    stale = make_reservations(sample_user, sample_court, 3)
+    fresh, confirmed = make_reservations(sample_user, sample_court, 2, first_hour=3)
+    age(stale + [confirmed], 45)
+    ReservationService.confirm_reservation(confirmed)
+
+    # Cargar el índice y la caché antes del barrido
+    assert ReservationService.check_availability(sample_court.id, START, START + timedelta(hours=1)) is False
+    assert len(ReservationService.get_court_schedule(sample_court.id, START.date())) == 5
+
+    expired = ReservationService.expire_pending_reservations(hold_minutes=30, chunk_size=2)
+
+    assert expired == 3
+    statuses = {r.id: r.status for r in Reservation.query.all()}
+    assert [statuses[i] for i in stale] == [ReservationStatus.CANCELLED] * 3
+    assert statuses[fresh] == ReservationStatus.PENDING
+    assert statuses[confirmed] == ReservationStatus.CONFIRMED
+    assert ReservationSlot.query.filter(ReservationSlot.reservation_id.in_(stale)).count() == 0
+
+    assert ReservationService.check_availability(sample_court.id, START, START + timedelta(hours=1)) is True
+    assert len(ReservationService.get_court_schedule(sample_court.id, START.date())) == 2
+
+    # Volver a ejecutar no cambia nada
+    assert ReservationService.expire_pending_reservations(hold_minutes=30) == 0
+
+def test_expire_reservations_cli(app, db_session, sample_user, sample_court):
+    age(make_reservations(sample_user, sample_court, 2), 120)
+
+    result = app.test_cli_runner().invoke(args=['expire-reservations'])
+
+    assert '2 reservas pendientes expiradas' in result.output
+    assert Reservation.query.filter_by(status=ReservationStatus.PENDING).count() == 0
+
+@pytest.fixture
+def other(db_session):
+    user = User(username='otheruser', email='other@example.com', first_name='Other', last_name='User')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def rebooked(sample_user, sample_court, other):
+    """Reserva pendiente vencida cuyo horario ya reservó otro usuario"""
+    [expired] = make_reservations(sample_user, sample_court, 1)
+    age([expired], 45)
+    ReservationService.expire_pending_reservations(hold_minutes=30)
+    ReservationService.create_reservation(other.id, sample_court.id, START, START + timedelta(hours=1))
+    return db.session.get(Reservation, expired)
+
+def pay(reservation):
+    return PaymentService.process_payment(reservation.user_id, reservation.id, PaymentMethod.CREDIT_CARD,
+                                          reservation.total_amount)
+
+def test_expired_and_rebooked_reservation_is_not_charged(rebooked):
+    with patch.object(PaymentService, '_charge_gateway', return_value=True) as charge:
+        payment = pay(rebooked)
+    assert charge.call_count == 0
+    assert payment.status == PaymentStatus.FAILED
+    assert rebooked.status == ReservationStatus.CANCELLED
+
+def test_charge_is_refunded_if_the_slot_is_lost_during_the_payment(sample_user, sample_court, other):
+    [reservation_id] = make_reservations(sample_user, sample_court, 1)
+    reservation = db.session.get(Reservation, reservation_id)
+
+    def charge(payment, card_data=None):
+        # Mientras el gateway responde, la reserva vence y otro usuario toma el horario
+        age([reservation_id], 45)
+        ReservationService.expire_pending_reservations(hold_minutes=30)
+        ReservationService.create_reservation(other.id, sample_court.id, START, START + timedelta(hours=1))
+        return True
+
+    with patch.object(PaymentService, '_charge_gateway', side_effect=charge), \
+         patch.object(PaymentService, '_refund_gateway', return_value=True) as refund:
+        payment = pay(reservation)
+
+    refund.assert_called_once()
+    assert payment.status == PaymentStatus.REFUNDED
+    assert 'no está disponible' in payment.gateway_response
+    assert db.session.get(Reservation, reservation_id).status == ReservationStatus.CANCELLED
@@ -0,0 +1,59 @@
+import re
+import pytest
+from datetime import datetime, timedelta
+from app.models import db
+from app.services.reservation_service import ReservationService
+from app.views.dashboard import get_user_stats, get_reservations_by_month, get_expenses_by_month
+
+FULL_SCAN = re.compile(r'^SCAN (reservations|payments)\b(?!.*USING (COVERING )?INDEX)')
+
+def full_scans(statements):
+    scans = []
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            scans.extend((statement, row[3]) for row in plan if FULL_SCAN.match(row[3]))
+    return scans
+
+@pytest.fixture
+def sample_data(db_session, sample_user, sample_court):
+    start_time = (datetime.now() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+    ReservationService.create_reservation(sample_user.id, sample_court.id, start_time, start_time + timedelta(hours=1))
+    return sample_user, sample_court, start_time
+
+SERVICE_QUERIES = {
+    'check_availability': lambda user, court, start: ReservationService._check_availability_sql(
+        court.id, start, start + timedelta(hours=1)),
+    'get_court_schedule': lambda user, court, start: ReservationService.get_court_schedule(court.id, start.date()),
+    'get_user_reservations': lambda user, court, start: ReservationService.get_user_reservations(user.id),
+    'get_upcoming_reservations': lambda user, court, start: ReservationService.get_upcoming_reservations(user.id),
+    'get_recent_reservations': lambda user, court, start: ReservationService.get_recent_reservations(user.id),
+    'get_availability_grid': lambda user, court, start: ReservationService.get_availability_grid(start.date(), days=14),
+    'get_user_stats': lambda user, court, start: get_user_stats(user.id),
+    'get_reservations_by_month': lambda user, court, start: get_reservations_by_month(user.id),
+    'get_expenses_by_month': lambda user, court, start: get_expenses_by_month(user.id),
+    'expire_pending_reservations': lambda user, court, start: ReservationService.expire_pending_reservations(),
+}
+
+@pytest.mark.parametrize('name', sorted(SERVICE_QUERIES))
+def test_service_queries_use_indexes(sample_data, name, capture_sql):
+    with capture_sql(selects_only=True, with_parameters=True) as statements:
+        SERVICE_QUERIES[name](*sample_data)
+
+    assert statements, f'{name} no ejecutó ninguna consulta'
+    assert full_scans(statements) == []
+
+def test_active_filter_matches_partial_index(sample_data, capture_sql):
+    user, court, start_time = sample_data
+    court_id = court.id
+    with capture_sql(selects_only=True, with_parameters=True) as statements:
+        ReservationService._check_availability_sql(court_id, start_time, start_time + timedelta(hours=1))
+
+    # SQLite solo acepta el índice parcial si la consulta repite su condición literal;
+    # INDEXED BY falla con "no query solution" si el índice no es utilizable.
+    statement, parameters = statements[-1]
+    assert "IN ('PENDING', 'CONFIRMED')" in statement
+    forced = statement.replace('FROM reservations', 'FROM reservations INDEXED BY ix_reservations_active_court_time')
+    with db.engine.connect() as connection:
+        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {forced}', parameters).fetchall()
+    assert 'ix_reservations_active_court_time' in plan[-1][3]
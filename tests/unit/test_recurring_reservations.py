@@ -0,0 +1,105 @@
+import pytest
+import sqlite3
+from datetime import datetime, date, timedelta
+from unittest.mock import patch
+from sqlalchemy.exc import OperationalError
+from app.models import db, Reservation, User
+from app.services.reservation_service import ReservationService
+from app.services.slot_holds import SlotHolds
+
+START = datetime(2030, 9, 2, 18, 0)   # Lunes
+
+def test_expand_recurrence(app):
+    weekly = ReservationService.expand_recurrence(START, START + timedelta(hours=1), 'weekly', count=4)
+    assert [s for s, _ in weekly] == [START + timedelta(weeks=i) for i in range(4)]
+
+    biweekly = ReservationService.expand_recurrence(START, START + timedelta(hours=1), 'biweekly', until=date(2030, 10, 14))
+    assert [s.date() for s, _ in biweekly] == [date(2030, 9, 2), date(2030, 9, 16), date(2030, 9, 30), date(2030, 10, 14)]
+
+    with pytest.raises(ValueError):
+        ReservationService.expand_recurrence(START, START + timedelta(hours=1), 'daily', count=3)
+    with pytest.raises(ValueError):
+        ReservationService.expand_recurrence(START, START + timedelta(hours=1), 'weekly')
+    with pytest.raises(ValueError):
+        ReservationService.expand_recurrence(START, START + timedelta(hours=1), 'weekly', count=500)
+
+def test_recurring_series_reports_conflicts(db_session, sample_user, sample_court):
+    blocking = ReservationService.create_reservation(
+        sample_user.id, sample_court.id, START + timedelta(weeks=2, minutes=30), START + timedelta(weeks=2, hours=2)
+    )
+
+    results = ReservationService.create_recurring_reservations(
+        sample_user.id, sample_court.id, START, START + timedelta(hours=1), 'weekly', count=5, notes='Liga'
+    )
+
+    assert [r['conflict_with'] for r in results] == [None, None, blocking.id, None, None]
+    created = [r['reservation'] for r in results if r['reservation']]
+    assert len(created) == 4
+    assert all(r.notes == 'Liga' and r.total_amount == 50.0 for r in created)
+    assert Reservation.query.count() == 5
+
+    # Las ocurrencias creadas ya ocupan la cancha
+    assert ReservationService.check_availability(sample_court.id, START + timedelta(weeks=1), START + timedelta(weeks=1, hours=1)) is False
+
+def test_recurring_series_all_or_nothing(db_session, sample_user, sample_court):
+    ReservationService.create_reservation(sample_user.id, sample_court.id, START + timedelta(weeks=1), START + timedelta(weeks=1, hours=1))
+
+    results = ReservationService.create_recurring_reservations(
+        sample_user.id, sample_court.id, START, START + timedelta(hours=1), 'weekly', count=3, skip_conflicts=False
+    )
+
+    assert all(r['reservation'] is None for r in results)
+    assert Reservation.query.count() == 1
+
+def test_recurring_reservation_endpoint(client, db_session, sample_user, sample_court):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+
+    response = client.post('/make_recurring_reservation', json={
+        'court_id': sample_court.id, 'date': START.strftime('%Y-%m-%d'), 'start_time': '18:00',
+        'duration': 1, 'frequency': 'biweekly', 'count': 3
+    })
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['created'] == 3
+    assert [o['start_time'] for o in data['occurrences']] == [
+        '2030-09-02T18:00:00', '2030-09-16T18:00:00', '2030-09-30T18:00:00'
+    ]
+
+    response = client.post('/make_recurring_reservation', json={'court_id': sample_court.id})
+    assert response.status_code == 400
+
+def test_recurring_series_reports_held_occurrences(db_session, sample_user, sample_court):
+    other = User(username='otheruser', email='other@example.com', first_name='Other', last_name='User')
+    other.set_password('password123')
+    db_session.add(other)
+    db_session.commit()
+    ReservationService.hold_slot(other.id, sample_court.id, START + timedelta(weeks=1), START + timedelta(weeks=1, hours=1))
+
+    results = ReservationService.create_recurring_reservations(
+        sample_user.id, sample_court.id, START, START + timedelta(hours=1), 'weekly', count=3
+    )
+
+    # La ocurrencia retenida se informa como conflicto y el resto de la serie se crea
+    assert [r['conflict_with'] for r in results] == [None, 'held', None]
+    assert [bool(r['reservation']) for r in results] == [True, False, True]
+    assert SlotHolds.count() == 1
+
+def test_recurring_series_retries_lock_errors(db_session, sample_user, sample_court):
+    commit = db.session.commit
+    calls = []
+
+    def flaky_commit():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError('COMMIT', {}, sqlite3.OperationalError('database is locked'))
+        commit()
+
+    with patch.object(db.session, 'commit', side_effect=flaky_commit):
+        results = ReservationService.create_recurring_reservations(
+            sample_user.id, sample_court.id, START, START + timedelta(hours=1), 'weekly', count=3
+        )
+
+    assert len(calls) == 2
+    assert all(r['reservation'] for r in results)
+    assert Reservation.query.count() == 3
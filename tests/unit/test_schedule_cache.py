@@ -0,0 +1,88 @@
+from datetime import datetime, date, timedelta
+from app.services.reservation_service import ReservationService
+from app.services.schedule_cache import ScheduleCache
+
+DAY = date(2030, 6, 3)
+START = datetime(2030, 6, 3, 10, 0)
+
+def test_schedule_cache_hits_and_invalidation(db_session, sample_user, sample_court):
+    assert ReservationService.get_court_schedule(sample_court.id, DAY) == ()
+    assert ReservationService.get_court_schedule(sample_court.id, DAY) == ()
+    assert ScheduleCache.stats()['hits'] == 1
+    assert ScheduleCache.stats()['misses'] == 1
+
+    # Crear una reserva invalida el día por versión
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, START, START + timedelta(hours=1))
+    schedule = ReservationService.get_court_schedule(sample_court.id, DAY)
+    assert [(r.id, r.start_time, r.user_id) for r in schedule] == [(reservation.id, START, sample_user.id)]
+    assert ScheduleCache.stats()['misses'] == 2
+
+    ReservationService.cancel_reservation(reservation.id)
+    assert ReservationService.get_court_schedule(sample_court.id, DAY) == ()
+
+def test_schedule_cache_lru_eviction(app, db_session, sample_court):
+    app.config['SCHEDULE_CACHE_MAX_ENTRIES'] = 2
+    try:
+        for offset in range(3):
+            ReservationService.get_court_schedule(sample_court.id, DAY + timedelta(days=offset))
+        # El primer día fue desalojado, el último sigue en caché
+        ReservationService.get_court_schedule(sample_court.id, DAY + timedelta(days=2))
+        ReservationService.get_court_schedule(sample_court.id, DAY)
+
+        stats = ScheduleCache.stats()
+        assert stats['entries'] == 2
+        assert stats['evictions'] == 2
+        assert stats['hits'] == 1
+    finally:
+        app.config['SCHEDULE_CACHE_MAX_ENTRIES'] = 2048
+
+def test_schedule_cache_memory_cap(app, db_session, sample_court):
+    app.config['SCHEDULE_CACHE_MAX_BYTES'] = 1
+    try:
+        ReservationService.get_court_schedule(sample_court.id, DAY)
+        assert ScheduleCache.stats()['entries'] == 0
+        assert ScheduleCache.stats()['bytes'] == 0
+    finally:
+        app.config['SCHEDULE_CACHE_MAX_BYTES'] = 4 * 1024 * 1024
+
+def test_stale_load_is_not_stored(db_session, sample_court):
+    def load():
+        # Una mutación llega mientras se consulta la base de datos
+        ScheduleCache.bump(sample_court.id, START, START)
+        return []
+
+    ScheduleCache.get(sample_court.id, DAY, load)
+    assert ScheduleCache.stats()['entries'] == 0
+
+def test_versions_are_evicted_with_their_entries(app, db_session, sample_court):
+    app.config['SCHEDULE_CACHE_MAX_ENTRIES'] = 2
+    try:
+        # Invalidar días sin entrada no guarda versiones
+        for offset in range(100):
+            day = START + timedelta(days=offset)
+            ScheduleCache.bump(sample_court.id, day, day)
+        assert ScheduleCache.stats()['versions'] == 0
+
+        for offset in range(5):
+            ReservationService.get_court_schedule(sample_court.id, DAY + timedelta(days=offset))
+        stats = ScheduleCache.stats()
+        assert stats['entries'] == stats['versions'] == 2
+    finally:
+        app.config['SCHEDULE_CACHE_MAX_ENTRIES'] = 2048
+
+def test_stale_load_is_not_stored_after_eviction(app, db_session, sample_court):
+    ScheduleCache.get(sample_court.id, DAY, lambda: [])
+    app.config['SCHEDULE_CACHE_TTL'] = 0.000001
+    app.config['SCHEDULE_CACHE_MAX_ENTRIES'] = 1
+
+    def load():
+        # El día se invalida y su versión se desaloja mientras se carga
+        ScheduleCache.bump(sample_court.id, START, START)
+        ScheduleCache.get(sample_court.id, DAY + timedelta(days=1), lambda: [])
+        return ['viejo']
+
+    try:
+        ScheduleCache.get(sample_court.id, DAY, load)
+        assert ScheduleCache.get(sample_court.id, DAY, lambda: []) == ()
+    finally:
+        app.config.update(SCHEDULE_CACHE_TTL=60, SCHEDULE_CACHE_MAX_ENTRIES=2048)
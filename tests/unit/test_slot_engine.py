@@ -0,0 +1,125 @@
+import pytest
+from datetime import datetime, date, time, timedelta
+from app.models import ReservationSlot
+from app.services.reservation_service import ReservationService
+from app.services.slot_engine import SlotBitmap
+
+DAY = date(2030, 3, 4)
+
+def at(hour, minute=0):
+    return datetime.combine(DAY, time(hour, minute))
+
+def test_bitmap_occupy_and_free_starts():
+    bitmap = SlotBitmap(at(8), at(12), slot_minutes=15)
+    assert bitmap.size == 16
+
+    bitmap.occupy(at(9), at(10))
+    bitmap.occupy(at(11, 10), at(11, 20))   # Ocupa los slots 11:00 y 11:15
+    assert bitmap.to_bitstring() == '0000111100001100'
+
+    hour_starts = [t.time() for t in bitmap.slot_times(bitmap.free_starts(4))]
+    assert hour_starts == [time(8, 0), time(10, 0)]
+
+    half_hour_starts = [t.time() for t in bitmap.slot_times(bitmap.free_starts(2))]
+    assert half_hour_starts == [time(8, 0), time(8, 15), time(8, 30), time(10, 0),
+                                time(10, 15), time(10, 30), time(11, 30)]
+
+def test_bitmap_block_before():
+    bitmap = SlotBitmap(at(8), at(10), slot_minutes=30)
+    bitmap.block_before(at(8, 40))
+    assert bitmap.to_bitstring() == '1100'
+
+def test_bitmap_rejects_invalid_durations():
+    bitmap = SlotBitmap(at(8), at(10))
+    with pytest.raises(ValueError):
+        bitmap.free_starts(0)
+    with pytest.raises(ValueError):
+        SlotBitmap(at(8), at(10), slot_minutes=0)
+
+def test_get_available_slots(db_session, sample_user, sample_court):
+    start_time = at(10)
+    ReservationService.create_reservation(sample_user.id, sample_court.id, start_time, start_time + timedelta(hours=2))
+
+    slots = ReservationService.get_available_slots(sample_court.id, DAY, duration_minutes=60)
+
+    assert slots[0] == time(8, 0)
+    assert time(9, 0) in slots
+    assert time(9, 15) not in slots
+    assert time(11, 0) not in slots
+    assert time(12, 0) in slots
+    assert slots[-1] == time(21, 0)
+
+    with pytest.raises(ValueError):
+        ReservationService.get_available_slots(sample_court.id, DAY, duration_minutes=30)
+
+def test_available_slots_endpoint(client, db_session, sample_court):
+    response = client.get(f'/api/available-slots?court_id={sample_court.id}&date={DAY.isoformat()}&duration=120&slot_minutes=60')
+    assert response.status_code == 200
+    times = [slot['time'] for slot in response.get_json()['available_slots']]
+    assert times[0] == '08:00'
+    assert times[-1] == '20:00'
+
+    response = client.get(f'/api/available-slots?court_id={sample_court.id}&date={DAY.isoformat()}&duration=45')
+    assert response.status_code == 400
+
+def test_bitmap_runs():
+    bitmap = SlotBitmap(at(8), at(10), slot_minutes=30)
+    bitmap.occupy(at(8, 30), at(9, 30))
+    assert bitmap.to_runs() == [[0, 1], [1, 2], [0, 1]]
+
+def test_get_availability_grid(db_session, sample_user, sample_court):
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(8), at(9))
+    ReservationService.create_reservation(
+        sample_user.id, sample_court.id, at(21) + timedelta(days=1), at(22) + timedelta(days=1)
+    )
+
+    grid = ReservationService.get_availability_grid(DAY, days=3, slot_minutes=60)
+
+    assert grid['slot_minutes'] == 60
+    court_days = grid['courts'][0]['days']
+    assert list(court_days) == [DAY.isoformat(), '2030-03-05', '2030-03-06']
+    assert court_days[DAY.isoformat()] == '1' + '0' * 13
+    assert court_days['2030-03-05'] == '0' * 13 + '1'
+    assert court_days['2030-03-06'] == '0' * 14
+
+    grid = ReservationService.get_availability_grid(DAY, days=1, slot_minutes=60, encoding='rle')
+    assert grid['courts'][0]['days'][DAY.isoformat()] == [[1, 1], [0, 13]]
+
+def test_availability_grid_endpoint(client, db_session, sample_user, sample_court):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+
+    response = client.get(f'/api/availability-grid?start={DAY.isoformat()}&days=14&courts={sample_court.id}')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['courts'][0]['days']) == 14
+
+    response = client.get(f'/api/availability-grid?start={DAY.isoformat()}&days=90')
+    assert response.status_code == 400
+
+def test_bookings_must_fall_on_the_slot_grid(db_session, sample_user, sample_court):
+    with pytest.raises(ValueError, match='bloques de 15 minutos'):
+        ReservationService.create_reservation(sample_user.id, sample_court.id, at(10, 5), at(11, 5))
+    with pytest.raises(ValueError, match='bloques de 15 minutos'):
+        ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(10, 50))
+
+    # Dos reservas contiguas en la rejilla no comparten ningún slot
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(10, 15), at(11, 15))
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(11, 15), at(12, 15))
+
+def test_reclaim_slots_after_changing_the_grid(app, db_session, sample_user, sample_court):
+    first = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10), at(10, 30))
+    second = ReservationService.create_reservation(sample_user.id, sample_court.id, at(10, 30), at(11))
+    ReservationService.create_reservation(sample_user.id, sample_court.id, at(12), at(13))
+    assert ReservationSlot.query.count() == 2 + 2 + 4
+
+    app.config['SLOT_MINUTES'] = 60
+    try:
+        result = app.test_cli_runner().invoke(args=['reclaim-slots'])
+    finally:
+        app.config['SLOT_MINUTES'] = 15
+
+    # Con bloques de una hora las dos medias horas caen en el mismo slot
+    assert f'sin reclamo): {second.id}' in result.output
+    assert {(s.reservation_id, s.slot_start) for s in ReservationSlot.query} == {
+        (first.id, at(10)), (first.id + 2, at(12))
+    }
@@ -0,0 +1,157 @@
+import pytest
+from datetime import datetime, date, time, timedelta, timezone
+from unittest.mock import patch
+from app.models import Reservation, ReservationSlot, SlotHold, User
+from app.models.reservation import ReservationStatus
+from app.services.reservation_service import ReservationService
+from app.services.slot_holds import SlotHolds
+
+DAY = date(2030, 9, 2)
+
+def at(hour):
+    return datetime.combine(DAY, time(hour))
+
+@pytest.fixture
+def other_user(db_session):
+    user = User(username='otheruser', email='other@example.com', first_name='Other', last_name='User')
+    user.set_password('password123')
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+def test_expired_holds_stop_blocking(db_session, sample_user, sample_court, other_user):
+    now = datetime.now(timezone.utc)
+    short = SlotHolds.acquire(sample_user.id, sample_court.id, at(10), at(11), 20.0, ttl=5, now=now).id
+    long = SlotHolds.acquire(sample_user.id, sample_court.id, at(12), at(13), 20.0, ttl=60, now=now).id
+
+    with pytest.raises(ValueError):
+        SlotHolds.acquire(other_user.id, sample_court.id, at(10), at(12), 20.0, now=now)
+
+    later = now + timedelta(seconds=10)
+    assert SlotHolds.find_conflict(sample_court.id, at(10), at(11), now=now) == short
+    assert SlotHolds.get(short, now=later) is None
+    assert SlotHolds.find_conflict(sample_court.id, at(10), at(13), now=later) == long
+
+    # Tomar el horario vencido borra la retención anterior y sus slots
+    SlotHolds.acquire(other_user.id, sample_court.id, at(10), at(11), 20.0, now=later)
+    assert db_session.get(SlotHold, short) is None
+
+def test_same_user_replaces_overlapping_hold(db_session, sample_user, sample_court):
+    first = SlotHolds.acquire(sample_user.id, sample_court.id, at(10), at(11), 20.0).id
+    second = SlotHolds.acquire(sample_user.id, sample_court.id, at(10), at(12), 40.0).id
+    assert SlotHolds.get(first) is None
+    assert SlotHolds.count() == 1
+    assert ReservationSlot.query.filter_by(hold_id=second).count() == 8
+
+    SlotHolds.release(second)
+    db_session.commit()
+    assert SlotHolds.count() == 0
+    assert ReservationSlot.query.count() == 0
+
+def test_holds_per_user_are_capped(app, db_session, sample_user, sample_court, other_user):
+    app.config['SLOT_HOLDS_PER_USER'] = 2
+    try:
+        SlotHolds.acquire(sample_user.id, sample_court.id, at(10), at(11), 20.0)
+        SlotHolds.acquire(sample_user.id, sample_court.id, at(12), at(13), 20.0)
+        with pytest.raises(ValueError):
+            SlotHolds.acquire(sample_user.id, sample_court.id, at(14), at(15), 20.0)
+        # El límite es por usuario
+        SlotHolds.acquire(other_user.id, sample_court.id, at(14), at(15), 20.0)
+    finally:
+        app.config['SLOT_HOLDS_PER_USER'] = 3
+    assert SlotHolds.count() == 3
+
+def test_hold_ids_are_unguessable_strings(db_session, sample_user, sample_court):
+    first = SlotHolds.acquire(sample_user.id, sample_court.id, at(10), at(11), 20.0).id
+    second = SlotHolds.acquire(sample_user.id, sample_court.id, at(12), at(13), 20.0).id
+    assert len(first) == 32 and first != second
+
+def test_hold_blocks_other_users_until_converted(db_session, sample_user, sample_court, other_user):
+    hold = ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(12))
+    hold_id = hold.id
+    assert hold.total_amount == 2 * sample_court.hourly_rate
+    assert Reservation.query.count() == 0
+
+    with pytest.raises(ValueError):
+        ReservationService.create_reservation(other_user.id, sample_court.id, at(11), at(12))
+    with pytest.raises(ValueError):
+        ReservationService.reserve_held_slot(hold_id, other_user.id)
+
+    # Otros usuarios ven el horario ocupado; quien lo retiene lo sigue viendo libre
+    assert time(10) not in ReservationService.get_available_slots(sample_court.id, DAY, user_id=other_user.id)
+    assert time(10) in ReservationService.get_available_slots(sample_court.id, DAY, user_id=sample_user.id)
+    grid = ReservationService.get_availability_grid(DAY, days=1, user_id=other_user.id)
+    assert '1' in grid['courts'][0]['days'][DAY.isoformat()]
+    grid = ReservationService.get_availability_grid(DAY, days=1, user_id=sample_user.id)
+    assert '1' not in grid['courts'][0]['days'][DAY.isoformat()]
+
+    reservation = ReservationService.reserve_held_slot(hold_id, sample_user.id)
+    assert reservation.status == ReservationStatus.PENDING
+    assert SlotHolds.get(hold_id) is None
+    # Los slots de la retención pasaron a la reserva
+    assert {slot.reservation_id for slot in ReservationSlot.query} == {reservation.id}
+
+def test_availability_check_does_not_query_holds(db_session, sample_user, sample_court, capture_sql):
+    ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(11))
+    ReservationService.check_availability(sample_court.id, at(12), at(13))
+    with capture_sql() as statements:
+        ReservationService.check_availability(sample_court.id, at(12), at(13))
+    # Resuelto con el índice en memoria: las retenciones se excluyen con sus reclamos de slots
+    assert statements == []
+
+def test_user_can_repick_or_extend_own_hold(db_session, sample_user, sample_court, other_user):
+    first = ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(11)).id
+    same = ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(11)).id
+    longer = ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(12))
+    assert SlotHolds.get(first) is None and SlotHolds.get(same) is None
+    assert (longer.start_time, longer.end_time) == (at(10), at(12))
+    assert SlotHolds.count() == 1
+
+    with pytest.raises(ValueError, match='otro usuario'):
+        ReservationService.hold_slot(other_user.id, sample_court.id, at(11), at(12))
+
+def test_make_reservation_view_repicks_own_hold(client, db_session, sample_user, sample_court):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+    form = {'court_id': sample_court.id, 'date': DAY.isoformat(), 'start_time': '10:00', 'duration': 1}
+    first = client.post('/make_reservation', data=form)
+    second = client.post('/make_reservation', data=dict(form, duration=2))
+    client.get('/auth/logout')
+
+    assert '/checkout/' in first.headers['Location'] and '/checkout/' in second.headers['Location']
+    assert first.headers['Location'] != second.headers['Location']
+    hold = SlotHold.query.one()
+    assert (hold.start_time, hold.end_time) == (at(10), at(12))
+
+def test_expired_hold_cannot_be_converted(db_session, sample_user, sample_court):
+    hold = ReservationService.hold_slot(sample_user.id, sample_court.id, at(10), at(11))
+    hold_id = hold.id
+    with patch('app.services.slot_holds.datetime') as clock:
+        clock.now.return_value = datetime.now(timezone.utc) + timedelta(seconds=hold.seconds_left() + 1)
+        with pytest.raises(ValueError):
+            ReservationService.reserve_held_slot(hold_id, sample_user.id)
+
+def test_expired_hold_does_not_block_reservations(db_session, sample_user, sample_court, other_user):
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    SlotHolds.acquire(sample_user.id, sample_court.id, at(10), at(11), 20.0, ttl=60, now=past)
+
+    reservation = ReservationService.create_reservation(other_user.id, sample_court.id, at(10), at(11))
+    assert SlotHold.query.count() == 0
+    assert {slot.reservation_id for slot in ReservationSlot.query} == {reservation.id}
+
+def test_checkout_flow(client, db_session, sample_user, sample_court):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'password123'})
+
+    response = client.post('/make_reservation', data={
+        'court_id': sample_court.id, 'date': DAY.isoformat(), 'start_time': '10:00', 'duration': 1
+    })
+    assert '/checkout/' in response.headers['Location']
+    assert Reservation.query.count() == 0
+
+    assert client.get(response.headers['Location']).status_code == 200
+
+    with patch('app.services.payment_service.PaymentService._charge_gateway', return_value=True):
+        response = client.post(response.headers['Location'], data={'payment_method': 'credit_card'})
+    assert response.status_code == 302
+    reservation = Reservation.query.one()
+    assert reservation.status == ReservationStatus.CONFIRMED
+    assert SlotHolds.count() == 0
@@ -0,0 +1,82 @@
+import threading
+import time
+from app.models import User
+from app.services.snapshot import SnapshotCache
+
+class SlowCounter:
+    def __init__(self, delay=0.05):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        return {'calls': calls}
+
+def get_concurrently(app, cache, workers=8):
+    values = []
+    barrier = threading.Barrier(workers)
+
+    def worker():
+        with app.app_context():
+            barrier.wait()
+            values.append(cache.get().value)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return values
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_first_load_is_single_flight(app):
+    compute = SlowCounter()
+    cache = SnapshotCache('test-first-load', compute, 'TEST_SNAPSHOT_MAX_AGE')
+    app.config['TEST_SNAPSHOT_MAX_AGE'] = 60
+
+    values = get_concurrently(app, cache)
+
+    assert compute.calls == 1
+    assert values == [{'calls': 1}] * 8
+
+def test_stale_snapshot_is_served_while_refreshing(app):
+    compute = SlowCounter(delay=0.2)
+    cache = SnapshotCache('test-stale', compute, 'TEST_SNAPSHOT_MAX_AGE')
+    app.config['TEST_SNAPSHOT_MAX_AGE'] = 60
+    with app.app_context():
+        assert cache.get().value == {'calls': 1}
+
+    # Vencida: todos reciben el valor anterior al instante y se dispara un único recálculo
+    app.config['TEST_SNAPSHOT_MAX_AGE'] = 0
+    started = time.monotonic()
+    values = get_concurrently(app, cache)
+    assert time.monotonic() - started < compute.delay
+    assert values == [{'calls': 1}] * 8
+
+    app.config['TEST_SNAPSHOT_MAX_AGE'] = 60
+    with app.app_context():
+        assert wait_until(lambda: cache.get().value == {'calls': 2})
+    assert compute.calls == 2
+
+def test_admin_dashboard_snapshot_endpoint(client, db_session, sample_user):
+    admin = User(username='admin', email='admin@example.com', first_name='Admin', last_name='User', is_admin=True)
+    admin.set_password('password123')
+    db_session.add(admin)
+    db_session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/api/dashboard-snapshot')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['stats']['total_users'] == 2
+    assert data['snapshot_age'] >= 0
+    assert 'Age' in response.headers
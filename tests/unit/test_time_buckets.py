@@ -0,0 +1,50 @@
+from datetime import datetime
+from app.models import db, Reservation, Payment
+from app.models.payment import PaymentMethod, PaymentStatus
+from app.services.reservation_service import ReservationService
+from app.services.time_buckets import TimeBuckets
+from app.views.dashboard import get_reservations_by_month, get_expenses_by_month
+
+def test_last_months_follow_calendar():
+    starts = TimeBuckets.last(4, 'month', now=datetime(2030, 3, 31, 18, 0))
+    assert starts == [datetime(2029, 12, 1), datetime(2030, 1, 1), datetime(2030, 2, 1), datetime(2030, 3, 1)]
+    assert TimeBuckets.next_start(datetime(2029, 12, 1)) == datetime(2030, 1, 1)
+    assert TimeBuckets.last(2, 'day', now=datetime(2030, 3, 1, 1, 0)) == [datetime(2030, 2, 28), datetime(2030, 3, 1)]
+
+def test_series_fills_empty_buckets(db_session, sample_user, sample_court, capture_sql):
+    created = [datetime(2030, 1, 31, 23, 0), datetime(2030, 3, 1, 0, 30), datetime(2030, 3, 15)]
+    for day, created_at in enumerate(created, start=1):
+        start_time = datetime(2030, 6, day, 10, 0)
+        reservation = ReservationService.create_reservation(
+            sample_user.id, sample_court.id, start_time, start_time.replace(hour=11)
+        )
+        reservation.created_at = created_at
+    db.session.commit()
+
+    months = TimeBuckets.last(3, 'month', now=datetime(2030, 3, 20))
+    with capture_sql() as statements:
+        series = TimeBuckets.series(Reservation.query, Reservation.created_at, db.func.count(Reservation.id), months)
+
+    assert series == [(datetime(2030, 1, 1), 1), (datetime(2030, 2, 1), 0), (datetime(2030, 3, 1), 2)]
+    assert len(statements) == 1
+
+def test_dashboard_charts_use_one_query_per_series(db_session, sample_user, sample_court, capture_sql):
+    start_time = datetime(2030, 6, 1, 10, 0)
+    reservation = ReservationService.create_reservation(
+        sample_user.id, sample_court.id, start_time, start_time.replace(hour=11)
+    )
+    for status in (PaymentStatus.COMPLETED, PaymentStatus.FAILED):
+        db.session.add(Payment(user_id=sample_user.id, reservation_id=reservation.id, amount=20.0,
+                               payment_method=PaymentMethod.CREDIT_CARD, status=status))
+    db.session.commit()
+    user_id = sample_user.id
+
+    with capture_sql() as statements:
+        reservations = get_reservations_by_month(user_id, months=12)
+        expenses = get_expenses_by_month(user_id, months=12)
+
+    assert len(statements) == 2
+    assert len(reservations) == len(expenses) == 12
+    assert reservations[-1]['count'] == 1
+    assert expenses[-1]['amount'] == 20.0
+    assert sum(month['amount'] for month in expenses) == 20.0
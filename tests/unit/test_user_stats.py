@@ -0,0 +1,63 @@
+from datetime import datetime, date, timedelta
+from unittest.mock import patch
+from app.models import db, UserStat
+from app.models.payment import PaymentMethod
+from app.services.payment_service import PaymentService
+from app.services.reservation_service import ReservationService
+from app.services.stats_service import StatsService
+from app.views.dashboard import get_user_stats, get_detailed_user_stats
+
+DAY = date(2030, 11, 4)
+
+def at(hour):
+    return datetime.combine(DAY, datetime.min.time()) + timedelta(hours=hour)
+
+def book_and_pay(user, court):
+    paid = ReservationService.create_reservation(user.id, court.id, at(10), at(12))
+    ReservationService.create_reservation(user.id, court.id, at(14), at(15))
+    cancelled = ReservationService.create_reservation(user.id, court.id, at(16), at(17))
+    ReservationService.cancel_reservation(cancelled.id)
+    with patch.object(PaymentService, '_charge_gateway', return_value=True):
+        PaymentService.process_payment(user.id, paid.id, PaymentMethod.CREDIT_CARD, paid.total_amount)
+    return paid
+
+def test_user_stats_is_one_primary_key_lookup(db_session, sample_user, sample_court, capture_sql):
+    paid = book_and_pay(sample_user, sample_court)
+    user_id = sample_user.id
+
+    with capture_sql() as statements:
+        stats = get_user_stats(user_id)
+
+    assert len(statements) == 1
+    assert stats == {
+        'total_reservations': 3,
+        'active_reservations': 1,
+        'reservations_this_month': 3,
+        'total_spent': paid.total_amount,
+        'spent_this_month': paid.total_amount,
+    }
+    detailed = get_detailed_user_stats(user_id)
+    assert detailed['cancelled_reservations'] == 1
+    assert detailed['favorite_court'] == sample_court.name
+
+def test_completing_finished_reservations(db_session, sample_user, sample_court):
+    book_and_pay(sample_user, sample_court)
+
+    assert ReservationService.complete_finished_reservations(now=at(13)) == 1
+    stats = get_detailed_user_stats(sample_user.id)
+    assert stats['active_reservations'] == 0
+    assert stats['completed_reservations'] == 1
+    assert StatsService.check_user_stats() == []
+
+def test_check_and_repair_user_stats(db_session, sample_user, sample_court):
+    book_and_pay(sample_user, sample_court)
+    row = db.session.get(UserStat, sample_user.id)
+    row.total_reservations = 99
+    row.current_month = date(2000, 1, 1)
+    db.session.commit()
+    assert get_user_stats(sample_user.id)['spent_this_month'] == 0
+
+    assert StatsService.check_user_stats() == [sample_user.id]
+    assert StatsService.check_user_stats(repair=True) == [sample_user.id]
+    assert StatsService.check_user_stats() == []
+    assert get_user_stats(sample_user.id)['total_reservations'] == 3
@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import event
+from app.models import db, OutboxMessage, Reservation, User, WaitlistEntry
+from app.models.reservation import ReservationStatus
+from app.models.waitlist import WaitlistStatus
+from app.services.outbox import Outbox
+from app.services.reservation_service import ReservationService
+from app.services.waitlist_service import WaitlistService
+
+START = datetime(2030, 8, 5, 18, 0)
+
+@pytest.fixture
+def other_users(db_session):
+    users = []
+    for i in range(2):
+        user = User(username=f'waiter{i}', email=f'waiter{i}@example.com', first_name='Wait', last_name='User')
+        user.set_password('password123')
+        db_session.add(user)
+        users.append(user)
+    db_session.commit()
+    return users
+
+def test_join_requires_occupied_slot(db_session, sample_user, sample_court):
+    with pytest.raises(ValueError):
+        WaitlistService.join(sample_user.id, sample_court.id, START, START + timedelta(hours=1))
+
+def test_cancellation_promotes_first_waiter(db_session, sample_user, sample_court, other_users):
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, START, START + timedelta(hours=2))
+    first = WaitlistService.join(other_users[0].id, sample_court.id, START, START + timedelta(hours=1))
+    second = WaitlistService.join(other_users[1].id, sample_court.id, START, START + timedelta(hours=1))
+    # Anotarse dos veces en el mismo horario no duplica la entrada
+    assert WaitlistService.join(other_users[0].id, sample_court.id, START, START + timedelta(hours=1)).id == first.id
+
+    with patch('app.services.email_service.EmailService.send_waitlist_promotion') as notify:
+        ReservationService.cancel_reservation(reservation.id)
+        Outbox.drain()
+
+    db.session.refresh(first)
+    db.session.refresh(second)
+    assert first.status == WaitlistStatus.PROMOTED
+    assert first.reservation.user_id == other_users[0].id
+    assert first.reservation.status == ReservationStatus.PENDING
+    assert second.status == WaitlistStatus.WAITING
+    notify.assert_called_once()
+
+def test_partial_overlap_promotes_each_fitting_waiter(db_session, sample_user, sample_court, other_users):
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, START, START + timedelta(hours=2))
+    early = WaitlistService.join(other_users[0].id, sample_court.id, START, START + timedelta(hours=1))
+    late = WaitlistService.join(other_users[1].id, sample_court.id, START + timedelta(hours=1), START + timedelta(hours=2))
+
+    ReservationService.cancel_reservation(reservation.id)
+
+    assert {e.status for e in WaitlistEntry.query.filter(WaitlistEntry.id.in_([early.id, late.id]))} == {WaitlistStatus.PROMOTED}
+
+def test_leave_waitlist(db_session, sample_user, sample_court, other_users):
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, START, START + timedelta(hours=1))
+    entry = WaitlistService.join(other_users[0].id, sample_court.id, START, START + timedelta(hours=1))
+
+    with pytest.raises(ValueError):
+        WaitlistService.leave(entry.id, sample_user.id)
+    WaitlistService.leave(entry.id, other_users[0].id)
+
+    ReservationService.cancel_reservation(reservation.id)
+    assert db.session.get(WaitlistEntry, entry.id).status == WaitlistStatus.CANCELLED
+
+def test_promotion_commits_reservation_entry_and_notice_together(db_session, sample_user, sample_court, other_users):
+    end = START + timedelta(hours=1)
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, START, end)
+    entry = WaitlistService.join(other_users[0].id, sample_court.id, START, end)
+    with patch.object(WaitlistService, 'promote_safely'):
+        ReservationService.cancel_reservation(reservation.id)
+    Outbox.drain()
+
+    # Commits reales de la conexión (liberar un savepoint no cuenta)
+    commits = []
+    listener = lambda conn: commits.append(conn)
+    event.listen(db.engine, 'commit', listener)
+    try:
+        assert WaitlistService.promote(sample_court.id, START, end) == [entry]
+    finally:
+        event.remove(db.engine, 'commit', listener)
+
+    assert len(commits) == 1
+    assert entry.status == WaitlistStatus.PROMOTED
+    assert entry.reservation.status == ReservationStatus.PENDING
+    assert OutboxMessage.query.filter_by(kind='email.waitlist_promotion', dispatched_at=None).count() == 1
+
+def test_unpaid_promotion_expires_and_passes_to_next_waiter(db_session, sample_user, sample_court, other_users):
+    end = START + timedelta(hours=1)
+    reservation = ReservationService.create_reservation(sample_user.id, sample_court.id, START, end)
+    first = WaitlistService.join(other_users[0].id, sample_court.id, START, end)
+    second = WaitlistService.join(other_users[1].id, sample_court.id, START, end)
+    ReservationService.cancel_reservation(reservation.id)
+
+    db.session.refresh(first)
+    offered = first.reservation_id
+    later = datetime.now(timezone.utc) + timedelta(minutes=31)
+    assert ReservationService.expire_pending_reservations(now=later) == 1
+
+    db.session.refresh(second)
+    assert db.session.get(Reservation, offered).status == ReservationStatus.CANCELLED
+    assert second.status == WaitlistStatus.PROMOTED
+    assert second.reservation.status == ReservationStatus.PENDING